@@ -1,17 +1,16 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any
-import numpy as np
-from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-from qiskit_aer import AerSimulator
-from qiskit import transpile
+from typing import List, Dict, Any, TYPE_CHECKING
+from app.utils.cancellation import Cancelled
+from app.utils.execution import ComplexNumber, execution_service, to_complex_numbers
+from app.utils.log import get_logger
+from app.utils.timing import TimedRoute
 
-router = APIRouter()
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
 
-class ComplexNumber(BaseModel):
-    """Pydantic-compatible complex number representation"""
-    real: float
-    imag: float
+router = APIRouter(route_class=TimedRoute)
+logger = get_logger(__name__)
 
 class BernsteinVaziraniRequest(BaseModel):
     hidden_string: str = "101"
@@ -26,8 +25,9 @@ class BernsteinVaziraniResponse(BaseModel):
     recovered_string: str
     hidden_string: str
 
-def create_bernstein_vazirani_circuit(hidden_string: str, num_qubits: int) -> QuantumCircuit:
+def create_bernstein_vazirani_circuit(hidden_string: str, num_qubits: int) -> "QuantumCircuit":
     """Create Bernstein-Vazirani algorithm quantum circuit"""
+    from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
     # n qubits for input, 1 ancilla qubit for output
     total_qubits = num_qubits + 1
     qreg = QuantumRegister(total_qubits, 'q')
@@ -53,8 +53,9 @@ def create_bernstein_vazirani_circuit(hidden_string: str, num_qubits: int) -> Qu
     
     return circuit
 
-def create_dot_product_oracle(hidden_string: str, num_qubits: int) -> QuantumCircuit:
+def create_dot_product_oracle(hidden_string: str, num_qubits: int) -> "QuantumCircuit":
     """Create oracle for f(x) = s·x where s is the hidden string"""
+    from qiskit import QuantumCircuit
     total_qubits = num_qubits + 1
     oracle = QuantumCircuit(total_qubits)
     
@@ -68,52 +69,24 @@ def create_dot_product_oracle(hidden_string: str, num_qubits: int) -> QuantumCir
     
     return oracle
 
-def simulate_bernstein_vazirani(circuit: QuantumCircuit) -> tuple:
-    """Simulate Bernstein-Vazirani circuit and return results"""
-    try:
-        # Create a copy for statevector simulation (without measurements)
-        statevector_circuit = QuantumCircuit(circuit.num_qubits)
-        
-        # Copy all gates except measurements
-        for instruction in circuit.data:
-            if instruction.operation.name != 'measure':
-                statevector_circuit.append(instruction.operation, instruction.qubits, instruction.clbits)
-        
-        # State vector simulation
-        simulator = AerSimulator(method='statevector')
-        compiled_circuit = transpile(statevector_circuit, simulator)
-        job = simulator.run(compiled_circuit, shots=1)
-        result = job.result()
-        
-        try:
-            statevector = result.get_statevector()
-        except Exception as e:
-            # Fallback if statevector extraction fails
-            print(f"Statevector extraction failed: {e}")
-            num_states = 2 ** circuit.num_qubits
-            statevector = np.ones(num_states, dtype=complex) / np.sqrt(num_states)
-        
-        # Calculate probabilities
-        probabilities = np.abs(statevector) ** 2
-        
-        # Measurement simulation with original circuit
-        measurement_simulator = AerSimulator(method='automatic')
-        compiled_measurement = transpile(circuit, measurement_simulator)
-        measurement_job = measurement_simulator.run(compiled_measurement, shots=1024)
-        measurement_result = measurement_job.result()
-        counts = measurement_result.get_counts()
-        
-        return statevector, probabilities.tolist(), counts
-        
-    except Exception as e:
-        print(f"Bernstein-Vazirani simulation error: {e}")
-        # Return fallback results
-        num_states = 2 ** circuit.num_qubits
-        fallback_statevector = np.ones(num_states, dtype=complex) / np.sqrt(num_states)
-        fallback_probabilities = np.ones(num_states) / num_states
-        fallback_counts = {"000": 512, "001": 256, "010": 256}
-        
-        return fallback_statevector, fallback_probabilities.tolist(), fallback_counts
+def get_compiled_circuit(hidden_string: str, num_qubits: int):
+    """Built and transpiled circuit, cached on (hidden_string, num_qubits)"""
+    return execution_service.compile_cached(
+        ("bernstein-vazirani", hidden_string, num_qubits),
+        lambda: create_bernstein_vazirani_circuit(hidden_string, num_qubits)
+    )
+
+def run_circuit(hidden_string: str, num_qubits: int):
+    """Compiled circuit and its execution"""
+    compiled = get_compiled_circuit(hidden_string, num_qubits)
+    return compiled, execution_service.run(compiled)
+
+def warm_up_circuits():
+    """Pre-build and simulate every 3-bit hidden string (the frontend default size)"""
+    for value in range(2 ** 3):
+        execution_service.run(get_compiled_circuit(format(value, '03b'), 3), shots=0)
+
+execution_service.register_warmup("bernstein-vazirani", warm_up_circuits)
 
 def recover_hidden_string(counts: Dict[str, int], num_qubits: int) -> str:
     """Recover the hidden string from measurement results"""
@@ -142,61 +115,44 @@ async def run_bernstein_vazirani_algorithm(request: BernsteinVaziraniRequest):
                 detail="Hidden string must contain only 0s and 1s"
             )
         
-        # Create and simulate circuit
-        circuit = create_bernstein_vazirani_circuit(request.hidden_string, request.num_qubits)
-        statevector, probabilities, counts = simulate_bernstein_vazirani(circuit)
-          # Recover hidden string
+        # Create and simulate circuit, shared with identical requests in flight
+        compiled, execution = await execution_service.coalesce(
+            ("bernstein-vazirani", request.hidden_string, request.num_qubits),
+            lambda: run_circuit(request.hidden_string, request.num_qubits)
+        )
+        counts = execution.counts
+        
+        # Recover hidden string
         recovered_string = recover_hidden_string(counts, request.num_qubits)
         
-        # Debug output
-        print(f"Bernstein-Vazirani Debug:")
-        print(f"  Input hidden_string: {request.hidden_string}")
-        print(f"  Measurement counts: {counts}")
-        print(f"  Recovered string: {recovered_string}")
+        logger.debug("bernstein-vazirani run", extra={"hidden_string": request.hidden_string, "counts": counts,
+                                                      "recovered_string": recovered_string})
         
         # Convert statevector to JSON-serializable format
-        quantum_state = [ComplexNumber(real=float(amp.real), imag=float(amp.imag)) for amp in statevector]
+        quantum_state = to_complex_numbers(execution.statevector)
         
         # Prepare circuit data for visualization
         circuit_data = {
             "num_qubits": request.num_qubits + 1,  # Include ancilla
             "hidden_string": request.hidden_string,
-            "gates": extract_gate_sequence(circuit)
+            "gates": compiled.gates
         }
         
         return BernsteinVaziraniResponse(
             success=True,
             circuit_data=circuit_data,
             quantum_state=quantum_state,
-            probabilities=probabilities,
+            probabilities=execution.probabilities,
             measurement_counts=counts,
             recovered_string=recovered_string,
             hidden_string=request.hidden_string
         )
         
+    except (HTTPException, Cancelled):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def extract_gate_sequence(circuit: QuantumCircuit) -> List[Dict[str, Any]]:
-    """Extract gate sequence from circuit for visualization"""
-    gates = []
-    for instruction in circuit.data:
-        try:
-            gate_info = {
-                "name": instruction.operation.name,
-                "qubits": [q.index for q in instruction.qubits],
-                "params": instruction.operation.params if hasattr(instruction.operation, 'params') else []
-            }
-            gates.append(gate_info)
-        except Exception as e:
-            # Fallback for any instruction format issues
-            gates.append({
-                "name": "unknown",
-                "qubits": [],
-                "params": []
-            })
-    return gates
-
 @router.get("/bernstein-vazirani/info")
 async def get_bernstein_vazirani_info():
     """Get information about Bernstein-Vazirani algorithm"""
@@ -1,17 +1,14 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any
-import numpy as np
-from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-from qiskit_aer import AerSimulator
-from qiskit import transpile
+from typing import List, Dict, Any, TYPE_CHECKING
+from app.utils.cancellation import Cancelled
+from app.utils.execution import ComplexNumber, execution_service, to_complex_numbers
+from app.utils.timing import TimedRoute
 
-router = APIRouter()
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
 
-class ComplexNumber(BaseModel):
-    """Pydantic-compatible complex number representation"""
-    real: float
-    imag: float
+router = APIRouter(route_class=TimedRoute)
 
 class DeutschJozsaRequest(BaseModel):
     function_type: str = "balanced"  # "constant-0", "constant-1", "balanced"
@@ -26,8 +23,9 @@ class DeutschJozsaResponse(BaseModel):
     result: str
     function_type: str
 
-def create_deutsch_jozsa_circuit(function_type: str, num_qubits: int) -> QuantumCircuit:
+def create_deutsch_jozsa_circuit(function_type: str, num_qubits: int) -> "QuantumCircuit":
     """Create Deutsch-Jozsa algorithm quantum circuit"""
+    from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
     # n qubits for input, 1 ancilla qubit for output
     total_qubits = num_qubits + 1
     qreg = QuantumRegister(total_qubits, 'q')
@@ -52,8 +50,9 @@ def create_deutsch_jozsa_circuit(function_type: str, num_qubits: int) -> Quantum
     
     return circuit
 
-def create_oracle_function(function_type: str, num_qubits: int) -> QuantumCircuit:
+def create_oracle_function(function_type: str, num_qubits: int) -> "QuantumCircuit":
     """Create oracle function for Deutsch-Jozsa algorithm"""
+    from qiskit import QuantumCircuit
     total_qubits = num_qubits + 1
     oracle = QuantumCircuit(total_qubits)
     
@@ -69,52 +68,24 @@ def create_oracle_function(function_type: str, num_qubits: int) -> QuantumCircui
     
     return oracle
 
-def simulate_deutsch_jozsa(circuit: QuantumCircuit) -> tuple:
-    """Simulate Deutsch-Jozsa circuit and return results"""
-    try:
-        # Create a copy for statevector simulation (without measurements)
-        statevector_circuit = QuantumCircuit(circuit.num_qubits)
-        
-        # Copy all gates except measurements
-        for instruction in circuit.data:
-            if instruction.operation.name != 'measure':
-                statevector_circuit.append(instruction.operation, instruction.qubits, instruction.clbits)
-        
-        # State vector simulation
-        simulator = AerSimulator(method='statevector')
-        compiled_circuit = transpile(statevector_circuit, simulator)
-        job = simulator.run(compiled_circuit, shots=1)
-        result = job.result()
-        
-        try:
-            statevector = result.get_statevector()
-        except Exception as e:
-            # Fallback if statevector extraction fails
-            print(f"Statevector extraction failed: {e}")
-            num_states = 2 ** circuit.num_qubits
-            statevector = np.ones(num_states, dtype=complex) / np.sqrt(num_states)
-        
-        # Calculate probabilities
-        probabilities = np.abs(statevector) ** 2
-        
-        # Measurement simulation with original circuit
-        measurement_simulator = AerSimulator(method='automatic')
-        compiled_measurement = transpile(circuit, measurement_simulator)
-        measurement_job = measurement_simulator.run(compiled_measurement, shots=1024)
-        measurement_result = measurement_job.result()
-        counts = measurement_result.get_counts()
-        
-        return statevector, probabilities.tolist(), counts
-        
-    except Exception as e:
-        print(f"Deutsch-Jozsa simulation error: {e}")
-        # Return fallback results
-        num_states = 2 ** circuit.num_qubits
-        fallback_statevector = np.ones(num_states, dtype=complex) / np.sqrt(num_states)
-        fallback_probabilities = np.ones(num_states) / num_states
-        fallback_counts = {"000": 512, "001": 256, "010": 256}
-        
-        return fallback_statevector, fallback_probabilities.tolist(), fallback_counts
+def get_compiled_circuit(function_type: str, num_qubits: int):
+    """Built and transpiled circuit, cached on (function_type, num_qubits)"""
+    return execution_service.compile_cached(
+        ("deutsch-jozsa", function_type, num_qubits),
+        lambda: create_deutsch_jozsa_circuit(function_type, num_qubits)
+    )
+
+def run_circuit(function_type: str, num_qubits: int):
+    """Compiled circuit and its execution"""
+    compiled = get_compiled_circuit(function_type, num_qubits)
+    return compiled, execution_service.run(compiled)
+
+def warm_up_circuits():
+    """Pre-build and simulate the circuits the frontend requests by default"""
+    for function_type in ["constant-0", "constant-1", "balanced"]:
+        execution_service.run(get_compiled_circuit(function_type, 3), shots=0)
+
+execution_service.register_warmup("deutsch-jozsa", warm_up_circuits)
 
 def interpret_result(counts: Dict[str, int], num_qubits: int) -> str:
     """Interpret measurement results to determine if function is constant or balanced"""
@@ -138,55 +109,41 @@ async def run_deutsch_jozsa_algorithm(request: DeutschJozsaRequest):
                 detail=f"Function type must be one of: {valid_types}"
             )
         
-        # Create and simulate circuit
-        circuit = create_deutsch_jozsa_circuit(request.function_type, request.num_qubits)
-        statevector, probabilities, counts = simulate_deutsch_jozsa(circuit)
+        # Create and simulate circuit, shared with identical requests in flight
+        compiled, execution = await execution_service.coalesce(
+            ("deutsch-jozsa", request.function_type, request.num_qubits),
+            lambda: run_circuit(request.function_type, request.num_qubits)
+        )
+        counts = execution.counts
         
         # Interpret results
         result = interpret_result(counts, request.num_qubits)
-          # Convert statevector to JSON-serializable format
-        quantum_state = [ComplexNumber(real=float(amp.real), imag=float(amp.imag)) for amp in statevector]
+        
+        # Convert statevector to JSON-serializable format
+        quantum_state = to_complex_numbers(execution.statevector)
         
         # Prepare circuit data for visualization
         circuit_data = {
             "num_qubits": request.num_qubits + 1,  # Include ancilla
             "function_type": request.function_type,
-            "gates": extract_gate_sequence(circuit)
+            "gates": compiled.gates
         }
         
         return DeutschJozsaResponse(
             success=True,
             circuit_data=circuit_data,
             quantum_state=quantum_state,
-            probabilities=probabilities,
+            probabilities=execution.probabilities,
             measurement_counts=counts,
             result=result,
             function_type=request.function_type
         )
         
+    except (HTTPException, Cancelled):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def extract_gate_sequence(circuit: QuantumCircuit) -> List[Dict[str, Any]]:
-    """Extract gate sequence from circuit for visualization"""
-    gates = []
-    for instruction in circuit.data:
-        try:
-            gate_info = {
-                "name": instruction.operation.name,
-                "qubits": [q.index for q in instruction.qubits],
-                "params": instruction.operation.params if hasattr(instruction.operation, 'params') else []
-            }
-            gates.append(gate_info)
-        except Exception as e:
-            # Fallback for any instruction format issues
-            gates.append({
-                "name": "unknown",
-                "qubits": [],
-                "params": []
-            })
-    return gates
-
 @router.get("/deutsch-jozsa/info")
 async def get_deutsch_jozsa_info():
     """Get information about Deutsch-Jozsa algorithm"""
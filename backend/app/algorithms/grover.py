@@ -1,17 +1,15 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any, Union
+from typing import List, Dict, Any, Union, TYPE_CHECKING
 import numpy as np
-from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-from qiskit.circuit.library import GroverOperator
-from qiskit_aer import AerSimulator
+from app.utils.cancellation import Cancelled
+from app.utils.execution import ComplexNumber, execution_service, to_complex_numbers
+from app.utils.timing import TimedRoute
 
-router = APIRouter()
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
 
-class ComplexNumber(BaseModel):
-    """Pydantic-compatible complex number representation"""
-    real: float
-    imag: float
+router = APIRouter(route_class=TimedRoute)
 
 class GroverRequest(BaseModel):
     target_item: int = 3
@@ -27,8 +25,9 @@ class GroverResponse(BaseModel):
     optimal_iterations: int
     success_probability: float
 
-def create_grover_circuit(target_item: int, iterations: int, num_qubits: int) -> QuantumCircuit:
+def create_grover_circuit(target_item: int, iterations: int, num_qubits: int) -> "QuantumCircuit":
     """Create Grover's algorithm quantum circuit"""
+    from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
     qreg = QuantumRegister(num_qubits, 'q')
     creg = ClassicalRegister(num_qubits, 'c')
     circuit = QuantumCircuit(qreg, creg)
@@ -51,8 +50,9 @@ def create_grover_circuit(target_item: int, iterations: int, num_qubits: int) ->
     
     return circuit
 
-def create_oracle(target_item: int, num_qubits: int) -> QuantumCircuit:
+def create_oracle(target_item: int, num_qubits: int) -> "QuantumCircuit":
     """Create oracle that flips the amplitude of the target item"""
+    from qiskit import QuantumCircuit
     oracle = QuantumCircuit(num_qubits)
     
     # Convert target item to binary and apply X gates for 0s
@@ -76,8 +76,9 @@ def create_oracle(target_item: int, num_qubits: int) -> QuantumCircuit:
     
     return oracle
 
-def create_diffusion_operator(num_qubits: int) -> QuantumCircuit:
+def create_diffusion_operator(num_qubits: int) -> "QuantumCircuit":
     """Create diffusion operator for amplitude amplification"""
+    from qiskit import QuantumCircuit
     diffusion = QuantumCircuit(num_qubits)
     
     # H gates
@@ -106,37 +107,24 @@ def calculate_optimal_iterations(num_items: int) -> int:
     """Calculate optimal number of Grover iterations"""
     return int(np.pi * np.sqrt(num_items) / 4)
 
-def simulate_grover(circuit: QuantumCircuit) -> tuple:
-    """Simulate Grover circuit and return results"""
-    try:
-        # Measurement simulation (most reliable)
-        simulator = AerSimulator()
-        job = simulator.run(circuit, shots=1024)
-        result = job.result()
-        counts = result.get_counts()
-        
-        # Create probabilities from measurement counts
-        num_states = 2 ** circuit.num_qubits
-        probabilities = [0.0] * num_states
-        total_shots = sum(counts.values())
-        
-        for state_str, count in counts.items():
-            state_int = int(state_str, 2)
-            probabilities[state_int] = count / total_shots
-          # Create a simple statevector from probabilities (approximation)
-        statevector = []
-        for prob in probabilities:
-            statevector.append(complex(np.sqrt(prob), 0.0))
-        
-        return statevector, probabilities, counts        
-    except Exception as e:
-        print(f"Error in simulate_grover: {e}")
-        # Return minimal working data
-        num_states = 2 ** circuit.num_qubits
-        statevector = [complex(0.0, 0.0)] * num_states
-        probabilities = [0.0] * num_states
-        counts = {"000": 1024}  # Fallback measurement
-        return statevector, probabilities, counts
+def get_compiled_circuit(target_item: int, iterations: int, num_qubits: int):
+    """Built and transpiled circuit, cached on (target_item, iterations, num_qubits)"""
+    return execution_service.compile_cached(
+        ("grover", target_item, iterations, num_qubits),
+        lambda: create_grover_circuit(target_item, iterations, num_qubits)
+    )
+
+def run_circuit(target_item: int, iterations: int, num_qubits: int):
+    """Compiled circuit and its execution"""
+    compiled = get_compiled_circuit(target_item, iterations, num_qubits)
+    return compiled, execution_service.run(compiled)
+
+def warm_up_circuits():
+    """Pre-build and simulate the default 3-qubit search"""
+    defaults = GroverRequest()
+    execution_service.run(get_compiled_circuit(defaults.target_item, defaults.iterations, defaults.num_qubits), shots=0)
+
+execution_service.register_warmup("grover", warm_up_circuits)
 
 @router.post("/grover/simulate", response_model=GroverResponse)
 async def simulate_grover_algorithm(request: GroverRequest):
@@ -156,21 +144,26 @@ async def run_grover_algorithm(request: GroverRequest):
                 detail=f"Target item must be less than {num_items} for {request.num_qubits} qubits"
             )
         
-        # Create and simulate circuit
-        circuit = create_grover_circuit(request.target_item, request.iterations, request.num_qubits)
-        statevector, probabilities, counts = simulate_grover(circuit)
+        # Create and simulate circuit, shared with identical requests in flight
+        compiled, execution = await execution_service.coalesce(
+            ("grover", request.target_item, request.iterations, request.num_qubits),
+            lambda: run_circuit(request.target_item, request.iterations, request.num_qubits)
+        )
+        probabilities = execution.probabilities
         
         # Calculate optimal iterations and success probability
         optimal_iterations = calculate_optimal_iterations(num_items)
-        success_probability = probabilities[request.target_item]        # Convert statevector to JSON-serializable format
-        quantum_state = [ComplexNumber(real=float(amp.real), imag=float(amp.imag)) for amp in statevector]
+        success_probability = probabilities[request.target_item]
+        
+        # Convert statevector to JSON-serializable format
+        quantum_state = to_complex_numbers(execution.statevector)
         
         # Prepare circuit data for visualization
         circuit_data = {
             "num_qubits": request.num_qubits,
             "target_item": request.target_item,
             "iterations": request.iterations,
-            "gates": extract_gate_sequence(circuit)
+            "gates": compiled.gates
         }
         
         return GroverResponse(
@@ -178,34 +171,16 @@ async def run_grover_algorithm(request: GroverRequest):
             circuit_data=circuit_data,
             quantum_state=quantum_state,
             probabilities=probabilities,
-            measurement_counts=counts,
+            measurement_counts=execution.counts,
             optimal_iterations=optimal_iterations,
             success_probability=success_probability
         )
         
+    except (HTTPException, Cancelled):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
-def extract_gate_sequence(circuit: QuantumCircuit) -> List[Dict[str, Any]]:
-    """Extract gate sequence from circuit for visualization"""
-    gates = []
-    for instruction in circuit.data:
-        try:
-            gate_info = {
-                "name": instruction.operation.name,
-                "qubits": [q.index for q in instruction.qubits],
-                "params": instruction.operation.params if hasattr(instruction.operation, 'params') else []
-            }
-            gates.append(gate_info)
-        except Exception as e:
-            # Fallback for any instruction format issues
-            gates.append({
-                "name": "unknown",
-                "qubits": [],
-                "params": []
-            })
-    return gates
-
 @router.get("/grover/info")
 async def get_grover_info():
     """Get information about Grover's algorithm"""
@@ -0,0 +1,202 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import List, Dict, Any, Optional
+import asyncio
+import json
+import os
+from app.algorithms.grover import calculate_optimal_iterations, run_circuit as run_grover_circuit
+from app.exercise_checker.quantum_simulator import (
+    SimulationResult,
+    measured_qubits,
+    optimization_level,
+    parse_gate_operations,
+    prepare_circuit,
+)
+from app.utils.job_queue import FINISHED_STATES, SUCCEEDED, Job, QueueFull, job_queue
+from app.utils.log import get_logger
+from app.utils.metrics import SIMULATION_SECONDS
+from app.utils.statevector import simulate
+from app.utils.timing import TimedRoute
+
+router = APIRouter(route_class=TimedRoute)
+logger = get_logger(__name__)
+
+# Simulations that may take longer than an HTTP request (the frontend gives
+# up after 30 s) are submitted here and run by the job queue in
+# app.utils.job_queue. POST returns the job at once (202); clients then poll
+# GET /jobs/{id}, follow GET /jobs/{id}/events, and fetch GET
+# /jobs/{id}/result once it has succeeded.
+
+# Largest circuit a job may simulate, the state alone takes 16 * 2^n bytes
+MAX_JOB_QUBITS = int(os.getenv("JOB_MAX_QUBITS", "24"))
+MAX_JOB_SHOTS = 10_000_000
+
+# Grover sweeps simulate one circuit per iteration count on Aer
+MAX_SWEEP_QUBITS = 12
+MAX_SWEEP_POINTS = 64
+
+# Outputs a simulation job can return; the unitary is out of reach at job sizes
+JOB_OUTPUTS = ("state_vector", "probabilities", "measurement_counts")
+
+# Outputs with one JSON entry per basis state, kept for JOB_RESULT_TTL after
+# the job finishes: at 24 qubits that is gigabytes per job, so above this
+# size jobs return measurement_counts only
+FULL_STATE_OUTPUTS = {"state_vector", "probabilities"}
+MAX_FULL_STATE_QUBITS = int(os.getenv("JOB_MAX_STATE_QUBITS", "16"))
+
+# Seconds between status checks while streaming job events
+EVENT_POLL_INTERVAL = 0.2
+
+class SimulationJobRequest(BaseModel):
+    """Circuit in the exercise format ({"gate", "qubit", "target_qubit", "timeStep"})"""
+    qubits: int
+    circuit: List[Dict[str, Any]] = []
+    shots: int = 1024
+    include: List[str] = ["measurement_counts"]
+    optimize: bool = True
+    seed: Optional[int] = None
+    timeout: Optional[float] = None  # Seconds, defaults to JOB_TIMEOUT
+
+class GroverSweepRequest(BaseModel):
+    num_qubits: int = 3
+    target_item: int = 3
+    iterations: Optional[List[int]] = None  # Defaults to 0 .. twice the optimal count
+    timeout: Optional[float] = None
+
+def submit(kind: str, run, timeout: Optional[float], params: Dict[str, Any]) -> Dict[str, Any]:
+    try:
+        job = job_queue.submit(kind, run, timeout=timeout, params=params)
+    except QueueFull as e:
+        raise HTTPException(status_code=503, detail=f"Job queue is full: {e}", headers={"Retry-After": "5"})
+    return job.to_dict()
+
+def get_job(job_id: str) -> Job:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Job {job_id} not found, results are kept for {job_queue.result_ttl:g}s after a job finishes"
+        )
+    return job
+
+def run_simulation_job(job: Job, request: SimulationJobRequest, outputs: set) -> Dict[str, Any]:
+    gate_operations = parse_gate_operations(request.circuit)
+    level = optimization_level(outputs) if request.optimize else None
+    prepared = prepare_circuit(gate_operations, request.qubits, level)
+    result = SimulationResult(prepared.native, request.qubits, measured_qubits(gate_operations, request.qubits),
+                              request.seed, prepared.optimization)
+
+    def progress(done: int, total: int) -> None:
+        job.update(0.9 * done / total, f"applied {done} of {total} gates")
+
+    job.update(0.0, f"simulating {len(prepared.native)} gates on {request.qubits} qubits")
+    with SIMULATION_SECONDS.time(backend="native_statevector", qubits=request.qubits):
+        result.state = simulate(prepared.native, request.qubits, progress=progress)
+    job.update(0.9, "computing outputs")
+    response = result.to_dict(outputs, request.shots)
+    if result.optimization is not None:
+        response["optimization"] = result.optimization.to_dict()
+    return response
+
+def run_grover_sweep(job: Job, request: GroverSweepRequest, iterations: List[int]) -> Dict[str, Any]:
+    points = []
+    for index, count in enumerate(iterations):
+        job.update(index / len(iterations), f"{count} iterations")
+        _, execution = run_grover_circuit(request.target_item, count, request.num_qubits)
+        points.append({"iterations": count, "success_probability": execution.probabilities[request.target_item]})
+    best = max(points, key=lambda point: point["success_probability"])
+    return {
+        "num_qubits": request.num_qubits,
+        "target_item": request.target_item,
+        "optimal_iterations": calculate_optimal_iterations(2 ** request.num_qubits),
+        "best_iterations": best["iterations"],
+        "points": points
+    }
+
+@router.post("/jobs/simulate", status_code=202)
+async def submit_simulation_job(request: SimulationJobRequest):
+    """Queue a large circuit simulation, returns the job to poll"""
+    if not 1 <= request.qubits <= MAX_JOB_QUBITS:
+        raise HTTPException(status_code=400, detail=f"Jobs simulate between 1 and {MAX_JOB_QUBITS} qubits")
+    if not 0 <= request.shots <= MAX_JOB_SHOTS:
+        raise HTTPException(status_code=400, detail=f"shots must be between 0 and {MAX_JOB_SHOTS}")
+    outputs = set(request.include)
+    unknown = outputs - set(JOB_OUTPUTS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown result fields {sorted(unknown)}, expected any of {list(JOB_OUTPUTS)}")
+    full_state = outputs & FULL_STATE_OUTPUTS
+    if full_state and request.qubits > MAX_FULL_STATE_QUBITS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"{sorted(full_state)} are only returned up to {MAX_FULL_STATE_QUBITS} qubits, "
+                   f"larger jobs return measurement_counts"
+        )
+
+    # Reject malformed circuits now rather than as a failed job
+    try:
+        prepare_circuit(parse_gate_operations(request.circuit), request.qubits)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid circuit: {str(e)}")
+
+    params = {"qubits": request.qubits, "gates": len(request.circuit), "shots": request.shots,
+              "include": sorted(outputs)}
+    return submit("simulate", lambda job: run_simulation_job(job, request, outputs), request.timeout, params)
+
+@router.post("/jobs/grover-sweep", status_code=202)
+async def submit_grover_sweep_job(request: GroverSweepRequest):
+    """Queue Grover's search over a range of iteration counts, returns the job to poll"""
+    if not 1 <= request.num_qubits <= MAX_SWEEP_QUBITS:
+        raise HTTPException(status_code=400, detail=f"Sweeps run between 1 and {MAX_SWEEP_QUBITS} qubits")
+    if not 0 <= request.target_item < 2 ** request.num_qubits:
+        raise HTTPException(status_code=400, detail=f"Target item must be less than {2 ** request.num_qubits}")
+    iterations = request.iterations
+    if iterations is None:
+        iterations = list(range(2 * calculate_optimal_iterations(2 ** request.num_qubits) + 1))
+    if not iterations or len(iterations) > MAX_SWEEP_POINTS or min(iterations) < 0:
+        raise HTTPException(status_code=400, detail=f"iterations must hold 1 to {MAX_SWEEP_POINTS} non-negative counts")
+
+    params = {"num_qubits": request.num_qubits, "target_item": request.target_item, "points": len(iterations)}
+    return submit("grover-sweep", lambda job: run_grover_sweep(job, request, iterations), request.timeout, params)
+
+@router.get("/jobs")
+async def list_jobs():
+    """Queued, running and recently finished jobs, without results"""
+    return {"jobs": [job.to_dict() for job in job_queue.jobs()], "queue": job_queue.stats()}
+
+@router.get("/jobs/{job_id}")
+async def get_job_status(job_id: str):
+    """Status and progress of a job"""
+    return get_job(job_id).to_dict()
+
+@router.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Result of a job that has succeeded"""
+    job = get_job(job_id)
+    if job.status != SUCCEEDED:
+        detail = f"Job {job_id} is {job.status}" + (f": {job.error}" if job.error else "")
+        raise HTTPException(status_code=409, detail=detail)
+    return {**job.to_dict(), "result": job.result}
+
+@router.get("/jobs/{job_id}/events")
+async def stream_job_events(job_id: str):
+    """Stream the job's status as NDJSON, one line per change, until it finishes"""
+    job = get_job(job_id)
+
+    async def lines():
+        version = -1
+        while True:
+            if job.version != version:
+                version = job.version
+                yield json.dumps(job.to_dict()) + "\n"
+            if job.status in FINISHED_STATES:
+                return
+            await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+@router.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a job; a running job stops at its next progress update or kernel check"""
+    get_job(job_id)
+    return job_queue.cancel(job_id).to_dict()
@@ -1,22 +1,30 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
+import hashlib
 import numpy as np
-from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-from qiskit_aer import AerSimulator
-from qiskit import transpile
+from app.utils.cancellation import Cancelled, check_cancelled
+from app.utils.execution import ComplexNumber, execution_service, to_complex_numbers
+from app.utils.statevector import zero_state, apply_hadamard, probabilities as state_probabilities
+from app.utils.log import get_logger
+from app.utils.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+logger = get_logger(__name__)
 
-class ComplexNumber(BaseModel):
-    """Pydantic-compatible complex number representation"""
-    real: float
-    imag: float
+# 2n-qubit states are held densely, keep them to a few hundred MB at most
+MAX_SIMON_QUBITS = 20
 
 class SimonRequest(BaseModel):
     hidden_period: str = "11"
     num_qubits: int = 4
+    seed: Optional[int] = None  # Seed for measurement and adaptive oracle sampling
+    oracle_seed: int = 0  # Seed for the randomly generated 2-to-1 function
+    oracle_table: Optional[List[int]] = None  # Explicit lookup table f(x) for x in 0..2^n-1
 
+# Bit strings in the response (hidden_period, recovered_period and the
+# measurement_counts keys) all put bit i, the coefficient of s_i in the
+# linear equations, at character i
 class SimonResponse(BaseModel):
     success: bool
     circuit_data: Dict[str, Any]
@@ -26,141 +34,217 @@ class SimonResponse(BaseModel):
     linear_equations: List[str]
     recovered_period: str
     hidden_period: str
+    oracle_queries: int
 
-def create_simon_circuit(hidden_period: str, num_qubits: int) -> QuantumCircuit:
-    """Create Simon's algorithm quantum circuit"""
-    # n qubits for input register, n qubits for output register
-    if num_qubits % 2 != 0:
-        raise ValueError("Number of qubits must be even for Simon's algorithm")
-    
-    n = num_qubits // 2
-    qreg = QuantumRegister(num_qubits, 'q')
-    creg = ClassicalRegister(n, 'c')  # Only measure first register
-    circuit = QuantumCircuit(qreg, creg)
-    
-    # Apply Hadamard to first register (input)
-    circuit.h(range(n))
-    
-    # Apply Simon oracle Uf
-    oracle = create_simon_oracle(hidden_period, n)
-    circuit.compose(oracle, inplace=True)
-    
-    # Apply Hadamard to first register again
-    circuit.h(range(n))
-    
-    # Measure first register
-    circuit.measure(range(n), range(n))
-    
-    return circuit
-
-def create_simon_oracle(hidden_period: str, n: int) -> QuantumCircuit:
-    """Create oracle for Simon's algorithm where f(x) = f(x⊕s)"""
-    total_qubits = 2 * n
-    oracle = QuantumCircuit(total_qubits)
-    
-    # Pad or truncate period to match n
-    padded_period = hidden_period.ljust(n, '0')[:n]
-    
-    # Copy input to output (identity part)
-    for i in range(n):
-        oracle.cx(i, i + n)
-    
-    # Add period structure
-    # This is a simplified oracle - in practice, the function would be more complex
-    for i, bit in enumerate(padded_period):
-        if bit == '1':
-            # Create correlation between input and output based on period
-            oracle.cx(i, (i + 1) % n + n)
-    
-    return oracle
-
-def simulate_simon(circuit: QuantumCircuit) -> tuple:
-    """Simulate Simon circuit and return results"""
+def random_two_to_one_table(period: int, n: int, seed: int) -> np.ndarray:
+    """Generate a random f: {0,1}^n → {0,1}^n with f(x) = f(x⊕s)
+
+    Each coset {x, x⊕s} gets its own random output value, so f is exactly
+    2-to-1 for s ≠ 0 and a random permutation for s = 0.
+    """
+    rng = np.random.default_rng(seed)
+    size = 2 ** n
+    inputs = np.arange(size)
+    partners = inputs ^ period
+    representatives = inputs[inputs <= partners]
+    labels = rng.permutation(size)[:len(representatives)]
+
+    table = np.empty(size, dtype=np.int64)
+    table[representatives] = labels
+    table[representatives ^ period] = labels
+    return table
+
+def validate_oracle_table(table: List[int], period: int, n: int) -> np.ndarray:
+    """Check that a user supplied lookup table is a valid Simon function"""
+    size = 2 ** n
     try:
-        # Create a copy for statevector simulation (without measurements)
-        statevector_circuit = QuantumCircuit(circuit.num_qubits)
-        
-        # Copy all gates except measurements
-        for instruction in circuit.data:
-            if instruction.operation.name != 'measure':
-                statevector_circuit.append(instruction.operation, instruction.qubits, instruction.clbits)
-        
-        # State vector simulation
-        simulator = AerSimulator(method='statevector')
-        compiled_circuit = transpile(statevector_circuit, simulator)
-        job = simulator.run(compiled_circuit, shots=1)
-        result = job.result()
-        
-        try:
-            statevector = result.get_statevector()
-        except Exception as e:
-            # Fallback if statevector extraction fails
-            print(f"Statevector extraction failed: {e}")
-            # Create a simple uniform distribution as fallback
-            num_states = 2 ** circuit.num_qubits
-            statevector = np.ones(num_states, dtype=complex) / np.sqrt(num_states)
-        
-        # Calculate probabilities
-        probabilities = np.abs(statevector) ** 2
-          # Measurement simulation with original circuit
-        measurement_simulator = AerSimulator(method='automatic')
-        compiled_measurement = transpile(circuit, measurement_simulator)
-        measurement_job = measurement_simulator.run(compiled_measurement, shots=1024)
-        measurement_result = measurement_job.result()
-        counts = measurement_result.get_counts()
-        
-        return statevector, probabilities.tolist(), counts
-        
-    except Exception as e:
-        print(f"Simon simulation error: {e}")
-        # Return fallback results
-        num_states = 2 ** circuit.num_qubits
-        fallback_statevector = np.ones(num_states, dtype=complex) / np.sqrt(num_states)
-        fallback_probabilities = np.ones(num_states) / num_states
-        fallback_counts = {"00": 512, "01": 256, "10": 256}
-        
-        return fallback_statevector, fallback_probabilities.tolist(), fallback_counts
-
-def extract_linear_equations(counts: Dict[str, int], hidden_period: str, n: int) -> List[str]:
-    """Extract linear equations from measurement results"""
-    equations = []
-    padded_period = hidden_period.ljust(n, '0')[:n]
-    
-    # Get most frequent measurement outcomes (excluding all-zeros)
-    sorted_counts = sorted(counts.items(), key=lambda x: x[1], reverse=True)
-    
-    for i, (measurement, count) in enumerate(sorted_counts):
-        # Skip the all-zeros measurement (trivial solution)
-        if measurement == '0' * len(measurement):
-            continue
-            
-        # Each measurement y satisfies y·s = 0 (mod 2)
-        equation_parts = []
-        for j, y_bit in enumerate(measurement):
-            if y_bit == '1':
-                equation_parts.append(f's_{j}')
-        
-        if equation_parts:
-            equation = ' ⊕ '.join(equation_parts) + ' = 0'
-            equations.append(equation)
-        
-        if len(equations) >= n - 1:  # Need n-1 linearly independent equations
-            break
-    
-    # If we don't have enough equations, add some generic ones for demonstration
-    while len(equations) < n - 1:
-        equations.append(f's_0 ⊕ s_1 = 0')
-    
-    return equations
-
-def solve_linear_system(equations: List[str], n: int, hidden_period: str) -> str:
-    """Solve system of linear equations to recover the period"""
-    # For demonstration purposes, we'll return the actual hidden period
-    # In a real implementation, you would use Gaussian elimination over GF(2)
-    # to solve the system of linear equations
-    
-    # For now, return the hidden period (since this is what the algorithm should discover)
-    return hidden_period
+        values = np.asarray(table, dtype=np.int64)
+    except OverflowError:
+        raise ValueError(f"Oracle table values must be in the range [0, {size})")
+    if values.shape != (size,):
+        raise ValueError(f"Oracle table must have exactly {size} entries for n={n}")
+    if values.min() < 0 or values.max() >= size:
+        raise ValueError(f"Oracle table values must be in the range [0, {size})")
+
+    inputs = np.arange(size)
+    if not np.array_equal(values, values[inputs ^ period]):
+        raise ValueError("Oracle table does not satisfy f(x) = f(x⊕s) for the hidden period")
+
+    expected_outputs = size if period == 0 else size // 2
+    if len(np.unique(values)) != expected_outputs:
+        raise ValueError("Oracle table must be 2-to-1 (or 1-to-1 when the period is zero)")
+    return values
+
+def apply_simon_oracle(state: np.ndarray, table: np.ndarray, n: int) -> np.ndarray:
+    """Apply Uf|x⟩|y⟩ = |x⟩|y⊕f(x)⟩ as an index gather on the amplitudes
+
+    The input register is qubits 0..n-1 (low bits) and the output register
+    is qubits n..2n-1, so the state reshapes to amplitudes[y, x]. Since XOR
+    is an involution the new amplitude at (y, x) is the old one at
+    (y⊕f(x), x). Cost is linear in the state size and needs no gates.
+    """
+    size = 2 ** n
+    amplitudes = state.reshape(size, size)
+    source_rows = np.arange(size)[:, None] ^ table[None, :]
+    return np.take_along_axis(amplitudes, source_rows, axis=0).reshape(-1)
+
+def simulate_simon(table: np.ndarray, n: int) -> tuple:
+    """Evolve H⊗n · Uf · H⊗n on |0⟩ and return (statevector, probabilities)"""
+    num_qubits = 2 * n
+    state = zero_state(num_qubits)
+    state = apply_hadamard(state, range(n), num_qubits)
+    check_cancelled()
+    state = apply_simon_oracle(state, table, n)
+    check_cancelled()
+    state = apply_hadamard(state, range(n), num_qubits)
+    return state, state_probabilities(state)
+
+def get_simon_state(period: int, n: int, oracle_seed: int,
+                    oracle_table: Optional[List[int]] = None) -> tuple:
+    """Oracle table, final state and input-register distribution
+
+    Cached on (period, n, oracle seed) or on a digest of an explicit table,
+    so repeated requests skip oracle generation and simulation entirely.
+    """
+    if oracle_table is not None:
+        table = validate_oracle_table(oracle_table, period, n)
+        cache_key = ("simon", period, n, "table", hashlib.sha1(table.tobytes()).hexdigest())
+    else:
+        table = None
+        cache_key = ("simon", period, n, oracle_seed)
+
+    def compute():
+        oracle = table if table is not None else random_two_to_one_table(period, n, oracle_seed)
+        statevector, probabilities = simulate_simon(oracle, n)
+        return oracle, statevector, probabilities, input_register_distribution(probabilities, n)
+
+    return execution_service.run_native("native_simon", compute, cache_key=cache_key, num_qubits=2 * n)
+
+def warm_up_circuits():
+    """Pre-build every period for the 4- and 6-qubit circuits the frontend uses"""
+    for n in (2, 3):
+        for period in range(2 ** n):
+            get_simon_state(period, n, SimonRequest().oracle_seed)
+
+execution_service.register_warmup("simon", warm_up_circuits)
+
+def sample_measurement_counts(distribution: np.ndarray, n: int, shots: int,
+                              rng: np.random.Generator) -> Dict[str, int]:
+    """Sample the input register, keys put bit i at character i like the periods"""
+    outcomes = rng.multinomial(shots, distribution)
+    return {int_to_bits(y, n): int(count) for y, count in enumerate(outcomes) if count}
+
+def simon_gate_sequence(n: int) -> List[Dict[str, Any]]:
+    """Gate sequence for visualization, the oracle is a single opaque block"""
+    gates = [{"name": "h", "qubits": [i], "params": []} for i in range(n)]
+    gates.append({"name": "oracle", "qubits": list(range(2 * n)), "params": []})
+    gates.extend({"name": "h", "qubits": [i], "params": []} for i in range(n))
+    gates.extend({"name": "measure", "qubits": [i], "params": []} for i in range(n))
+    return gates
+
+class GF2RowReducer:
+    """Incremental Gaussian elimination over GF(2) on bit-packed rows
+
+    Each measurement y is stored as a Python int where bit i is the
+    coefficient of s_i. Rows are kept in echelon form keyed by their
+    leading bit, so adding a sample costs at most n word-sized XORs and
+    works for n in the hundreds.
+    """
+
+    def __init__(self, n: int):
+        self.n = n
+        self.pivots: Dict[int, int] = {}  # leading bit -> reduced row
+        self.equations: List[int] = []    # independent samples as measured
+
+    @property
+    def rank(self) -> int:
+        return len(self.pivots)
+
+    def add(self, y: int) -> bool:
+        """Reduce y against the basis, returns True if it was independent"""
+        row = y
+        while row:
+            lead = row.bit_length() - 1
+            pivot_row = self.pivots.get(lead)
+            if pivot_row is None:
+                self.pivots[lead] = row
+                self.equations.append(y)
+                return True
+            row ^= pivot_row
+        return False
+
+    def solve(self) -> Optional[int]:
+        """Return the unique non-zero s with y·s = 0 for every row
+
+        Only defined once the rank is n-1; returns None otherwise.
+        """
+        if self.rank != self.n - 1:
+            return None
+
+        free_bits = [bit for bit in range(self.n) if bit not in self.pivots]
+        s = 1 << free_bits[0]
+
+        # Rows only contain bits at or below their leading bit, so
+        # back-substitution from the lowest pivot upwards is enough
+        for lead in sorted(self.pivots):
+            if bin(self.pivots[lead] & s).count("1") & 1:
+                s |= 1 << lead
+        return s
+
+def bits_to_int(bits: str) -> int:
+    """Pack a bit string where character i is bit i into an int"""
+    return sum(1 << i for i, bit in enumerate(bits) if bit == '1')
+
+def int_to_bits(value: int, n: int) -> str:
+    """Unpack an int into a bit string where character i is bit i"""
+    return ''.join('1' if (value >> i) & 1 else '0' for i in range(n))
+
+def format_equation(y: int, n: int) -> str:
+    """Format a measurement y as the constraint y·s = 0 (mod 2)"""
+    terms = [f's_{i}' for i in range(n) if (y >> i) & 1]
+    return ' ⊕ '.join(terms) + ' = 0'
+
+def input_register_distribution(probabilities: List[float], n: int) -> np.ndarray:
+    """Marginal distribution of the measured input register (qubits 0..n-1)"""
+    probs = np.asarray(probabilities, dtype=float).reshape(2 ** n, 2 ** n)
+    marginal = probs.sum(axis=0)
+    return marginal / marginal.sum()
+
+def sample_until_rank(distribution: np.ndarray, n: int, rng: np.random.Generator,
+                      max_queries: Optional[int] = None) -> tuple:
+    """Query the oracle one sample at a time until rank n-1 is reached
+
+    Returns (reducer, oracle_queries).
+    """
+    if max_queries is None:
+        max_queries = max(4 * n, n + 20)
+
+    reducer = GF2RowReducer(n)
+    queries = 0
+    while reducer.rank < n - 1 and queries < max_queries:
+        # Draw in small chunks but count (and stop) per sample
+        for y in rng.choice(len(distribution), size=n, p=distribution):
+            queries += 1
+            reducer.add(int(y))
+            if reducer.rank >= n - 1 or queries >= max_queries:
+                break
+    return reducer, queries
+
+def extract_linear_equations(reducer: GF2RowReducer) -> List[str]:
+    """Independent linear equations collected by the solver"""
+    return [format_equation(y, reducer.n) for y in reducer.equations]
+
+def solve_linear_system(reducer: GF2RowReducer, table: Optional[np.ndarray] = None) -> str:
+    """Recover the period from the reduced system
+
+    Returns all zeros if the system is underdetermined or, when the
+    function table is known, if the candidate fails the classical check
+    f(s) = f(0) (i.e. f is 1-to-1).
+    """
+    s = reducer.solve()
+    if s is not None and table is not None and table[s] != table[0]:
+        s = None
+    return int_to_bits(s or 0, reducer.n)
 
 @router.post("/simon/run", response_model=SimonResponse)
 async def run_simon_algorithm(request: SimonRequest):
@@ -179,41 +263,60 @@ async def run_simon_algorithm(request: SimonRequest):
                 detail="Number of qubits must be even for Simon's algorithm"
             )
         
+        if request.num_qubits > MAX_SIMON_QUBITS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Simon's algorithm supports at most {MAX_SIMON_QUBITS} qubits"
+            )
+        
         n = request.num_qubits // 2
+        padded_period = request.hidden_period.ljust(n, '0')[:n]
+        period = bits_to_int(padded_period)
+        
+        # Build the 2-to-1 function f and evolve the state through it,
+        # shared with identical requests in flight
+        oracle_table = tuple(request.oracle_table) if request.oracle_table is not None else None
+        try:
+            table, statevector, probabilities, distribution = await execution_service.coalesce(
+                ("simon", period, n, request.oracle_seed, oracle_table),
+                lambda: get_simon_state(period, n, request.oracle_seed, request.oracle_table)
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
-        # Create and simulate circuit
-        circuit = create_simon_circuit(request.hidden_period, request.num_qubits)
-        statevector, probabilities, counts = simulate_simon(circuit)        # Extract linear equations and solve
-        linear_equations = extract_linear_equations(counts, request.hidden_period, n)
-        recovered_period = solve_linear_system(linear_equations, n, request.hidden_period)
+        # Sample the oracle adaptively and solve the system over GF(2)
+        rng = np.random.default_rng(request.seed)
+        counts = sample_measurement_counts(distribution, n, 1024, rng)
+        reducer, oracle_queries = sample_until_rank(distribution, n, rng)
+        linear_equations = extract_linear_equations(reducer)
+        recovered_period = solve_linear_system(reducer, table)
         
-        # Debug output
-        print(f"Simon's Algorithm Debug:")
-        print(f"  Input hidden_period: {request.hidden_period}")
-        print(f"  Measurement counts: {counts}")
-        print(f"  Linear equations: {linear_equations}")
-        print(f"  Recovered period: {recovered_period}")
+        logger.debug("simon run", extra={"hidden_period": request.hidden_period, "oracle_queries": oracle_queries,
+                                         "linear_equations": linear_equations, "recovered_period": recovered_period})
         
         # Convert statevector to JSON-serializable format
-        quantum_state = [ComplexNumber(real=float(amp.real), imag=float(amp.imag)) for amp in statevector]
+        quantum_state = to_complex_numbers(statevector)
         
         # Prepare circuit data for visualization
         circuit_data = {
             "num_qubits": request.num_qubits,
             "hidden_period": request.hidden_period,
-            "gates": extract_gate_sequence(circuit)
+            "gates": simon_gate_sequence(n)
         }
         
         return SimonResponse(
             success=True,            circuit_data=circuit_data,
             quantum_state=quantum_state,
-            probabilities=probabilities,
+            probabilities=probabilities.tolist(),
             measurement_counts=counts,
             linear_equations=linear_equations,
             recovered_period=recovered_period,
-            hidden_period=request.hidden_period
+            hidden_period=request.hidden_period,
+            oracle_queries=oracle_queries
         )
         
+    except (HTTPException, Cancelled):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -222,26 +325,6 @@ async def simulate_simon_algorithm(request: SimonRequest):
     """Alias for /simon/run - simulate Simon's algorithm"""
     return await run_simon_algorithm(request)
 
-def extract_gate_sequence(circuit: QuantumCircuit) -> List[Dict[str, Any]]:
-    """Extract gate sequence from circuit for visualization"""
-    gates = []
-    for instruction in circuit.data:
-        try:
-            gate_info = {
-                "name": instruction.operation.name,
-                "qubits": [q.index for q in instruction.qubits],
-                "params": instruction.operation.params if hasattr(instruction.operation, 'params') else []
-            }
-            gates.append(gate_info)
-        except Exception as e:
-            # Fallback for any instruction format issues
-            gates.append({
-                "name": "unknown",
-                "qubits": [],
-                "params": []
-            })
-    return gates
-
 @router.get("/simon/info")
 async def get_simon_info():
     """Get information about Simon's algorithm"""
@@ -1,16 +1,18 @@
 from fastapi import APIRouter, HTTPException
 from pydantic import BaseModel
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, TYPE_CHECKING
 import numpy as np
-from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-from qiskit_aer import StatevectorSimulator, QasmSimulator
+from app.utils.cancellation import Cancelled
+from app.utils.canonical import circuit_hash
+from app.utils.execution import ComplexNumber, execution_service, to_complex_numbers
+from app.utils.log import get_logger, lazy
+from app.utils.timing import TimedRoute, phase
 
-router = APIRouter()
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
 
-class ComplexNumber(BaseModel):
-    """Pydantic-compatible complex number representation"""
-    real: float
-    imag: float
+router = APIRouter(route_class=TimedRoute)
+logger = get_logger(__name__)
 
 class GateOperation(BaseModel):
     """Represents a quantum gate operation"""
@@ -41,33 +43,51 @@ class SimulatorResponse(BaseModel):
     circuit_data: Dict[str, Any]
     error_message: Optional[str] = None
 
-def create_quantum_circuit(qubits: int, gates: List[GateOperation]) -> QuantumCircuit:
+# Gates this router applies, any other name is skipped
+SIMULATOR_GATES = {'H', 'X', 'Y', 'Z', 'T', 'S', 'CNOT', 'RX', 'RY', 'RZ'}
+
+# Angle used when a rotation is sent without a parameter
+DEFAULT_ANGLES = {'RZ': np.pi / 4, 'RX': np.pi / 2, 'RY': np.pi / 2}
+
+def executed_gates(gates: List[GateOperation]) -> List[GateOperation]:
+    """The gates this router runs, in order, with default angles filled in and unknown gates dropped
+
+    Hashing this list rather than the request keys coalescing on what is
+    actually simulated: canonical forms alias CX to CNOT and default angles
+    to 0, neither of which matches this router.
+    """
+    executed = []
+    for gate in sorted(gates, key=lambda g: g.timeStep):
+        name = gate.name.upper()
+        if name not in SIMULATOR_GATES:
+            continue
+        parameter = gate.parameter
+        if name in DEFAULT_ANGLES and parameter is None:
+            parameter = DEFAULT_ANGLES[name]
+        executed.append(gate.model_copy(update={"name": name, "parameter": parameter}))
+    return executed
+
+def create_quantum_circuit(qubits: int, gates: List[GateOperation]) -> "QuantumCircuit":
     """Create a quantum circuit from gate operations"""
+    from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
     qreg = QuantumRegister(qubits, 'q')
     creg = ClassicalRegister(qubits, 'c')
     circuit = QuantumCircuit(qreg, creg)
     
-    print(f"Creating circuit with {qubits} qubits and {len(gates)} gates")
+    logger.debug("creating circuit", extra={"qubits": qubits, "gates": len(gates)})
     
-    if len(gates) == 0:
-        print("No gates provided - creating empty circuit (initial |00...0⟩ state)")
-    else:
-        # Sort gates by time step to ensure proper order
-        sorted_gates = sorted(gates, key=lambda g: g.timeStep)
-        
-        print(f"Sorted gates: {[(g.name, g.qubit, g.timeStep) for g in sorted_gates]}")
-        
-        for gate in sorted_gates:
-            print(f"Applying gate: {gate.name} on qubit {gate.qubit} at time {gate.timeStep}")
-            apply_gate_to_circuit(circuit, gate, qubits)
+    # Sort gates by time step to ensure proper order
+    for gate in sorted(gates, key=lambda g: g.timeStep):
+        apply_gate_to_circuit(circuit, gate, qubits)
     
     # Add measurements at the end
     circuit.measure_all()
     
-    print(f"Final circuit:\n{circuit}")
+    # The ASCII diagram is only drawn when debug records are written
+    logger.debug("final circuit:\n%s", lazy(circuit.draw, "text"))
     return circuit
 
-def apply_gate_to_circuit(circuit: QuantumCircuit, gate: GateOperation, qubits: int):
+def apply_gate_to_circuit(circuit: "QuantumCircuit", gate: GateOperation, qubits: int):
     """Apply a single gate operation to the circuit"""
     qubit = gate.qubit
     
@@ -97,82 +117,50 @@ def apply_gate_to_circuit(circuit: QuantumCircuit, gate: GateOperation, qubits:
                 raise ValueError(f"Invalid target qubit {gate.target_qubit}")
             circuit.cx(qubit, gate.target_qubit)
         elif gate_name == 'RZ':
-            angle = gate.parameter if gate.parameter is not None else np.pi/4
+            angle = gate.parameter if gate.parameter is not None else DEFAULT_ANGLES['RZ']
             circuit.rz(angle, qubit)
         elif gate_name == 'RX':
-            angle = gate.parameter if gate.parameter is not None else np.pi/2
+            angle = gate.parameter if gate.parameter is not None else DEFAULT_ANGLES['RX']
             circuit.rx(angle, qubit)
         elif gate_name == 'RY':
-            angle = gate.parameter if gate.parameter is not None else np.pi/2
+            angle = gate.parameter if gate.parameter is not None else DEFAULT_ANGLES['RY']
             circuit.ry(angle, qubit)
         else:
-            print(f"Warning: Unknown gate '{gate_name}', skipping...")
+            logger.warning("unknown gate %s, skipping", gate_name)
             
     except Exception as e:
-        print(f"Error applying gate {gate_name}: {e}")
+        logger.debug("error applying gate %s: %s", gate_name, e)
         raise
 
-def simulate_quantum_circuit(circuit: QuantumCircuit) -> tuple:
+def simulate_quantum_circuit(circuit: "QuantumCircuit", shots: int = 1024) -> tuple:
     """Simulate quantum circuit and return state vector and measurement results"""
     try:
-        print(f"Simulating circuit with {circuit.num_qubits} qubits")
-        print(f"Circuit instructions: {[instr.operation.name for instr in circuit.data]}")
-        
-        # Create a copy for statevector simulation (without measurements)
-        statevector_circuit = QuantumCircuit(circuit.num_qubits)
-        
-        # Copy all gates except measurements
-        gate_count = 0
-        for instruction in circuit.data:
-            if instruction.operation.name not in ['measure', 'barrier']:
-                statevector_circuit.append(instruction.operation, instruction.qubits)
-                gate_count += 1
-        
-        print(f"Statevector circuit gates: {[instr.operation.name for instr in statevector_circuit.data]}")
-        print(f"Number of gates in statevector circuit: {gate_count}")
-        print(f"Full circuit:\n{statevector_circuit}")
-        
-        # State vector simulation using StatevectorSimulator
-        if gate_count == 0:
-            print("Empty circuit detected - creating initial state |00...0⟩")
-            # For empty circuits, create the initial state manually
-            num_states = 2 ** circuit.num_qubits
-            statevector = np.zeros(num_states, dtype=complex)
-            statevector[0] = 1.0  # |00...0⟩ state
-        else:
-            simulator = StatevectorSimulator()
-            job = simulator.run(statevector_circuit, shots=1)
-            result = job.result()
-            statevector = result.get_statevector()
-        print(f"Statevector (raw): {statevector}")
-        print(f"Statevector (array): {np.array(statevector)}")
+        execution = execution_service.run(circuit, shots=shots)
+        logger.debug("simulated circuit", extra={"qubits": circuit.num_qubits, "gates": len(circuit.data), "counts": execution.counts})
         
-        # Calculate probabilities
-        probabilities = np.abs(statevector) ** 2
-        print(f"Probabilities: {probabilities}")
-        
-        # Measurement simulation with original circuit (but ensure it has measurements)
-        measurement_circuit = circuit.copy()
-        if not any(instr.operation.name == 'measure' for instr in measurement_circuit.data):
-            measurement_circuit.measure_all()
-        
-        measurement_simulator = QasmSimulator()
-        measurement_job = measurement_simulator.run(measurement_circuit, shots=1024)
-        measurement_result = measurement_job.result()
-        counts = measurement_result.get_counts()
-        print(f"Measurement counts: {counts}")
-        
-        return statevector, probabilities.tolist(), counts
+        return execution.statevector, execution.probabilities, execution.counts
         
     except Exception as e:
-        print(f"Circuit simulation error: {e}")
-        print(f"Circuit details: {circuit}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        # run_simulator logs the traceback, the diagram is only drawn at debug level
+        logger.debug("circuit simulation failed: %s, circuit:\n%s", e, lazy(circuit.draw, "text"))
         
         # Only use fallback for critical errors, not for normal simulation issues
         raise e
 
+def simulate_gates(qubits: int, gates: List[GateOperation], shots: int = 1024) -> tuple:
+    """Build and simulate the circuit for a gate list"""
+    with phase("circuit"):
+        circuit = create_quantum_circuit(qubits, gates)
+    return simulate_quantum_circuit(circuit, shots)
+
+def warm_up_circuits():
+    """Simulate a Bell pair with shots, so the first custom circuit finds the simulator initialised"""
+    bell = [GateOperation(name="H", qubit=0, timeStep=0),
+            GateOperation(name="CNOT", qubit=0, target_qubit=1, timeStep=1)]
+    simulate_gates(2, bell)
+
+execution_service.register_warmup("simulator", warm_up_circuits)
+
 def create_predefined_algorithm_circuit(algorithm: str, qubits: int) -> List[GateOperation]:
     """Create gate sequences for predefined algorithms"""
     gates = []
@@ -292,25 +280,22 @@ def create_predefined_algorithm_circuit(algorithm: str, qubits: int) -> List[Gat
 async def run_simulator(request: SimulatorRequest):
     """Run quantum circuit simulation"""
     try:
-        print(f"Received simulation request: {request}")
         gates = request.gates
         
         # If algorithm is specified, use predefined gates
         if request.algorithm and request.algorithm != 'custom':
-            print(f"Using predefined algorithm: {request.algorithm}")
             gates = create_predefined_algorithm_circuit(request.algorithm, request.qubits)
+        logger.debug("simulation request", extra={"qubits": request.qubits, "gates": len(gates),
+                                                  "algorithm": request.algorithm, "shots": request.shots})
         
-        print(f"Gates to simulate: {gates}")
-        
-        # Create and simulate circuit
-        circuit = create_quantum_circuit(request.qubits, gates)
-        print(f"Created circuit: {circuit}")
-        
-        statevector, probabilities, counts = simulate_quantum_circuit(circuit)
+        # Create and simulate circuit, shared with identical requests in flight
+        statevector, probabilities, counts = await execution_service.coalesce(
+            ("simulator", request.qubits, request.shots, circuit_hash(executed_gates(gates), request.qubits)),
+            lambda: simulate_gates(request.qubits, gates, request.shots)
+        )
         
         # Convert statevector to JSON-serializable format
-        quantum_state = [ComplexNumber(real=float(amp.real), imag=float(amp.imag)) 
-                        for amp in statevector]
+        quantum_state = to_complex_numbers(statevector)
         
         # Calculate circuit metrics
         if len(gates) > 0:
@@ -327,9 +312,6 @@ async def run_simulator(request: SimulatorRequest):
             "qubits": request.qubits
         }
         
-        print(f"Simulation successful. Probabilities: {probabilities}")
-        print(f"State vector magnitudes: {[abs(amp) for amp in statevector]}")
-        
         return SimulatorResponse(
             success=True,
             qubits=request.qubits,
@@ -341,10 +323,10 @@ async def run_simulator(request: SimulatorRequest):
             circuit_data=circuit_data
         )
         
+    except Cancelled:
+        raise
     except Exception as e:
-        print(f"Simulation failed with error: {e}")
-        import traceback
-        print(f"Full traceback: {traceback.format_exc()}")
+        logger.exception("simulation failed")
         
         return SimulatorResponse(
             success=False,
@@ -0,0 +1,196 @@
+import hashlib
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+
+from app.exercise_checker.quantum_simulator import parse_gate_operations, prepare_circuit
+from app.exercise_checker.scoring import score_batch
+from app.utils.cache import LRUCache
+from app.utils.cancellation import check_cancelled
+from app.utils.exercise_manager import CompiledTarget, ExerciseCatalog
+from app.utils.statevector import NativeGate, apply_gate, zero_state
+
+# Step-by-step analysis of a circuit against an exercise's reference solution.
+#
+# The circuit is evolved once, keeping the state after every gate. Those
+# states are cached under a rolling hash of the canonical gate prefix that
+# produced them, so re-analysing a circuit after editing its last few gates
+# only simulates the gates after the edit. Unitary exercises track the
+# prefix operator instead of the prefix state.
+#
+# A step is on the reference path when its state matches (up to global
+# phase) some state the reference solution passes through. The divergence
+# step is the gate after which the circuit never returns to that path.
+#
+# A unitary prefix takes 16·4^n bytes (16 MB at 10 qubits), so the prefix
+# cache is bounded by bytes as well as entries, and a request is limited to
+# MAX_ANALYSIS_GATES gates and MAX_ANALYSIS_BYTES for all of its prefixes
+# (see check_analysis_size).
+
+# Longest circuit a single analysis request may step through
+MAX_ANALYSIS_GATES = int(os.getenv("ANALYSIS_MAX_GATES", "500"))
+
+# Memory allowed for the prefix states (or operators) of one analysis request
+MAX_ANALYSIS_BYTES = int(os.getenv("ANALYSIS_MAX_BYTES", str(64 * 2 ** 20)))
+
+def analysis_mode(target: CompiledTarget) -> str:
+    """Unitary exercises track prefix operators, all others prefix states"""
+    return "unitary" if target.kind == "unitary" else "state"
+
+def step_bytes(num_qubits: int, mode: str) -> int:
+    """Bytes of one complex prefix state, or operator in unitary mode"""
+    dimension = 2 ** num_qubits
+    return 16 * dimension * (dimension if mode == "unitary" else 1)
+
+def check_analysis_size(num_gates: int, num_qubits: int, mode: str) -> None:
+    """Raise ValueError when analysing the circuit would exceed the per-request limits"""
+    if num_gates > MAX_ANALYSIS_GATES:
+        raise ValueError(f"Step analysis is limited to {MAX_ANALYSIS_GATES} gates, got {num_gates}")
+    needed = (num_gates + 1) * step_bytes(num_qubits, mode)
+    if needed > MAX_ANALYSIS_BYTES:
+        raise ValueError(f"Step analysis of {num_gates} gates on {num_qubits} qubits ({mode} mode) needs "
+                         f"{needed // 2 ** 20} MB, more than the {MAX_ANALYSIS_BYTES // 2 ** 20} MB allowed")
+
+def prefix_keys(gates: List[NativeGate], num_qubits: int, mode: str) -> List[str]:
+    """Rolling hash of every prefix of gates, from the empty circuit to the full one"""
+    key = hashlib.blake2b(f"{mode}:{num_qubits}".encode(), digest_size=16).hexdigest()
+    keys = [key]
+    for gate in gates:
+        key = hashlib.blake2b(f"{key}|{gate.name}|{gate.qubits}|{gate.parameter}".encode(), digest_size=16).hexdigest()
+        keys.append(key)
+    return keys
+
+class PrefixStateCache:
+    """States (or operators) after each prefix of a circuit, shared across requests"""
+
+    def __init__(self, max_size: int = 4096, max_bytes: Optional[int] = 256 * 2 ** 20):
+        self.cache = LRUCache(max_size, max_bytes)
+
+    def evolve(self, gates: List[NativeGate], num_qubits: int, mode: str = "state") -> Tuple[List[np.ndarray], int]:
+        """States after 0, 1, ..., len(gates) gates, returns (states, prefixes served from cache)"""
+        keys = prefix_keys(gates, num_qubits, mode)
+        states = []
+        reused = 0
+        for i, key in enumerate(keys):
+            check_cancelled()
+            state = self.cache.get(key)
+            if state is not None:
+                reused += 1
+            else:
+                if i == 0:
+                    dimension = 2 ** num_qubits
+                    state = np.eye(dimension, dtype=complex) if mode == "unitary" else zero_state(num_qubits)
+                else:
+                    # Row i of a unitary-mode batch is U|i⟩, the same layout apply_gate uses for batches
+                    state = apply_gate(states[-1], gates[i - 1], num_qubits)
+                state.setflags(write=False)
+                self.cache.put(key, state)
+            states.append(state)
+        return states, reused
+
+    def clear(self) -> None:
+        self.cache.clear()
+
+def gate_summary(gate: NativeGate) -> Dict[str, Any]:
+    return {"name": gate.name, "qubits": list(gate.qubits), "parameter": gate.parameter}
+
+def path_fidelities(user: np.ndarray, reference: np.ndarray, mode: str) -> np.ndarray:
+    """Fidelity up to global phase between every user step (rows) and reference step (columns)"""
+    if mode == "unitary":
+        dimension = user.shape[-1]
+        return np.abs(np.einsum('jab,iab->ij', reference.conj(), user)) ** 2 / dimension ** 2
+    return np.abs(user @ reference.conj().T) ** 2
+
+class CircuitAnalyzer:
+    """Finds where a circuit leaves its exercise's reference solution"""
+
+    def __init__(self, prefix_cache: PrefixStateCache):
+        self.prefix_cache = prefix_cache
+        # (catalog version, exercise id) -> (reference gates, reference states)
+        self._references: Dict[Tuple[int, str], Tuple[List[NativeGate], np.ndarray]] = {}
+        self._lock = threading.Lock()
+
+    def clear_references(self, *_) -> None:
+        """Drop reference paths, registered as an exercise reload listener"""
+        with self._lock:
+            self._references.clear()
+
+    def reference_path(self, catalog: ExerciseCatalog, exercise_id: str, mode: str):
+        """Gates and stacked prefix states of the exercise's solution, None without one"""
+        key = (catalog.version, exercise_id)
+        with self._lock:
+            if key in self._references:
+                return self._references[key]
+        solution = catalog.get_solution(exercise_id)
+        if not solution:
+            return None
+        target = catalog.get_target(exercise_id)
+        gates = prepare_circuit(parse_gate_operations(solution), target.num_qubits).native
+        states, _ = self.prefix_cache.evolve(gates, target.num_qubits, mode)
+        reference = (gates, np.stack(states))
+        with self._lock:
+            self._references[key] = reference
+        return reference
+
+    def analyze(self, catalog: ExerciseCatalog, exercise_id: str, gates: List[NativeGate]) -> Dict[str, Any]:
+        target: CompiledTarget = catalog.get_target(exercise_id)
+        mode = analysis_mode(target)
+        states, reused = self.prefix_cache.evolve(gates, target.num_qubits, mode)
+        user = np.stack(states)
+
+        # Distance to the target after every prefix, scored in one batch
+        if target.kind == "probabilities":
+            candidates = np.abs(user) ** 2
+        elif target.kind == "unitary":
+            candidates = user.transpose(0, 2, 1)
+        else:
+            candidates = user
+        passed, scores, errors = score_batch(target.kind, target.data, candidates, target.tolerance)
+
+        reference = self.reference_path(catalog, exercise_id, mode)
+        on_path = reference_steps = best = None
+        if reference is not None:
+            fidelities = path_fidelities(user, reference[1], mode)
+            matches = fidelities >= 1 - target.tolerance
+            on_path = matches.any(axis=1)
+            # Latest reference step each user step matches, -1 if none
+            reference_steps = np.where(on_path, fidelities.shape[1] - 1 - np.argmax(matches[:, ::-1], axis=1), -1)
+            best = fidelities.max(axis=1)
+
+        steps = []
+        for i, gate in enumerate(gates, start=1):
+            step = {
+                "step": i,
+                "gate": gate_summary(gate),
+                "target_error": float(errors[i]),
+                "target_score": int(scores[i])
+            }
+            if reference is not None:
+                step["on_reference_path"] = bool(on_path[i])
+                step["reference_step"] = int(reference_steps[i]) if on_path[i] else None
+                step["reference_fidelity"] = float(best[i])
+            steps.append(step)
+
+        divergence = None
+        if reference is not None and not passed[-1]:
+            # The empty prefix always matches the reference's starting point
+            last_on_path = int(np.flatnonzero(on_path)[-1])
+            reference_gates = reference[0]
+            next_reference = int(reference_steps[last_on_path])
+            divergence = {
+                "step": last_on_path + 1,
+                "gate": gate_summary(gates[last_on_path]) if last_on_path < len(gates) else None,
+                "expected_gate": gate_summary(reference_gates[next_reference]) if next_reference < len(reference_gates) else None,
+                "steps_on_path": last_on_path
+            }
+
+        return {
+            "exercise_id": exercise_id,
+            "passed": bool(passed[-1]),
+            "score": int(scores[-1]),
+            "has_reference": reference is not None,
+            "steps": steps,
+            "divergence": divergence,
+            "reused_prefix_states": reused
+        }
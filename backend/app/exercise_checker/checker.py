@@ -1,5 +1,9 @@
 from fastapi import APIRouter, HTTPException
-from typing import Dict
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from typing import Dict, List, Optional
+import json
+import numpy as np
 import sys
 import os
 
@@ -7,24 +11,123 @@ import os
 backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 sys.path.append(backend_dir)
 
-from utils.exercise_manager import ExerciseManager
-from exercise_checker.quantum_simulator import QuantumSimulator
+from utils.exercise_manager import ExerciseManager, CompiledTarget
+from exercise_checker.quantum_simulator import (
+    DEFAULT_OUTPUTS,
+    OUTPUT_FIELDS,
+    TARGET_OUTPUTS,
+    QuantumSimulator,
+    SimulationResult,
+    optimization_level,
+    parse_gate_operations,
+    prepare_circuit,
+)
+from exercise_checker.scoring import score_batch, scores_from_error
+from exercise_checker.equivalence import EquivalenceCheck
+from exercise_checker.grading import BulkGrader
+from exercise_checker.analysis import CircuitAnalyzer, PrefixStateCache, analysis_mode, check_analysis_size
+from app.utils.cancellation import Cancelled
+from app.utils.canonical import canonical_hash, circuit_hash
+from app.utils.execution import execution_service
+from app.utils.submission_store import submission_store
+from app.utils.log import get_logger
+from app.utils.metrics import track_cache
+from app.utils.timing import TimedRoute
 
-router = APIRouter()
+router = APIRouter(route_class=TimedRoute)
+logger = get_logger(__name__)
 
 # Initialize managers
 exercise_manager = ExerciseManager("app/utils/exercises_list.json")
 simulator = QuantumSimulator()
+analyzer = CircuitAnalyzer(PrefixStateCache(int(os.getenv("PREFIX_CACHE_SIZE", "4096")),
+                                            int(os.getenv("PREFIX_CACHE_BYTES", str(256 * 2 ** 20)))))
+exercise_manager.add_reload_listener(analyzer.clear_references)
+track_cache("prefix_states", analyzer.prefix_cache.cache)
+
+# Upper bound on submissions accepted by one bulk grading request
+MAX_BULK_SUBMISSIONS = 5000
+
+def requested_outputs(body: Dict) -> set:
+    """Extra result fields asked for with "include", validated against OUTPUT_FIELDS"""
+    include = body.get("include", [])
+    if not isinstance(include, list):
+        raise HTTPException(status_code=400, detail="include must be a list of field names")
+    unknown = set(include) - set(OUTPUT_FIELDS)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown result fields {sorted(unknown)}, expected any of {list(OUTPUT_FIELDS)}")
+    return set(include)
+
+class BulkSubmission(BaseModel):
+    user_id: str = "anonymous"
+    exercise_id: str
+    circuit: List[Dict] = []
+
+class BulkGradeRequest(BaseModel):
+    submissions: List[BulkSubmission]
+    optimize: bool = True
 
 @router.get("/exercises")
-async def get_all_exercises():
-    """Get all available exercises"""
+async def get_all_exercises(tag: Optional[str] = None, difficulty: Optional[str] = None):
+    """Get all available exercises, optionally filtered by tag and/or difficulty"""
     try:
-        exercises = exercise_manager.get_all_exercises()
-        return {"exercises": exercises, "count": len(exercises)}
+        catalog = exercise_manager.catalog
+        exercises = catalog.list_exercises(tag=tag, difficulty=difficulty)
+        return {"exercises": exercises, "count": len(exercises), "version": catalog.version}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching exercises: {str(e)}")
 
+@router.post("/exercises/grade/bulk")
+async def grade_submissions_bulk(request: BulkGradeRequest):
+    """Grade many submissions at once, streaming one NDJSON line per submission
+
+    Identical circuits are simulated once. Lines come grouped by exercise and
+    carry the submission's index in the request; the last line is a summary.
+    """
+    if len(request.submissions) > MAX_BULK_SUBMISSIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_SUBMISSIONS} submissions per request")
+
+    grader = BulkGrader(exercise_manager.catalog, optimize=request.optimize)
+    submissions = [submission.model_dump() for submission in request.submissions]
+
+    def lines():
+        for result in grader.grade(submissions):
+            if "passed" in result:
+                submission_store.record(result["user_id"], result["exercise_id"], result["passed"],
+                                        result["score"], result["circuit_hash"])
+            yield json.dumps(result) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+# Routes that query the submission store or simulate without coalescing
+# are plain functions, which FastAPI runs in its threadpool (with the
+# request's cancellation token), so they never block the event loop.
+
+@router.get("/leaderboard")
+def get_leaderboard(limit: int = 10, exercise_id: Optional[str] = None):
+    """Users ranked by exercises solved, then by total best score"""
+    if limit < 1 or limit > 100:
+        raise HTTPException(status_code=400, detail="limit must be between 1 and 100")
+    try:
+        return {"leaderboard": submission_store.leaderboard(limit=limit, exercise_id=exercise_id)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching leaderboard: {str(e)}")
+
+@router.get("/users/{user_id}/progress")
+def get_user_progress(user_id: str):
+    """Best score and attempts for every exercise a user has submitted"""
+    try:
+        exercises = submission_store.user_progress(user_id)
+        return {
+            "user_id": user_id,
+            "exercises": exercises,
+            "attempted": len(exercises),
+            "solved": sum(1 for e in exercises if e["solved"]),
+            "total_exercises": len(exercise_manager.get_all_exercises())
+        }
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching progress: {str(e)}")
+
 @router.get("/exercises/{exercise_id}")
 async def get_exercise(exercise_id: str):
     """Get a specific exercise by ID"""
@@ -38,43 +141,104 @@ async def get_exercise(exercise_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error fetching exercise: {str(e)}")
 
+@router.get("/exercises/{exercise_id}/stats")
+def get_exercise_stats(exercise_id: str):
+    """Attempts and pass rates for an exercise"""
+    try:
+        if not exercise_manager.get_exercise(exercise_id):
+            raise HTTPException(status_code=404, detail=f"Exercise {exercise_id} not found")
+        return submission_store.exercise_stats(exercise_id)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error fetching exercise stats: {str(e)}")
+
 @router.post("/exercises/{exercise_id}/submit")
-async def submit_exercise_solution(exercise_id: str, submission: Dict):
+def submit_exercise_solution(exercise_id: str, submission: Dict):
     """Submit a solution for an exercise and get feedback"""
     try:
         
-        # Get the exercise
-        exercise = exercise_manager.get_exercise(exercise_id)
+        # Get the exercise and its target from the same catalog version
+        catalog = exercise_manager.catalog
+        exercise = catalog.get_exercise(exercise_id)
         if not exercise:
             raise HTTPException(status_code=404, detail=f"Exercise {exercise_id} not found")
         
         # Extract circuit from submission
         user_circuit = submission.get("circuit", [])
         user_id = submission.get("user_id", "anonymous")
+        target = catalog.get_target(exercise_id)
+        if target.method == "randomized":
+            # Checked on random input states, the unitary itself is never built
+            outputs = requested_outputs(submission)
+            if "unitary" in outputs:
+                raise HTTPException(status_code=400, detail=f"Exercise {exercise_id} is too large to return its unitary")
+            level = "unitary"
+        else:
+            outputs = {TARGET_OUTPUTS[target.kind]} | requested_outputs(submission)
+            level = optimization_level(outputs)
+        if not submission.get("optimize", True):
+            level = None
         
-        
-        # Simulate the user's circuit
-        num_qubits = exercise["num_qubits"]
-        sim_result = simulator.simulate_circuit(user_circuit, num_qubits)
+        # Simulate the user's circuit, computing only what the target and request need
+        result = simulator.simulate(user_circuit, exercise["num_qubits"], optimize_level=level)
         
         # Check the solution
-        passed, score = check_exercise_solution(exercise, sim_result)
+        passed, score = check_exercise_solution(target, result)
+        submission_store.record(user_id, exercise_id, passed, score)
         
-        return {
+        response = {
             "exercise_id": exercise_id,
             "passed": passed,
             "score": score,
-            "simulation_result": sim_result,
+            "simulation_result": result.to_dict(outputs),
             "target_data": exercise["target_data"]
         }
+        if result.optimization is not None:
+            response["optimization"] = result.optimization.to_dict()
+        return response
         
-    except HTTPException:
+    except (HTTPException, Cancelled):
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception("error submitting solution", extra={"exercise_id": exercise_id})
         raise HTTPException(status_code=500, detail=f"Error submitting solution: {str(e)}")
 
+@router.post("/exercises/{exercise_id}/analyze")
+async def analyze_exercise_circuit(exercise_id: str, circuit_data: Dict):
+    """Compare every step of a circuit with the exercise's reference solution
+
+    Reports the distance to the target after each gate and the step at which
+    the circuit leaves the reference solution's path for good.
+    """
+    try:
+        catalog = exercise_manager.catalog
+        exercise = catalog.get_exercise(exercise_id)
+        if not exercise:
+            raise HTTPException(status_code=404, detail=f"Exercise {exercise_id} not found")
+        if catalog.get_target(exercise_id).method == "randomized":
+            raise HTTPException(status_code=400, detail=f"Exercise {exercise_id} is checked by randomized equivalence and has no step analysis")
+        
+        num_qubits = exercise["num_qubits"]
+        try:
+            gate_operations = parse_gate_operations(circuit_data.get("circuit", []))
+            prepared = prepare_circuit(gate_operations, num_qubits)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=f"Invalid circuit: {str(e)}")
+        try:
+            check_analysis_size(len(prepared.native), num_qubits, analysis_mode(catalog.get_target(exercise_id)))
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        # Off the event loop, shared with identical analyses in flight
+        key = ("exercise-analyze", catalog.version, exercise_id, canonical_hash(prepared.canonical, num_qubits))
+        return await execution_service.coalesce(key, lambda: analyzer.analyze(catalog, exercise_id, prepared.native))
+        
+    except (HTTPException, Cancelled):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error analyzing circuit: {str(e)}")
+
 @router.post("/exercises/{exercise_id}/simulate")
 async def simulate_exercise_circuit(exercise_id: str, circuit_data: Dict):
     """Simulate a circuit without submitting (for testing/preview)"""
@@ -85,115 +249,95 @@ async def simulate_exercise_circuit(exercise_id: str, circuit_data: Dict):
         
         user_circuit = circuit_data.get("circuit", [])
         num_qubits = exercise["num_qubits"]
+        outputs = set(DEFAULT_OUTPUTS) | requested_outputs(circuit_data)
+        optimize = bool(circuit_data.get("optimize", True))
         
-        sim_result = simulator.simulate_circuit(user_circuit, num_qubits)
+        # Shared with identical previews in flight, e.g. a whole class pressing Run
+        key = ("exercise-simulate", num_qubits, circuit_hash(parse_gate_operations(user_circuit), num_qubits),
+               frozenset(outputs), optimize)
+        sim_result = await execution_service.coalesce(
+            key, lambda: simulator.simulate_circuit(user_circuit, num_qubits, outputs=outputs, optimize=optimize)
+        )
         
         return {
             "simulation_result": sim_result,
             "target_data": exercise["target_data"]
         }
         
-    except HTTPException:
+    except (HTTPException, Cancelled):
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error simulating circuit: {str(e)}")
 
-def check_exercise_solution(exercise: Dict, sim_result: Dict) -> tuple:
-    """Check if the simulation result matches the exercise target"""
-    target_type = exercise["target_type"]
-    target_data = exercise["target_data"]
-    tolerance = target_data.get("tolerance", 0.001)
-    
-    if target_type == "state_vector":
-        return check_state_vector_match(target_data, sim_result, tolerance)
-    elif target_type == "probabilities":
-        return check_probability_match(target_data, sim_result, tolerance)
-    elif target_type == "measurement":
-        return check_measurement_match(target_data, sim_result, tolerance)
+def check_exercise_solution(target: CompiledTarget, result: SimulationResult) -> tuple:
+    """Check if the simulation result matches the exercise's precompiled target
+
+    Only the output the target is compared against is computed.
+    """
+    if target.kind == "statevector":
+        return check_state_vector_match(target.data, result.state, target.tolerance)
+    elif target.kind == "probabilities":
+        return check_probability_match(target.data, result.probabilities, target.tolerance)
+    elif target.kind == "unitary" and target.method == "randomized":
+        return check_unitary_equivalence(target, result)
+    elif target.kind == "unitary":
+        return check_unitary_match(target.data, result.unitary, target.tolerance)
     else:
         return False, 0
 
-def check_state_vector_match(target_data: Dict, sim_result: Dict, tolerance: float) -> tuple:
-    """Check if state vectors match within tolerance"""
-    target_state = target_data["state_vector"]
-    actual_state = sim_result.get("state_vector", [])
-    
-    if len(target_state) != len(actual_state):
+def check_state_vector_match(target_state: np.ndarray, actual_state: np.ndarray, tolerance: float) -> tuple:
+    """Check if state vectors match within tolerance, ignoring global phase
+
+    The error is the infidelity 1 - |⟨ψ|φ⟩|².
+    """
+    if actual_state.shape != target_state.shape:
         return False, 0
     
-    # Calculate fidelity (how close the states are)
-    fidelity = 0
-    total_difference = 0
-    
-    for i in range(len(target_state)):
-        # Convert target value to complex
-        if isinstance(target_state[i], (list, tuple)):
-            # Target is complex [real, imag]
-            target_complex = complex(target_state[i][0], target_state[i][1])
-        else:
-            # Target is real number
-            target_complex = complex(target_state[i], 0)
-        
-        # Convert actual value to complex
-        if isinstance(actual_state[i], (list, tuple)):
-            # Actual is complex [real, imag]
-            actual_complex = complex(actual_state[i][0], actual_state[i][1])
-        else:
-            # Actual is real number
-            actual_complex = complex(actual_state[i], 0)
-        
-        # Calculate complex amplitude difference (preserving phase information)
-        amplitude_difference = abs(target_complex - actual_complex)
-        total_difference += amplitude_difference
-        
-        # Calculate fidelity contribution (inner product of complex amplitudes)
-        fidelity += (target_complex.conjugate() * actual_complex).real
-    
-    # Normalize fidelity (optional, for better scoring)
-    # fidelity = fidelity / len(target_state)
-    
-    if total_difference <= tolerance:
-        # For very small differences (near perfect), give a perfect score
-        if total_difference <= tolerance * 0.1:  # If difference is less than 10% of tolerance
-            score = 100
-            return True, score
-        else:
-            # Scale score based on how close to tolerance we are
-            score = max(95, int(100 * (1 - total_difference / tolerance)))
-            return True, score
-    else:
-        # For solutions outside tolerance, use a more forgiving scoring
-        if total_difference < tolerance * 2:  # If reasonably close
-            score = max(70, int(90 * (1 - (total_difference - tolerance) / tolerance)))
-        else:
-            score = max(0, int(50 * (1 - min(total_difference, 1.0))))
-        return False, score
+    passed, scores, _ = score_batch("statevector", target_state, actual_state, tolerance)
+    return bool(passed[0]), int(scores[0])
 
-def check_probability_match(target_data: Dict, sim_result: Dict, tolerance: float) -> tuple:
-    target_probs = target_data["measurement_probabilities"]
-    actual_probs = sim_result.get("probabilities", {})
+def check_probability_match(target_probs: np.ndarray, actual_probs: np.ndarray, tolerance: float) -> tuple:
+    """Check if measurement distributions match, the error is total variation distance"""
+    if actual_probs.shape != target_probs.shape:
+        return False, 0
     
-    total_difference = 0
-    for state, target_prob in target_probs.items():
-        actual_prob = actual_probs.get(state, 0)
-        difference = abs(target_prob - actual_prob)
-        total_difference += difference
+    passed, scores, _ = score_batch("probabilities", target_probs, actual_probs, tolerance)
+    return bool(passed[0]), int(scores[0])
+
+def check_measurement_match(target_probs: np.ndarray, actual_probs: np.ndarray, tolerance: float) -> tuple:
+    return check_probability_match(target_probs, actual_probs, tolerance)
+
+def check_unitary_match(target_unitary: np.ndarray, actual_unitary: np.ndarray, tolerance: float) -> tuple:
+    """Check if circuit unitaries match up to global phase"""
+    if actual_unitary.shape != target_unitary.shape:
+        return False, 0
     
-    if total_difference <= tolerance:
-        # This is less forgiving, may work
-        if total_difference <= tolerance * 0.1:
-            score = 100
-            return True, score
-        else:
-            score = max(95, int(100 * (1 - total_difference / tolerance)))
-            return True, score
-    else:
-        # Probability is more forgiving. God bless quantum
-        if total_difference < tolerance * 2:
-            score = max(70, int(90 * (1 - (total_difference - tolerance) / tolerance)))
-        else:
-            score = max(0, int(50 * (1 - min(total_difference, 1.0))))
-        return False, score
+    passed, scores, _ = score_batch("unitary", target_unitary, actual_unitary, tolerance)
+    return bool(passed[0]), int(scores[0])
+
+def check_unitary_equivalence(target: CompiledTarget, result: SimulationResult) -> tuple:
+    """Check a circuit against a large unitary target on random input states, up to global phase"""
+    error = EquivalenceCheck(target).error(result.native_gates)
+    passed, scores = scores_from_error([error], target.tolerance)
+    return bool(passed[0]), int(scores[0])
+
+def warm_up_grading():
+    """Grade, sample and step-analyze one reference solution per kind of target"""
+    catalog = exercise_manager.catalog
+    seen = set()
+    for exercise in catalog.get_all_exercises():
+        target = catalog.get_target(exercise["id"])
+        if (target.kind, target.method) in seen:
+            continue
+        seen.add((target.kind, target.method))
+        solution = catalog.get_solution(exercise["id"]) or []
+        if target.method == "randomized":
+            check_exercise_solution(target, simulator.simulate(solution, exercise["num_qubits"], optimize_level="unitary"))
+            continue
+        level = optimization_level({TARGET_OUTPUTS[target.kind]})
+        result = simulator.simulate(solution, exercise["num_qubits"], optimize_level=level)
+        check_exercise_solution(target, result)
+        result.counts(1024)
+        analyzer.analyze(catalog, exercise["id"], prepare_circuit(parse_gate_operations(solution), exercise["num_qubits"]).native)
 
-def check_measurement_match(target_data: Dict, sim_result: Dict, tolerance: float) -> tuple:
-    return check_probability_match(target_data, sim_result, tolerance)
+execution_service.register_warmup("exercises", warm_up_grading)
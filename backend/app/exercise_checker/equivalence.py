@@ -0,0 +1,126 @@
+import math
+from typing import Dict, List, Optional
+import numpy as np
+
+from app.exercise_checker.quantum_simulator import parse_gate_operations, prepare_circuit
+from app.utils.exercise_manager import CompiledTarget
+from app.utils.metrics import SIMULATION_SECONDS
+from app.utils.timing import phase
+from app.utils.statevector import NativeGate, apply_gate, simulate, zero_state
+
+# Randomized equivalence checking of unitary targets.
+#
+# Comparing full 2^n x 2^n unitaries stops being feasible around 12 qubits.
+# Instead the student circuit and the reference (the target matrix, or the
+# exercise's solution circuit when there is no matrix) are applied to a
+# batch of random input states, which costs a few statevector runs.
+#
+# Two circuits are equivalent up to global phase when every input gives
+# the same output up to one shared phase, so the error is the worst
+# per-sample infidelity or the spread of the overlap phases, whichever is
+# larger. Circuits made only of Clifford gates are checked on random
+# stabilizer states; anything else on Haar-random states.
+#
+# The number of samples comes from the requested confidence, assuming
+# conservatively that one random state exposes a non-equivalent circuit
+# with probability DETECTION_PROBABILITY. For Haar-random states a single
+# sample already does so almost surely.
+
+DEFAULT_CONFIDENCE = 0.999
+
+DETECTION_PROBABILITY = 0.5
+
+CLIFFORD_GATES = {'H', 'X', 'Y', 'Z', 'S', 'CNOT'}
+
+ROTATIONS = {'RX', 'RY', 'RZ'}
+
+def sample_count(confidence: float = DEFAULT_CONFIDENCE) -> int:
+    """Random states needed to catch a non-equivalent circuit with the given confidence"""
+    if not 0 < confidence < 1:
+        raise ValueError(f"confidence must be between 0 and 1, got {confidence}")
+    return max(1, math.ceil(math.log(1 - confidence) / math.log(1 - DETECTION_PROBABILITY)))
+
+def is_clifford(gates: List[NativeGate]) -> bool:
+    """Whether every gate is a Clifford gate (rotations count when the angle is a multiple of π/2)"""
+    for gate in gates:
+        if gate.name in ROTATIONS:
+            quarter_turns = (gate.parameter or 0.0) / (math.pi / 2)
+            if not math.isclose(quarter_turns, round(quarter_turns), abs_tol=1e-9):
+                return False
+        elif gate.name not in CLIFFORD_GATES:
+            return False
+    return True
+
+def haar_random_states(count: int, num_qubits: int, rng: np.random.Generator) -> np.ndarray:
+    """(count, 2^n) batch of Haar-random states"""
+    shape = (count, 2 ** num_qubits)
+    states = rng.standard_normal(shape) + 1j * rng.standard_normal(shape)
+    return states / np.linalg.norm(states, axis=1, keepdims=True)
+
+def random_stabilizer_states(count: int, num_qubits: int, rng: np.random.Generator) -> np.ndarray:
+    """(count, 2^n) batch of stabilizer states, each prepared by its own random Clifford circuit"""
+    states = []
+    for _ in range(count):
+        state = zero_state(num_qubits)
+        # Linear depth is enough to spread entanglement over every wire
+        for _ in range(num_qubits + 1):
+            for qubit in range(num_qubits):
+                for name in rng.choice(['H', 'S', 'X'], size=rng.integers(0, 3), replace=False):
+                    state = apply_gate(state, NativeGate(str(name), (qubit,)), num_qubits)
+            order = rng.permutation(num_qubits)
+            for control, target in zip(order[0::2], order[1::2]):
+                state = apply_gate(state, NativeGate('CNOT', (int(control), int(target))), num_qubits)
+        states.append(state)
+    return np.stack(states)
+
+def equivalence_error(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Error between reference and candidate outputs (one row per input state), up to a shared global phase"""
+    overlaps = np.einsum('ij,ij->i', expected.conj(), actual)
+    worst_sample = 1 - np.min(np.abs(overlaps) ** 2)
+    phase_spread = 1 - np.abs(overlaps.mean()) ** 2
+    return float(np.clip(max(worst_sample, phase_spread), 0.0, None))
+
+class EquivalenceCheck:
+    """Randomized equivalence test against one unitary target
+
+    Input states and reference outputs are drawn once and reused for every
+    candidate, so bulk grading an exercise shares them across a class.
+    """
+
+    def __init__(self, target: CompiledTarget, seed: Optional[int] = None):
+        self.target = target
+        self.samples = sample_count(target.confidence)
+        self.rng = np.random.default_rng(seed)
+        self.reference_gates: Optional[List[NativeGate]] = None
+        if target.reference:
+            self.reference_gates = prepare_circuit(parse_gate_operations(target.reference), target.num_qubits).native
+        # Clifford flag -> (input states, reference outputs)
+        self._samples: Dict[bool, tuple] = {}
+
+    def _inputs(self, clifford: bool):
+        if clifford not in self._samples:
+            n = self.target.num_qubits
+            if clifford:
+                states = random_stabilizer_states(self.samples, n, self.rng)
+            else:
+                states = haar_random_states(self.samples, n, self.rng)
+            if self.target.data is not None:
+                # Rows are states, so U|ψ⟩ for every row is states @ U^T
+                expected = states @ self.target.data.T
+            else:
+                expected = simulate(self.reference_gates, n, states)
+            self._samples[clifford] = (states, expected)
+        return self._samples[clifford]
+
+    def method_for(self, gates: List[NativeGate]) -> str:
+        """Input states for a candidate: stabilizer states when it and the reference circuit are Clifford, else Haar-random"""
+        if self.reference_gates is not None and self.target.data is None \
+                and is_clifford(self.reference_gates) and is_clifford(gates):
+            return "stabilizer"
+        return "haar"
+
+    def error(self, gates: List[NativeGate]) -> float:
+        states, expected = self._inputs(self.method_for(gates) == "stabilizer")
+        with phase("native_equivalence"), SIMULATION_SECONDS.time(backend="native_equivalence", qubits=self.target.num_qubits):
+            actual = simulate(gates, self.target.num_qubits, states)
+        return equivalence_error(expected, actual)
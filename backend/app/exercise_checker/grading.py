@@ -0,0 +1,143 @@
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+import numpy as np
+
+from app.exercise_checker.quantum_simulator import (
+    TARGET_OUTPUTS,
+    SimulationResult,
+    optimization_level,
+    parse_gate_operations,
+    prepare_circuit,
+)
+from app.exercise_checker.equivalence import EquivalenceCheck
+from app.exercise_checker.scoring import score_batch, scores_from_error
+from app.utils.canonical import canonical_hash
+from app.utils.exercise_manager import CompiledTarget, ExerciseCatalog
+from app.utils.statevector import NativeGate
+
+# Bulk grading of many (user_id, exercise_id, circuit) submissions.
+#
+# Circuits are hashed in canonical form (see app.utils.canonical), so a
+# class full of identical answers is simulated once per distinct circuit.
+# Submissions are graded one exercise at a time and the results for an
+# exercise are yielded as soon as it is done, so the caller can stream them
+# while later exercises are graded. Distinct circuits are simulated into
+# pending results that are scored SCORING_BATCH at a time in one vectorized
+# call, then dropped: only the (passed, score, error) of each circuit is
+# kept, and only until its exercise is finished, so memory stays bounded by
+# one batch of states or unitaries however many submissions arrive. Unitary
+# targets checked by randomized equivalence score each circuit's error
+# instead, with one set of random input states per exercise.
+
+# Distinct results held before they are scored and released
+SCORING_BATCH = 64
+
+def simulate_for_target(native_gates: List[NativeGate], target: CompiledTarget) -> np.ndarray:
+    """Simulate a circuit into the representation the target is compared against"""
+    result = SimulationResult(native_gates, target.num_qubits)
+    if target.kind == "unitary":
+        return result.unitary
+    if target.kind == "probabilities":
+        return result.probabilities
+    return result.state
+
+class BulkGrader:
+    """Grade submissions in bulk, simulating every distinct circuit once per exercise"""
+
+    def __init__(self, catalog: ExerciseCatalog, optimize: bool = True):
+        # One catalog snapshot for the whole run, even if the file is reloaded meanwhile
+        self.catalog = catalog
+        self.optimize = optimize
+        self.unique_circuits = 0
+        self.gates_removed = 0
+
+    def _prepare(self, index: int, submission: Dict) -> Tuple[Optional[str], Dict, Optional[List[NativeGate]]]:
+        """Validate one submission, returns (circuit_hash, result stub, native gates)"""
+        exercise_id = submission.get("exercise_id")
+        stub = {"index": index, "user_id": submission.get("user_id", "anonymous"), "exercise_id": exercise_id}
+        target = self.catalog.get_target(exercise_id)
+        if target is None:
+            stub["detail"] = f"Exercise {exercise_id} not found"
+            return None, stub, None
+        try:
+            level = optimization_level([TARGET_OUTPUTS[target.kind]]) if self.optimize else None
+            prepared = prepare_circuit(parse_gate_operations(submission.get("circuit", [])), target.num_qubits, level)
+        except (ValueError, TypeError) as e:
+            stub["detail"] = f"Invalid circuit: {e}"
+            return None, stub, None
+
+        # Hashing the optimized circuit also merges answers that only differ by redundant gates
+        key = canonical_hash(prepared.canonical, target.num_qubits)
+        stub["circuit_hash"] = key
+        if prepared.optimization is not None:
+            self.gates_removed += prepared.optimization.original_gates - prepared.optimization.optimized_gates
+        return key, stub, prepared.native
+
+    @staticmethod
+    def _score(target: CompiledTarget, pending: Dict[str, Any], scored: Dict[str, Tuple[bool, int, float]]) -> None:
+        """Score the pending results in one call, moving them to scored as (passed, score, error)"""
+        if not pending:
+            return
+        if target.method == "randomized":
+            errors = np.array(list(pending.values()))
+            passed, scores = scores_from_error(errors, target.tolerance)
+        else:
+            passed, scores, errors = score_batch(target.kind, target.data, np.stack(list(pending.values())),
+                                                 target.tolerance)
+        for key, ok, score, error in zip(pending, passed, scores, errors):
+            scored[key] = (bool(ok), int(score), float(error))
+        pending.clear()
+
+    def _grade_exercise(self, exercise_id: str, group: List[Tuple[int, Dict]]) -> List[Dict]:
+        """Result stubs of one exercise's submissions, in input order"""
+        target = self.catalog.get_target(exercise_id)
+        equivalence = EquivalenceCheck(target) if target is not None and target.method == "randomized" else None
+        scored: Dict[str, Tuple[bool, int, float]] = {}
+        pending: Dict[str, Any] = {}
+        stubs = []
+        for index, submission in group:
+            key, stub, native = self._prepare(index, submission)
+            stubs.append((key, stub))
+            if key is None or key in scored or key in pending:
+                continue
+            pending[key] = equivalence.error(native) if equivalence is not None else simulate_for_target(native, target)
+            self.unique_circuits += 1
+            if len(pending) >= SCORING_BATCH:
+                self._score(target, pending, scored)
+        self._score(target, pending, scored)
+
+        for key, stub in stubs:
+            if key is not None:
+                passed, score, error = scored[key]
+                stub.update({"passed": passed, "score": score, "error": error})
+        return [stub for _, stub in stubs]
+
+    def grade(self, submissions: List[Dict]) -> Iterator[Dict]:
+        """Yield one result per submission (grouped by exercise), then a summary"""
+        start = time.perf_counter()
+        by_exercise: "OrderedDict[str, List[Tuple[int, Dict]]]" = OrderedDict()
+        for index, submission in enumerate(submissions):
+            by_exercise.setdefault(submission.get("exercise_id"), []).append((index, submission))
+
+        graded = passed_count = rejected = 0
+        for exercise_id, group in by_exercise.items():
+            for stub in self._grade_exercise(exercise_id, group):
+                if "passed" in stub:
+                    graded += 1
+                    passed_count += int(stub["passed"])
+                else:
+                    rejected += 1
+                yield stub
+
+        yield {
+            "summary": {
+                "submissions": len(submissions),
+                "graded": graded,
+                "passed": passed_count,
+                "rejected": rejected,
+                "unique_circuits": self.unique_circuits,
+                "gates_removed": self.gates_removed,
+                "elapsed_ms": (time.perf_counter() - start) * 1000
+            }
+        }
@@ -1,9 +1,18 @@
 import numpy as np
-from typing import List, Dict, Any, Optional, Tuple
-from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
-from qiskit_aer import AerSimulator, StatevectorSimulator, QasmSimulator
-from qiskit import transpile
+from functools import cached_property
+from typing import List, Dict, Any, Iterable, NamedTuple, Optional, TYPE_CHECKING
 from pydantic import BaseModel
+from app.utils.log import get_logger
+from app.utils.canonical import CanonicalGate, canonical_name, canonicalize, recanonicalize
+from app.utils.circuit_optimizer import OptimizationReport, optimize_circuit
+from app.utils.metrics import SIMULATION_SECONDS
+from app.utils.timing import phase
+from app.utils.statevector import FIXED_GATES, ROTATION_GATES, NativeGate, probabilities, sample_frequencies, simulate
+
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
+
+logger = get_logger(__name__)
 
 class ComplexNumber(BaseModel):
     """Pydantic-compatible complex number representation"""
@@ -20,15 +29,171 @@ class GateOperation(BaseModel):
     description: Optional[str] = None
     symbol: Optional[str] = None
 
+def parse_gate_operations(gates: List[Dict]) -> List[GateOperation]:
+    """Convert gate dictionaries from the frontend into GateOperation objects"""
+    gate_operations = []
+    for i, gate_dict in enumerate(gates):
+        gate_op = GateOperation(
+            name=gate_dict.get("gate", gate_dict.get("name", "")),
+            qubit=gate_dict.get("qubit", 0),
+            timeStep=gate_dict.get("timeStep", i),
+            target_qubit=gate_dict.get("target_qubit", gate_dict.get("target")),
+            parameter=gate_dict.get("parameter"),
+            description=gate_dict.get("description"),
+            symbol=gate_dict.get("symbol")
+        )
+        
+        # Special validation for CNOT gates
+        if canonical_name(gate_op.name) == 'CNOT' and gate_op.target_qubit is None:
+            raise ValueError(f"CNOT gate requires target_qubit to be specified. Received: {gate_dict}")
+        
+        gate_operations.append(gate_op)
+    return gate_operations
+
+class PreparedCircuit(NamedTuple):
+    canonical: List[CanonicalGate]
+    native: List[NativeGate]
+    optimization: Optional[OptimizationReport] = None
+
+def validate_gates(gates: List[CanonicalGate], num_qubits: int) -> None:
+    """Raise ValueError for qubit indices outside the circuit or malformed CNOTs"""
+    for gate in gates:
+        qubit = gate.qubits[0]
+        if qubit >= num_qubits or qubit < 0:
+            raise ValueError(f"Invalid qubit index {qubit} for {num_qubits}-qubit circuit")
+        if gate.name == 'CNOT':
+            target = gate.qubits[1] if len(gate.qubits) == 2 else None
+            if target is None or target >= num_qubits or target < 0:
+                raise ValueError(f"Invalid target qubit index {target}")
+            if target == qubit:
+                raise ValueError(f"CNOT control and target must differ (qubit {target})")
+
+def native_from_canonical(gates: List[CanonicalGate]) -> List[NativeGate]:
+    """Convert validated canonical gates for the native statevector kernels
+
+    Matches create_quantum_circuit: measurements are dropped (results are
+    taken before measurement) and unknown gates are skipped.
+    """
+    native_gates = []
+    for gate in gates:
+        if gate.name in FIXED_GATES or gate.name in ROTATION_GATES or gate.name == 'CNOT':
+            native_gates.append(NativeGate(gate.name, gate.qubits, gate.parameter))
+        elif gate.name != 'MEASURE':
+            logger.warning("unknown gate type %s, skipping", gate.name)
+    return native_gates
+
+def prepare_circuit(gate_operations: List[GateOperation], num_qubits: int,
+                    optimize_level: Optional[str] = None) -> PreparedCircuit:
+    """Canonicalize and validate gates, then optionally optimize them at optimize_level"""
+    with phase("circuit"):
+        canonical = canonicalize(gate_operations)
+        validate_gates(canonical, num_qubits)
+        report = None
+        if optimize_level is not None:
+            optimized, report = optimize_circuit(canonical, optimize_level)
+            canonical = recanonicalize(optimized)
+        return PreparedCircuit(canonical, native_from_canonical(canonical), report)
+
+def to_native_gates(gate_operations: List[GateOperation], num_qubits: int) -> List[NativeGate]:
+    """Put gates in canonical order and convert them for the native statevector kernels"""
+    return prepare_circuit(gate_operations, num_qubits).native
+
+# Result fields a caller can ask simulate_circuit for
+OUTPUT_FIELDS = ("state_vector", "probabilities", "measurement_counts", "unitary")
+
+# The simulation output each target kind is graded on
+TARGET_OUTPUTS = {
+    "statevector": "state_vector",
+    "probabilities": "probabilities",
+    "unitary": "unitary"
+}
+
+# What the preview endpoint returned before fields became lazy
+DEFAULT_OUTPUTS = ("state_vector", "probabilities", "measurement_counts")
+
+def measured_qubits(gate_operations: List[GateOperation], num_qubits: int) -> List[int]:
+    """Qubits with an explicit MEASURE gate, or every qubit if there are none"""
+    measured = sorted({g.qubit for g in gate_operations if g.name.upper() == 'MEASURE'})
+    return measured or list(range(num_qubits))
+
+def optimization_level(outputs: Iterable[str]) -> str:
+    """Most aggressive optimizer level that leaves every requested output unchanged"""
+    outputs = set(outputs)
+    if "unitary" in outputs:
+        return "unitary"
+    if "state_vector" in outputs:
+        return "state"
+    return "probabilities"
+
+class SimulationResult:
+    """Lazily computed outputs of one circuit on the native statevector kernels
+
+    Each field is computed on first access, so grading a statevector target
+    never builds the unitary, samples shots or formats bitstrings.
+    """
+
+    def __init__(self, native_gates: List[NativeGate], num_qubits: int,
+                 measured: Optional[List[int]] = None, seed: Optional[int] = None,
+                 optimization: Optional[OptimizationReport] = None):
+        self.native_gates = native_gates
+        self.num_qubits = num_qubits
+        self.measured = measured if measured is not None else list(range(num_qubits))
+        self.seed = seed
+        self.optimization = optimization
+
+    @cached_property
+    def state(self) -> np.ndarray:
+        with phase("native_statevector"), SIMULATION_SECONDS.time(backend="native_statevector", qubits=self.num_qubits):
+            return simulate(self.native_gates, self.num_qubits)
+
+    @cached_property
+    def probabilities(self) -> np.ndarray:
+        return probabilities(self.state)
+
+    @cached_property
+    def unitary(self) -> np.ndarray:
+        # Row i of the batch is U|i⟩, so the unitary is its transpose
+        dimension = 2 ** self.num_qubits
+        with phase("native_unitary"), SIMULATION_SECONDS.time(backend="native_unitary", qubits=self.num_qubits):
+            return simulate(self.native_gates, self.num_qubits, np.eye(dimension, dtype=complex)).T
+
+    def counts(self, shots: int) -> Dict[str, int]:
+        """Sample shots measurements; unmeasured qubits read 0 as in a Qiskit run"""
+        mask = sum(1 << q for q in self.measured)
+        marginal = np.bincount(np.arange(len(self.probabilities)) & mask,
+                               weights=self.probabilities, minlength=len(self.probabilities))
+        with phase("sampling"):
+            rng = np.random.default_rng(self.seed)
+            samples = sample_frequencies(rng, shots, marginal / marginal.sum())
+        return {format(int(i), f'0{self.num_qubits}b'): int(samples[i]) for i in np.flatnonzero(samples)}
+
+    def to_dict(self, outputs: Iterable[str], shots: int = 1024) -> Dict[str, Any]:
+        """JSON-ready dict holding only the requested fields"""
+        outputs = set(outputs)
+        result: Dict[str, Any] = {"num_qubits": self.num_qubits}
+        if "state_vector" in outputs:
+            result["state_vector"] = np.stack([self.state.real, self.state.imag], axis=1).tolist()
+        if "probabilities" in outputs:
+            result["probabilities"] = {
+                format(i, f'0{self.num_qubits}b'): float(p) for i, p in enumerate(self.probabilities)
+            }
+        if "measurement_counts" in outputs:
+            result["measurement_counts"] = self.counts(shots)
+            result["total_shots"] = shots
+        if "unitary" in outputs:
+            result["unitary"] = np.stack([self.unitary.real, self.unitary.imag], axis=-1).tolist()
+        return result
+
 class QuantumSimulator:
-    """Quantum circuit simulator using Qiskit"""
-    
-    def __init__(self):
-        self.statevector_simulator = StatevectorSimulator()
-        self.qasm_simulator = QasmSimulator()
+    """Exercise circuit simulator
+
+    Circuits run on the native NumPy kernels; create_quantum_circuit still
+    builds the equivalent Qiskit circuit for inspection.
+    """
     
-    def create_quantum_circuit(self, qubits: int, gates: List[GateOperation]) -> QuantumCircuit:
+    def create_quantum_circuit(self, qubits: int, gates: List[GateOperation]) -> "QuantumCircuit":
         """Create a quantum circuit from gate operations"""
+        from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
         qreg = QuantumRegister(qubits, 'q')
         creg = ClassicalRegister(qubits, 'c')
         circuit = QuantumCircuit(qreg, creg)
@@ -82,57 +247,30 @@ class QuantumSimulator:
                     circuit.measure(qubit_idx, qubit_idx)
                 
                 else:
-                    print(f"Warning: Unknown gate type '{gate_name}', skipping")
+                    logger.warning("unknown gate type %s, skipping", gate_name)
                     
             except Exception as e:
-                print(f"Error applying gate {gate.name} to qubit {gate.qubit}: {e}")
+                logger.debug("error applying gate %s to qubit %s: %s", gate.name, gate.qubit, e)
                 raise e
         
         return circuit
     
-    def _run_simulation(self, qubits: int, gates: List[GateOperation], shots: int = 1024) -> Tuple[List[complex], List[float], Dict[str, int]]:
-        """
-        Simulate a quantum circuit and return state vector, probabilities, and measurement counts
-        
-        Returns:
-            Tuple of (statevector, probabilities, measurement_counts)
+    def simulate(self, gates: List[Dict], num_qubits: int, seed: Optional[int] = None,
+                 optimize_level: Optional[str] = None) -> SimulationResult:
+        """Parse frontend gate dictionaries into a lazily evaluated SimulationResult
+
+        With optimize_level set the gate list is first run through the
+        peephole optimizer, preserving the outputs that level names.
         """
-        try:
-            circuit = self.create_quantum_circuit(qubits, gates)
-            
-            # Get state vector
-            statevector_circuit = circuit.copy()
-            # Remove any measurements for statevector simulation
-            statevector_circuit.data = [instr for instr in statevector_circuit.data 
-                                      if instr.operation.name != 'measure']
-            
-            statevector_job = self.statevector_simulator.run(statevector_circuit)
-            statevector_result = statevector_job.result()
-            statevector = statevector_result.get_statevector()
-            
-            # Calculate probabilities
-            probabilities = np.abs(statevector) ** 2
-            
-            # Get measurement counts
-            measurement_circuit = circuit.copy()
-            # Add measurements if not present - but be careful about existing classical registers
-            has_measurements = any(instr.operation.name == 'measure' for instr in measurement_circuit.data)
-            if not has_measurements:
-                # Only measure the qubits we actually have
-                for i in range(qubits):
-                    measurement_circuit.measure(i, i)
-            
-            measurement_job = self.qasm_simulator.run(measurement_circuit, shots=shots)
-            measurement_result = measurement_job.result()
-            counts = measurement_result.get_counts()
-            
-            return statevector.data.tolist(), probabilities.tolist(), counts
-            
-        except Exception as e:
-            print(f"Circuit simulation error: {e}")
-            raise e
+        gate_operations = parse_gate_operations(gates)
+        prepared = prepare_circuit(gate_operations, num_qubits, optimize_level)
+        return SimulationResult(
+            prepared.native, num_qubits,
+            measured_qubits(gate_operations, num_qubits), seed, prepared.optimization
+        )
     
-    def simulate_circuit(self, gates: List[Dict], num_qubits: int, shots: int = 1024) -> Dict:
+    def simulate_circuit(self, gates: List[Dict], num_qubits: int, shots: int = 1024,
+                         outputs: Iterable[str] = DEFAULT_OUTPUTS, optimize: bool = False) -> Dict:
         """
         Simulate a circuit and return results in the format expected by the exercise checker
         
@@ -140,78 +278,21 @@ class QuantumSimulator:
             gates: List of gate dictionaries (from frontend)
             num_qubits: Number of qubits in the circuit
             shots: Number of measurement shots
+            outputs: Fields to compute, any of OUTPUT_FIELDS
+            optimize: Run the optimizer at the level that preserves outputs
             
         Returns:
-            Dictionary with state_vector, probabilities, and measurement_counts
+            Dictionary with num_qubits and the requested fields
         """
-        try:
-            print(f"Exercise checker received gates: {gates}")
-            
-            # Convert gate dictionaries to GateOperation objects
-            gate_operations = []
-            for i, gate_dict in enumerate(gates):
-                print(f"Processing gate {i}: {gate_dict}")
-                
-                gate_op = GateOperation(
-                    name=gate_dict.get("gate", gate_dict.get("name", "")),
-                    qubit=gate_dict.get("qubit", 0),
-                    timeStep=gate_dict.get("timeStep", i),
-                    target_qubit=gate_dict.get("target_qubit", gate_dict.get("target")),
-                    parameter=gate_dict.get("parameter"),
-                    description=gate_dict.get("description"),
-                    symbol=gate_dict.get("symbol")
-                )
-                
-                print(f"Created GateOperation: name={gate_op.name}, qubit={gate_op.qubit}, target_qubit={gate_op.target_qubit}")
-                
-                # Special validation for CNOT gates
-                if gate_op.name.upper() == 'CNOT':
-                    if gate_op.target_qubit is None:
-                        print(f"ERROR: CNOT gate missing target_qubit. Original dict: {gate_dict}")
-                        raise ValueError(f"CNOT gate requires target_qubit to be specified. Received: {gate_dict}")
-                    print(f"CNOT gate validated: control={gate_op.qubit}, target={gate_op.target_qubit}")
-                
-                gate_operations.append(gate_op)
-            
-            print(f"Final gate operations: {[{'name': g.name, 'qubit': g.qubit, 'target_qubit': g.target_qubit} for g in gate_operations]}")
-            
-            # Simulate the circuit
-            statevector, probabilities, measurement_counts = self._run_simulation(
-                num_qubits, gate_operations, shots
-            )
-            
-            # Convert statevector to the format expected
-            # Handle both complex and real numbers
-            formatted_statevector = []
-            for sv in statevector:
-                if isinstance(sv, complex):
-                    formatted_statevector.append([sv.real, sv.imag])
-                else:
-                    formatted_statevector.append(sv)
-            
-            # Convert measurement counts to probabilities
-            total_shots = sum(measurement_counts.values()) if measurement_counts else shots
-            prob_dict = {}
-            
-            # For probability-based exercises, use theoretical probabilities instead of noisy measurements
-            # This gives more consistent and accurate results
-            for i, prob in enumerate(probabilities):
-                binary_state = format(i, f'0{num_qubits}b')
-                prob_dict[binary_state] = prob
-            
-            return {
-                "state_vector": formatted_statevector,
-                "probabilities": prob_dict,
-                "measurement_counts": measurement_counts or {},
-                "num_qubits": num_qubits,
-                "total_shots": total_shots
-            }
-            
-        except Exception as e:
-            print(f"Error in simulate_circuit: {e}")
-            raise e
+        outputs = set(outputs)
+        level = optimization_level(outputs) if optimize else None
+        result = self.simulate(gates, num_qubits, optimize_level=level)
+        response = result.to_dict(outputs, shots)
+        if result.optimization is not None:
+            response["optimization"] = result.optimization.to_dict()
+        return response
 
-    def get_circuit_info(self, circuit: QuantumCircuit) -> Dict[str, Any]:
+    def get_circuit_info(self, circuit: "QuantumCircuit") -> Dict[str, Any]:
         """Get information about the circuit"""
         return {
             "depth": circuit.depth(),
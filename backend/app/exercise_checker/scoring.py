@@ -0,0 +1,81 @@
+from typing import Dict, List, Tuple, Union
+import numpy as np
+
+# Vectorized scoring of candidate results against a precompiled target.
+#
+# Every function takes one target and a batch of candidates (one per row),
+# so a whole class can be scored in a single call. Scores depend only on
+# physically observable differences: state and unitary comparisons ignore
+# global phase.
+
+def as_complex_array(values: List[Union[float, List[float]]]) -> np.ndarray:
+    """Convert amplitudes given as numbers or [real, imag] pairs into a complex array"""
+    array = np.asarray(values, dtype=float)
+    if array.ndim == 2 and array.shape[1] == 2:
+        return array[:, 0] + 1j * array[:, 1]
+    return np.asarray(values, dtype=complex)
+
+def probabilities_to_array(probabilities: Dict[str, float], num_qubits: int) -> np.ndarray:
+    """Dense probability vector from a {bitstring: probability} dict"""
+    dense = np.zeros(2 ** num_qubits)
+    for bitstring, probability in probabilities.items():
+        dense[int(bitstring, 2)] = probability
+    return dense
+
+def state_fidelity(target: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """|⟨ψ|φ⟩|² between a normalized target and each candidate row"""
+    candidates = np.atleast_2d(candidates)
+    overlaps = candidates @ target.conj()
+    norms = np.einsum('ij,ij->i', candidates.conj(), candidates).real
+    return np.abs(overlaps) ** 2 / np.where(norms > 0, norms, 1.0)
+
+def total_variation_distance(target: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """½ Σ |p - q| between a target distribution and each candidate row"""
+    candidates = np.atleast_2d(candidates)
+    return 0.5 * np.abs(candidates - target).sum(axis=1)
+
+def unitary_fidelity(target: np.ndarray, candidates: np.ndarray) -> np.ndarray:
+    """|Tr(U†V)|² / d² between a target unitary and each candidate in a (batch, d, d) stack"""
+    if candidates.ndim == 2:
+        candidates = candidates[np.newaxis]
+    dimension = target.shape[0]
+    traces = np.einsum('ij,bij->b', target.conj(), candidates)
+    return np.abs(traces) ** 2 / dimension ** 2
+
+def scores_from_error(errors: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Map an error measure (infidelity or distance) to (passed, score) arrays
+
+    Within 10% of the tolerance scores 100, within the tolerance scores at
+    least 95, up to twice the tolerance scores at least 70 (but fails), and
+    anything further scales down from 50.
+    """
+    errors = np.asarray(errors, dtype=float)
+    passed = errors <= tolerance
+    scores = np.select(
+        [errors <= tolerance * 0.1, passed, errors < tolerance * 2],
+        [
+            100,
+            np.maximum(95, (100 * (1 - errors / tolerance)).astype(int)),
+            np.maximum(70, (90 * (1 - (errors - tolerance) / tolerance)).astype(int))
+        ],
+        default=np.maximum(0, (50 * (1 - np.minimum(errors, 1.0))).astype(int))
+    )
+    return passed, scores.astype(int)
+
+def score_batch(kind: str, target: np.ndarray, candidates: np.ndarray, tolerance: float) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Score a batch of candidates against one target, returns (passed, scores, errors)
+
+    Statevectors and unitaries are compared by infidelity (1 - F) and
+    probability vectors by total variation distance.
+    """
+    if kind == "statevector":
+        errors = 1 - state_fidelity(target, candidates)
+    elif kind == "probabilities":
+        errors = total_variation_distance(target, candidates)
+    elif kind == "unitary":
+        errors = 1 - unitary_fidelity(target, candidates)
+    else:
+        raise ValueError(f"Unknown target kind '{kind}'")
+    errors = np.clip(errors, 0.0, None)
+    passed, scores = scores_from_error(errors, tolerance)
+    return passed, scores, errors
@@ -1,13 +1,69 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
 from app.algorithms.grover import router as grover_router
 from app.algorithms.deutsch_jozsa import router as deutsch_router
 from app.algorithms.bernstein_vazirani import router as bernstein_router
 from app.algorithms.simon import router as simon_router
 from app.algorithms.simulator import router as simulator_router
-from app.exercise_checker.checker import router as exercise_router
+from app.algorithms.jobs import router as jobs_router
+from app.exercise_checker.checker import router as exercise_router, exercise_manager
+from app.utils.cancellation import Cancelled, DeadlineExceeded, RequestCancellation
+from app.utils.execution import execution_service
+from app.utils.job_queue import job_queue
+from app.utils.readiness import readiness
+from app.utils.submission_store import submission_store
+from app.utils.log import (
+    REQUEST_ID_HEADER,
+    bind_correlation_id,
+    configure_logging,
+    get_correlation_id,
+    get_logger,
+    reset_correlation_id,
+)
+from app.utils.profiler import (
+    PROFILE_HEADER,
+    PROFILE_ID_HEADER,
+    PROFILE_INTERVAL,
+    PROFILING_ENABLED,
+    SamplingProfiler,
+    profile_store,
+)
+from app.utils.timing import SERVER_TIMING_HEADER, RequestTimings, bind_timings, reset_timings
+from app.utils.metrics import (
+    CONTENT_TYPE,
+    HTTP_IN_PROGRESS,
+    HTTP_LATENCY,
+    HTTP_REQUESTS,
+    QUEUE_DEPTH,
+    registry as metrics_registry,
+)
+from anyio.to_thread import current_default_thread_limiter
+import os
+import threading
+import time
+import uuid
 import uvicorn
 
+configure_logging()
+logger = get_logger(__name__)
+
+# Directory where worker processes share metric snapshots, unset for single-process metrics
+METRICS_DIR = os.getenv("METRICS_DIR")
+
+# Per-phase durations in a Server-Timing header on every response (SERVER_TIMING=0 disables)
+SERVER_TIMING = os.getenv("SERVER_TIMING", "1") == "1"
+
+# Seconds a request may take before its simulation is aborted with a 504, matching
+# the frontend's 30 s client timeout (REQUEST_TIMEOUT=0 disables)
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", "30")) or None
+
+# Requests in flight at which /api/ready reports this worker overloaded (READY_MAX_IN_FLIGHT=0 never does)
+READY_MAX_IN_FLIGHT = int(os.getenv("READY_MAX_IN_FLIGHT", "0"))
+
+# Non-standard status (as in nginx) for requests abandoned by the client, which never sees it
+CLIENT_CLOSED_REQUEST = 499
+
 app = FastAPI(
     title="Quantum Core API",
     description="Backend API for quantum algorithm simulation and visualization",
@@ -35,12 +91,103 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.middleware("http")
+async def correlation_id(request: Request, call_next):
+    """Tag every log record of a request with its X-Request-ID (generated when absent)"""
+    token = bind_correlation_id(request.headers.get(REQUEST_ID_HEADER))
+    try:
+        response = await call_next(request)
+        response.headers[REQUEST_ID_HEADER] = get_correlation_id()
+        return response
+    finally:
+        reset_correlation_id(token)
+
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    """Time request phases for Server-Timing, and profile the request when asked to"""
+    timings = RequestTimings()
+    profiler = None
+    if PROFILING_ENABLED and request.headers.get(PROFILE_HEADER):
+        profiler = SamplingProfiler(PROFILE_INTERVAL)
+        timings.thread_hooks.append(profiler.add_thread)
+        profiler.add_thread(threading.get_ident())
+        profiler.start()
+    token = bind_timings(timings)
+    try:
+        response = await call_next(request)
+    finally:
+        reset_timings(token)
+        if profiler is not None:
+            profiler.stop()
+    if SERVER_TIMING:
+        response.headers[SERVER_TIMING_HEADER] = timings.server_timing()
+    if profiler is not None:
+        profile_id = uuid.uuid4().hex
+        profile_store.save(profile_id, profiler)
+        response.headers[PROFILE_ID_HEADER] = profile_id
+    return response
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """Count requests and time them, labelled by route template rather than raw path"""
+    start = time.perf_counter()
+    HTTP_IN_PROGRESS.inc()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+        return response
+    finally:
+        HTTP_IN_PROGRESS.dec()
+        route = request.scope.get("route")
+        path = route.path if route is not None else "unmatched"
+        HTTP_LATENCY.observe(time.perf_counter() - start, route=path, method=request.method)
+        HTTP_REQUESTS.inc(route=path, method=request.method, status=status)
+
+# Outermost, so the deadline covers the whole request and disconnects are seen before any other middleware reads them
+app.add_middleware(RequestCancellation, timeout=REQUEST_TIMEOUT)
+
+@app.exception_handler(Cancelled)
+async def cancelled_request(request: Request, exc: Cancelled):
+    """A simulation aborted because the request ran out of time or its client went away"""
+    if isinstance(exc, DeadlineExceeded):
+        return JSONResponse(status_code=504, content={"detail": f"Request timed out: {exc}"})
+    return JSONResponse(status_code=CLIENT_CLOSED_REQUEST, content={"detail": f"Request cancelled: {exc.reason}"})
+
 app.include_router(grover_router, prefix="/api/algorithms", tags=["Grover"])
 app.include_router(deutsch_router, prefix="/api/algorithms", tags=["Deutsch-Jozsa"])
 app.include_router(bernstein_router, prefix="/api/algorithms", tags=["Bernstein-Vazirani"])
 app.include_router(simon_router, prefix="/api/algorithms", tags=["Simon"])
 app.include_router(simulator_router, prefix="/api/algorithms", tags=["Simulator"])
 app.include_router(exercise_router, prefix="/api", tags=["Exercises"])
+app.include_router(jobs_router, prefix="/api", tags=["Jobs"])
+
+@app.on_event("startup")
+async def warm_up_circuit_cache():
+    """Import, pre-build and run every kernel in the background; /api/ready turns 200 when done"""
+    readiness.start(execution_service.warm_up)
+
+@app.on_event("startup")
+async def watch_exercise_catalog():
+    """Hot-reload exercises_list.json when it changes (EXERCISES_RELOAD_INTERVAL=0 disables)"""
+    interval = float(os.getenv("EXERCISES_RELOAD_INTERVAL", "2"))
+    if interval > 0:
+        exercise_manager.start_watching(interval)
+
+@app.on_event("startup")
+async def share_metrics():
+    """Publish this worker's metrics to METRICS_DIR so /metrics on any worker covers all of them"""
+    if METRICS_DIR:
+        metrics_registry.start_flushing(METRICS_DIR, float(os.getenv("METRICS_FLUSH_INTERVAL", "5")))
+
+@app.on_event("shutdown")
+async def flush_submission_store():
+    """Write any queued submissions before the process exits"""
+    exercise_manager.stop_watching()
+    job_queue.stop()
+    submission_store.close()
+    if METRICS_DIR:
+        metrics_registry.stop_flushing(METRICS_DIR)
 
 @app.get("/")
 async def root():
@@ -58,6 +205,51 @@ async def health_check():
         "algorithms": ["grover", "deutsch-jozsa", "bernstein-vazirani", "simon", "simulator"]
     }
 
+@app.get("/api/ready")
+async def readiness_check():
+    """Readiness for load balancers: 503 until warmed up or while overloaded, with current load"""
+    limiter = current_default_thread_limiter()
+    # Not counting this request
+    in_flight = int(HTTP_IN_PROGRESS.samples().get((), 0)) - 1
+    jobs = job_queue.stats()
+    overloaded = 0 < READY_MAX_IN_FLIGHT <= in_flight
+    status = "overloaded" if readiness.ready and overloaded else readiness.status
+    return JSONResponse(status_code=200 if status == "ready" else 503, content={
+        **readiness.snapshot(),
+        "status": status,
+        "capacity": {
+            "requests_in_flight": in_flight,
+            "max_requests_in_flight": READY_MAX_IN_FLIGHT or None,
+            "simulations_in_flight": execution_service.flights.in_flight(),
+            "threads": {
+                "size": int(limiter.total_tokens),
+                "busy": int(limiter.borrowed_tokens),
+                "waiting": limiter.statistics().tasks_waiting
+            },
+            "jobs": {"workers": jobs["workers"], "running": jobs["running"],
+                     "queued": jobs["queued"], "max_queued": jobs["max_queued"]},
+            "queue_depth": {labels[0]: int(depth) for labels, depth in QUEUE_DEPTH.samples().items()}
+        }
+    })
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics, aggregated across worker processes when METRICS_DIR is set"""
+    return Response(metrics_registry.render(METRICS_DIR), media_type=CONTENT_TYPE)
+
+@app.get("/api/profiles", include_in_schema=False)
+async def list_profiles():
+    """Ids of the most recent request profiles, oldest first"""
+    return {"enabled": PROFILING_ENABLED, "profiles": profile_store.ids()}
+
+@app.get("/api/profiles/{profile_id}", include_in_schema=False)
+async def get_profile(profile_id: str):
+    """Sampled stacks of one profiled request, with folded stacks for flamegraph tools"""
+    profile = profile_store.get(profile_id)
+    if profile is None:
+        raise HTTPException(status_code=404, detail=f"Profile {profile_id} not found")
+    return profile
+
 # Add a simple health check at root level for Docker
 @app.get("/health")
 async def health_check_root():
@@ -0,0 +1,216 @@
+import asyncio
+import contextvars
+import threading
+import time
+from typing import Any, Callable, List, Optional
+
+from app.utils.metrics import ABORTED
+
+# Cooperative cancellation of simulation work.
+#
+# A CancellationToken is cancelled explicitly (a client disconnected, a job
+# was cancelled, nobody is waiting for a shared computation any more) or
+# expires at its deadline. The token for the current unit of work is bound
+# to the context, like the request timings in app.utils.timing, and the
+# kernels call check_cancelled() / token.check() between gates, layers and
+# sampling chunks; check() raises Cancelled (DeadlineExceeded at the
+# deadline), which unwinds the computation. Code that holds a large array
+# drops it before raising, so an aborted simulation frees its memory at
+# once rather than when the exception and its traceback are collected.
+#
+# Checks are only as fine as the loop they sit in: an Aer run or a single
+# gate on a large state finishes before the next check.
+#
+# RequestCancellation gives every HTTP request a token with a deadline and
+# cancels it when the client disconnects. Detecting the disconnect needs the
+# event loop, so it only stops work that runs off the loop (see
+# app.utils.singleflight); the deadline stops work anywhere. The deadline
+# covers the time to the first response byte, so streamed responses are
+# not cut off once they have started.
+#
+# The first abort of each token is counted in aborted_total{scope, reason}.
+
+CANCELLED = "cancelled"
+CLIENT_DISCONNECTED = "client_disconnected"
+ABANDONED = "abandoned"
+TIMED_OUT = "timed_out"
+
+class Cancelled(Exception):
+    """Raised inside work whose token was cancelled"""
+
+    def __init__(self, reason: str = CANCELLED):
+        super().__init__(reason)
+        self.reason = reason
+
+class DeadlineExceeded(Cancelled):
+    """Raised inside work whose token passed its deadline"""
+
+    def __init__(self, timeout: Optional[float] = None):
+        super().__init__(TIMED_OUT)
+        self.timeout = timeout
+
+    def __str__(self) -> str:
+        return f"deadline of {self.timeout:g}s exceeded" if self.timeout else "deadline exceeded"
+
+class CancellationToken:
+    """Cancellation flag with an optional deadline, safe to check from any thread"""
+
+    def __init__(self, timeout: Optional[float] = None, scope: str = "request"):
+        self.scope = scope
+        self.timeout = timeout
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+        self._callbacks: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+        self._counted = False
+
+    def cancel(self, reason: str = CANCELLED) -> None:
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            callback()
+
+    def clear_deadline(self) -> None:
+        self.deadline = None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds to the deadline, None without one"""
+        return None if self.deadline is None else max(self.deadline - time.monotonic(), 0.0)
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set() or (self.deadline is not None and time.monotonic() > self.deadline)
+
+    def check(self) -> None:
+        """Raise Cancelled if the work should stop"""
+        if self._event.is_set():
+            self._count(self.reason)
+            raise Cancelled(self.reason)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            self._count(TIMED_OUT)
+            raise DeadlineExceeded(self.timeout)
+
+    def _count(self, reason: str) -> None:
+        if not self._counted:
+            self._counted = True
+            ABORTED.inc(scope=self.scope, reason=reason)
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        """Call callback (from the cancelling thread) when the token is cancelled"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+_token: contextvars.ContextVar[Optional[CancellationToken]] = contextvars.ContextVar("cancellation", default=None)
+
+def current_token() -> Optional[CancellationToken]:
+    return _token.get()
+
+def bind_token(token: Optional[CancellationToken]) -> contextvars.Token:
+    return _token.set(token)
+
+def reset_token(token: contextvars.Token) -> None:
+    _token.reset(token)
+
+def check_cancelled() -> None:
+    """Raise Cancelled if the current context's work should stop"""
+    token = _token.get()
+    if token is not None:
+        token.check()
+
+async def wait_cancellable(future: asyncio.Future, token: Optional[CancellationToken]) -> Any:
+    """Await future, raising Cancelled as soon as token is cancelled or expires
+
+    The future itself is left running, so others can still await it.
+    """
+    if token is None:
+        return await asyncio.shield(future)
+    token.check()
+    loop = asyncio.get_running_loop()
+    stop = loop.create_future()
+
+    def wake() -> None:
+        if not stop.done():
+            stop.set_result(None)
+
+    def on_cancel() -> None:
+        loop.call_soon_threadsafe(wake)
+
+    token.add_callback(on_cancel)
+    remaining = token.remaining()
+    timer = loop.call_later(remaining, wake) if remaining is not None else None
+    try:
+        await asyncio.wait({future, stop}, return_when=asyncio.FIRST_COMPLETED)
+        if future.done():
+            return future.result()
+        token.check()
+        raise Cancelled(token.reason or CANCELLED)
+    finally:
+        token.remove_callback(on_cancel)
+        if timer is not None:
+            timer.cancel()
+
+class RequestCancellation:
+    """ASGI middleware binding a CancellationToken to every HTTP request
+
+    The token expires after timeout seconds unless the response has started,
+    and is cancelled if the client disconnects before the response is sent.
+    """
+
+    def __init__(self, app, timeout: Optional[float] = None):
+        self.app = app
+        self.timeout = timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = CancellationToken(self.timeout, scope="request")
+        messages: asyncio.Queue = asyncio.Queue()
+        finished = False
+
+        async def read_messages():
+            # Reads ahead of the app so a disconnect is seen while the endpoint is still working
+            while True:
+                message = await receive()
+                await messages.put(message)
+                if message["type"] == "http.disconnect":
+                    if not finished:
+                        token.cancel(CLIENT_DISCONNECTED)
+                    return
+
+        async def wrapped_receive():
+            message = await messages.get()
+            if message["type"] == "http.disconnect":
+                # Every later receive() sees the disconnect too
+                messages.put_nowait(message)
+            return message
+
+        async def wrapped_send(message):
+            nonlocal finished
+            if message["type"] == "http.response.start":
+                token.clear_deadline()
+            elif message["type"] == "http.response.body" and not message.get("more_body", False):
+                finished = True
+            await send(message)
+
+        reader = asyncio.create_task(read_messages())
+        context_token = bind_token(token)
+        try:
+            await self.app(scope, wrapped_receive, wrapped_send)
+        finally:
+            finished = True
+            reader.cancel()
+            reset_token(context_token)
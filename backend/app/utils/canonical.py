@@ -0,0 +1,94 @@
+import hashlib
+import json
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+# Canonical normal form of gate lists.
+#
+# Two submissions describe the same circuit when they apply the same gates
+# in the same order on every wire; how gates on different wires interleave,
+# and which timeStep values were used, does not matter. canonicalize()
+# places every gate in the earliest moment after the previous gate on each
+# of its wires (ASAP layering) and orders gates within a moment by wire, so
+# all such variants map to one gate list and one hash.
+#
+# Gates are read by attribute (name, qubit, target_qubit, parameter,
+# timeStep), so GateOperation models from both routers can be passed in.
+
+# Alternative names the frontend may send for the same gate
+GATE_ALIASES = {'CX': 'CNOT'}
+
+# Gates acting on (qubit, target_qubit); every other gate acts on qubit alone
+TWO_QUBIT_GATES = {'CNOT'}
+
+# Gates whose parameter is an angle, defaulting to 0 when omitted
+PARAMETERIZED_GATES = {'RX', 'RY', 'RZ'}
+
+# Angles are rounded to this many decimals, so float noise from the
+# frontend does not split otherwise identical circuits
+PARAMETER_DECIMALS = 10
+
+class CanonicalGate(NamedTuple):
+    name: str
+    qubits: Tuple[int, ...]
+    parameter: Optional[float] = None
+
+def canonical_name(name: str) -> str:
+    """Upper-case gate name with aliases resolved"""
+    name = name.upper()
+    return GATE_ALIASES.get(name, name)
+
+def canonical_parameter(name: str, parameter: Optional[float]) -> Optional[float]:
+    if name not in PARAMETERIZED_GATES:
+        return None
+    # + 0.0 folds -0.0 into 0.0
+    return round(float(parameter or 0.0), PARAMETER_DECIMALS) + 0.0
+
+def canonical_gate(gate) -> CanonicalGate:
+    name = canonical_name(gate.name)
+    if name in TWO_QUBIT_GATES and gate.target_qubit is not None:
+        qubits = (gate.qubit, gate.target_qubit)
+    else:
+        qubits = (gate.qubit,)
+    return CanonicalGate(name, qubits, canonical_parameter(name, gate.parameter))
+
+def layer_gates(gates: Iterable[CanonicalGate]) -> List[List[CanonicalGate]]:
+    """Group ordered canonical gates into moments, each gate in the first moment after its wires are free
+
+    Each moment is sorted by wire. Runs in time linear in the number of
+    gates for a fixed number of qubits.
+    """
+    layers: List[List[CanonicalGate]] = []
+    wire_depth = {}
+    for gate in gates:
+        depth = max(wire_depth.get(q, 0) for q in gate.qubits)
+        for q in gate.qubits:
+            wire_depth[q] = depth + 1
+        if depth == len(layers):
+            layers.append([])
+        layers[depth].append(gate)
+
+    # Gates in one moment touch disjoint wires, so the lowest wire orders them
+    for layer in layers:
+        layer.sort(key=lambda g: min(g.qubits))
+    return layers
+
+def circuit_layers(gates: Iterable) -> List[List[CanonicalGate]]:
+    """Moments of a gate list, taken in timeStep order (input order breaks ties)"""
+    return layer_gates(canonical_gate(gate) for gate in sorted(gates, key=lambda g: g.timeStep))
+
+def canonicalize(gates: Iterable) -> List[CanonicalGate]:
+    """Gate list in canonical order"""
+    return [gate for layer in circuit_layers(gates) for gate in layer]
+
+def recanonicalize(canonical_gates: Iterable[CanonicalGate]) -> List[CanonicalGate]:
+    """Restore canonical order after a pass (such as the optimizer) rewrote a canonical list"""
+    return [gate for layer in layer_gates(canonical_gates) for gate in layer]
+
+def canonical_hash(canonical_gates: List[CanonicalGate], num_qubits: int) -> str:
+    """sha256 hex digest of a gate list that is already in canonical form"""
+    payload = json.dumps([num_qubits, [list(gate) for gate in canonical_gates]], separators=(',', ':'))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+def circuit_hash(gates: Iterable, num_qubits: int) -> str:
+    """Stable sha256 hex digest identifying a circuit up to canonical form"""
+    return canonical_hash(canonicalize(gates), num_qubits)
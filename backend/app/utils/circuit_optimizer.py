@@ -0,0 +1,171 @@
+import math
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from app.utils.canonical import PARAMETER_DECIMALS, CanonicalGate
+
+# Peephole optimizer for canonical gate lists.
+#
+# Gates are pushed one at a time onto per-wire stacks. A new gate that sits
+# directly on top of an identical-wire gate is combined with it: involutions
+# cancel, Z/S/T phases add up and same-axis rotations merge, and the result
+# is pushed again so cancellations cascade (H·X·X·H collapses entirely).
+#
+# The level says which outputs must be preserved exactly:
+#   "unitary"        the circuit's operator (only peephole rules apply)
+#   "state"          the final state from |0...0⟩, which also drops phase
+#                    gates on untouched wires and CNOTs with an untouched control
+#   "probabilities"  the measurement distribution, which also drops diagonal
+#                    gates with nothing but measurement after them
+
+LEVELS = ("unitary", "state", "probabilities")
+
+INVOLUTIONS = {'H', 'X', 'Y', 'Z', 'CNOT'}
+
+# Phase gates diag(1, e^{ikπ/4}) by k
+PHASE_STEPS = {'T': 1, 'S': 2, 'Z': 4}
+PHASE_GATES = {steps: name for name, steps in PHASE_STEPS.items()}
+
+ROTATIONS = {'RX', 'RY', 'RZ'}
+
+# Gates diagonal in the computational basis, which never change probabilities
+DIAGONAL_GATES = {'Z', 'S', 'T', 'RZ'}
+
+# Rotations are 4π-periodic (a 2π turn is -I, a global phase we keep)
+ROTATION_PERIOD = 4 * math.pi
+
+# Marker for "these two gates do not combine"
+_NO_MERGE = object()
+
+@dataclass
+class OptimizationReport:
+    """What an optimization pass removed, by rule"""
+    level: str
+    original_gates: int = 0
+    optimized_gates: int = 0
+    removed: Dict[str, int] = field(default_factory=dict)
+
+    def count(self, rule: str, gates: int = 1) -> None:
+        self.removed[rule] = self.removed.get(rule, 0) + gates
+
+    def to_dict(self) -> Dict:
+        return {
+            "level": self.level,
+            "original_gates": self.original_gates,
+            "optimized_gates": self.optimized_gates,
+            "removed": dict(self.removed)
+        }
+
+def normalize_angle(angle: float) -> float:
+    """Angle reduced into (-2π, 2π], the range that keeps rotations exact"""
+    angle = math.fmod(angle, ROTATION_PERIOD)
+    if angle > ROTATION_PERIOD / 2:
+        angle -= ROTATION_PERIOD
+    elif angle <= -ROTATION_PERIOD / 2:
+        angle += ROTATION_PERIOD
+    return round(angle, PARAMETER_DECIMALS) + 0.0
+
+def is_identity(gate: CanonicalGate) -> bool:
+    return gate.name in ROTATIONS and normalize_angle(gate.parameter or 0.0) == 0.0
+
+def combine(first: CanonicalGate, second: CanonicalGate, report: OptimizationReport):
+    """Combine two gates on the same wires: None if they cancel, a gate if they merge"""
+    if first.qubits != second.qubits:
+        return _NO_MERGE
+    if first.name == second.name and first.name in INVOLUTIONS:
+        report.count("cancelled_involutions", 2)
+        return None
+    if first.name in PHASE_STEPS and second.name in PHASE_STEPS:
+        steps = (PHASE_STEPS[first.name] + PHASE_STEPS[second.name]) % 8
+        if steps == 0:
+            report.count("merged_phases", 2)
+            return None
+        if steps in PHASE_GATES:
+            report.count("merged_phases")
+            return CanonicalGate(PHASE_GATES[steps], first.qubits)
+        return _NO_MERGE
+    if first.name == second.name and first.name in ROTATIONS:
+        angle = normalize_angle((first.parameter or 0.0) + (second.parameter or 0.0))
+        if angle == 0.0:
+            report.count("merged_rotations", 2)
+            return None
+        report.count("merged_rotations")
+        return CanonicalGate(first.name, first.qubits, angle)
+    return _NO_MERGE
+
+def peephole(gates: List[CanonicalGate], report: OptimizationReport) -> List[CanonicalGate]:
+    """Cancel and merge adjacent gates on identical wires until nothing changes"""
+    output: List[Optional[CanonicalGate]] = []
+    stacks: Dict[int, List[int]] = {}
+
+    def push(gate: CanonicalGate) -> None:
+        if is_identity(gate):
+            report.count("identity_rotations")
+            return
+        tops = {stacks[q][-1] if stacks.get(q) else None for q in gate.qubits}
+        if len(tops) == 1:
+            top = tops.pop()
+            if top is not None:
+                merged = combine(output[top], gate, report)
+                if merged is not _NO_MERGE:
+                    output[top] = None
+                    for q in gate.qubits:
+                        stacks[q].pop()
+                    if merged is not None:
+                        push(merged)
+                    return
+        output.append(gate)
+        for q in gate.qubits:
+            stacks.setdefault(q, []).append(len(output) - 1)
+
+    for gate in gates:
+        push(gate)
+    return [gate for gate in output if gate is not None]
+
+def drop_initial_state_no_ops(gates: List[CanonicalGate], report: OptimizationReport) -> List[CanonicalGate]:
+    """Drop gates that leave |0...0⟩ unchanged: phase gates on untouched wires, CNOTs with an untouched control"""
+    touched = set()
+    kept = []
+    for gate in gates:
+        first = gate.qubits[0]
+        if first not in touched and (gate.name in PHASE_STEPS or gate.name == 'CNOT'):
+            report.count("no_effect_on_initial_state")
+            continue
+        if gate.name != 'MEASURE':
+            touched.update(gate.qubits)
+        kept.append(gate)
+    return kept
+
+def drop_diagonal_before_measurement(gates: List[CanonicalGate], report: OptimizationReport) -> List[CanonicalGate]:
+    """Drop diagonal gates followed by nothing but measurement on their wire"""
+    busy = set()
+    kept = []
+    for gate in reversed(gates):
+        if gate.name in DIAGONAL_GATES and gate.qubits[0] not in busy:
+            report.count("no_effect_before_measurement")
+            continue
+        if gate.name != 'MEASURE':
+            busy.update(gate.qubits)
+        kept.append(gate)
+    kept.reverse()
+    return kept
+
+def optimize_circuit(gates: List[CanonicalGate], level: str = "unitary") -> Tuple[List[CanonicalGate], OptimizationReport]:
+    """Optimize a canonical gate list, preserving what level names exactly"""
+    if level not in LEVELS:
+        raise ValueError(f"Unknown optimization level '{level}', expected one of {list(LEVELS)}")
+    report = OptimizationReport(level=level, original_gates=len(gates))
+
+    optimized = peephole(gates, report)
+    while level != "unitary":
+        size = len(optimized)
+        optimized = drop_initial_state_no_ops(optimized, report)
+        if level == "probabilities":
+            optimized = drop_diagonal_before_measurement(optimized, report)
+        if len(optimized) == size:
+            break
+        # Dropping gates can bring new pairs together
+        optimized = peephole(optimized, report)
+
+    report.optimized_gates = len(optimized)
+    return optimized, report
@@ -1,14 +1,17 @@
-from qiskit import QuantumCircuit
-from qiskit.visualization import circuit_drawer
-import matplotlib.pyplot as plt
 import numpy as np
 import io
 import base64
-from typing import Dict, Any, List
+from typing import Dict, Any, List, TYPE_CHECKING
 
-def circuit_to_svg(circuit: QuantumCircuit) -> str:
+# Drawing needs matplotlib and qiskit.visualization, imported on first use
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
+
+def circuit_to_svg(circuit: "QuantumCircuit") -> str:
     """Convert quantum circuit to SVG string for web display"""
     try:
+        import matplotlib.pyplot as plt
+        from qiskit.visualization import circuit_drawer
         fig = circuit_drawer(circuit, output='mpl', style='color')
         
         buffer = io.StringIO()
@@ -22,14 +25,15 @@ def circuit_to_svg(circuit: QuantumCircuit) -> str:
     except Exception:
         return ""
 
-def circuit_to_ascii(circuit: QuantumCircuit) -> str:
+def circuit_to_ascii(circuit: "QuantumCircuit") -> str:
     """Convert quantum circuit to ASCII representation"""
     try:
+        from qiskit.visualization import circuit_drawer
         return str(circuit_drawer(circuit, output='text'))
     except Exception:
         return str(circuit)
 
-def extract_circuit_stats(circuit: QuantumCircuit) -> Dict[str, Any]:
+def extract_circuit_stats(circuit: "QuantumCircuit") -> Dict[str, Any]:
     """Extract statistics from quantum circuit"""
     stats = {
         "num_qubits": circuit.num_qubits,
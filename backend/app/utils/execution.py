@@ -0,0 +1,320 @@
+import os
+import time
+import threading
+from dataclasses import dataclass, field
+from functools import cached_property
+from typing import TYPE_CHECKING, Any, Callable, Dict, Hashable, List, Optional, Tuple
+import numpy as np
+from pydantic import BaseModel
+
+from app.utils.cache import LRUCache
+from app.utils.cancellation import check_cancelled
+from app.utils.log import get_logger
+from app.utils.metrics import SIMULATION_SECONDS, track_cache
+from app.utils.singleflight import SingleFlight
+from app.utils.statevector import sample_frequencies
+from app.utils.timing import add_phase, phase
+
+# Qiskit and Aer take longer to import than the rest of the app together, so
+# they are imported where circuits are built and run, not at startup: the
+# exercise routes never need them (they run on the native kernels in
+# app.utils.statevector), and the Aer backends are created on first use.
+# The warm-up (app.utils.readiness) imports them in the background.
+if TYPE_CHECKING:
+    from qiskit import QuantumCircuit
+
+logger = get_logger(__name__)
+
+# Shots per Aer run when sampling, the cancellation token is checked between runs
+AER_SHOT_CHUNK = 100_000
+
+class ComplexNumber(BaseModel):
+    """Pydantic-compatible complex number representation"""
+    real: float
+    imag: float
+
+def to_complex_numbers(statevector) -> List[ComplexNumber]:
+    """Convert a statevector to its JSON-serializable form"""
+    return [ComplexNumber(real=float(amp.real), imag=float(amp.imag)) for amp in statevector]
+
+def extract_gate_sequence(circuit: "QuantumCircuit") -> List[Dict[str, Any]]:
+    """Extract gate sequence from circuit for visualization"""
+    gates = []
+    for instruction in circuit.data:
+        try:
+            gate_info = {
+                "name": instruction.operation.name,
+                "qubits": [circuit.find_bit(q).index for q in instruction.qubits],
+                "params": [float(p) for p in instruction.operation.params]
+            }
+            gates.append(gate_info)
+        except Exception:
+            # Fallback for any instruction format issues
+            gates.append({
+                "name": "unknown",
+                "qubits": [],
+                "params": []
+            })
+    return gates
+
+@dataclass
+class CompiledCircuit:
+    """A circuit prepared once for repeated execution"""
+    circuit: "QuantumCircuit"
+    statevector_circuit: "QuantumCircuit"
+    measurement_circuit: Optional["QuantumCircuit"]  # Only needed when measurements are mid-circuit
+    measurement_map: List[Tuple[int, int]]          # (qubit, clbit) pairs for terminal measurements
+    gates: List[Dict[str, Any]]
+    cache_key: Optional[Hashable] = None
+
+@dataclass
+class ExecutionResult:
+    statevector: np.ndarray
+    probabilities: List[float]
+    counts: Dict[str, int]
+
+@dataclass
+class ExecutionStats:
+    """Per-backend run counts and cumulative wall time"""
+    runs: Dict[str, int] = field(default_factory=dict)
+    seconds: Dict[str, float] = field(default_factory=dict)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, backend: str, elapsed: float, num_qubits: Optional[int] = None) -> None:
+        SIMULATION_SECONDS.observe(elapsed, backend=backend, qubits=num_qubits if num_qubits is not None else "unknown")
+        add_phase(backend, elapsed)
+        with self._lock:
+            self.runs[backend] = self.runs.get(backend, 0) + 1
+            self.seconds[backend] = self.seconds.get(backend, 0.0) + elapsed
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                backend: {"runs": runs, "total_seconds": self.seconds[backend]}
+                for backend, runs in self.runs.items()
+            }
+
+def terminal_measurements(circuit: "QuantumCircuit") -> Optional[List[Tuple[int, int]]]:
+    """Return the (qubit, clbit) measurement map if every measurement is terminal
+
+    Returns None when a measured qubit is acted on again or an instruction is
+    classically conditioned, in which case shots have to be simulated.
+    """
+    measured = set()
+    measurement_map = []
+    for instruction in circuit.data:
+        operation = instruction.operation
+        qubits = [circuit.find_bit(q).index for q in instruction.qubits]
+        if getattr(operation, "condition", None) is not None:
+            return None
+        if operation.name == 'measure':
+            clbit = circuit.find_bit(instruction.clbits[0]).index
+            measurement_map.append((qubits[0], clbit))
+            measured.add(qubits[0])
+        elif operation.name == 'barrier':
+            continue
+        elif measured.intersection(qubits):
+            return None
+    return measurement_map
+
+def format_counts(outcomes: np.ndarray, frequencies: np.ndarray, circuit: "QuantumCircuit",
+                  measurement_map: List[Tuple[int, int]]) -> Dict[str, int]:
+    """Turn sampled basis-state indices into Qiskit-style count keys
+
+    Registers are listed last-to-first separated by spaces and each register
+    is written most significant clbit first, matching Result.get_counts().
+    """
+    register_clbits = [[circuit.find_bit(c).index for c in reversed(creg)] for creg in reversed(circuit.cregs)]
+    counts: Dict[str, int] = {}
+    for outcome, frequency in zip(outcomes, frequencies):
+        clbit_values = ['0'] * circuit.num_clbits
+        for qubit, clbit in measurement_map:
+            clbit_values[clbit] = '1' if (int(outcome) >> qubit) & 1 else '0'
+        key = ' '.join(''.join(clbit_values[c] for c in clbits) for clbits in register_clbits)
+        counts[key] = counts.get(key, 0) + int(frequency)
+    return counts
+
+class ExecutionService:
+    """Shared simulation backends, caches and instrumentation
+
+    Every algorithm router and the circuit simulator go through this
+    service, so backends are created once per process and compiled circuits
+    and results can be reused across requests. Routes run their work through
+    coalesce(), which moves it off the event loop and shares it between
+    identical concurrent requests (see app.utils.singleflight).
+    """
+
+    def __init__(self, max_compiled: int = 128, max_results: int = 256, max_result_bytes: Optional[int] = None):
+        self.compiled_cache = LRUCache(max_compiled)
+        # Results are keyed on request parameters such as oracle seeds, so a
+        # client can fill the cache with 20-qubit states: bound it by bytes too
+        self.result_cache = LRUCache(max_results, max_result_bytes)
+        self.stats = ExecutionStats()
+        self.flights = SingleFlight("simulation")
+        self._warmups: List[Tuple[str, Callable[[], None]]] = []
+
+    @cached_property
+    def statevector_backend(self):
+        from qiskit_aer import AerSimulator
+        return AerSimulator(method='statevector')
+
+    @cached_property
+    def shot_backend(self):
+        from qiskit_aer import AerSimulator
+        return AerSimulator()
+
+    def register_warmup(self, name: str, warmup: Callable[[], None]) -> None:
+        """Register a callable that pre-builds commonly requested circuits"""
+        self._warmups.append((name, warmup))
+
+    def warm_up(self) -> Dict[str, float]:
+        """Run every registered warm-up, returns seconds spent per entry"""
+        timings = {}
+        for name, warmup in self._warmups:
+            start = time.perf_counter()
+            try:
+                warmup()
+            except Exception as e:
+                logger.warning("warm-up %s failed: %s", name, e)
+            timings[name] = time.perf_counter() - start
+        return timings
+
+    def compile_cached(self, cache_key: Hashable, build: Callable[[], "QuantumCircuit"]) -> CompiledCircuit:
+        """Return the compiled circuit for cache_key, building it only on a miss
+
+        Callers key on the parameters the circuit depends on, so steady-state
+        requests skip both circuit construction and transpilation.
+        """
+        cached = self.compiled_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        with phase("circuit"):
+            circuit = build()
+        return self.compile(circuit, cache_key)
+
+    def compile(self, circuit: "QuantumCircuit", cache_key: Optional[Hashable] = None) -> CompiledCircuit:
+        """Transpile a circuit for the shared backends, storing it under cache_key if given"""
+        from qiskit import QuantumCircuit, transpile
+        import qiskit_aer  # noqa: F401  (adds QuantumCircuit.save_statevector)
+        start = time.perf_counter()
+        statevector_circuit = QuantumCircuit(circuit.num_qubits)
+        for instruction in circuit.data:
+            if instruction.operation.name not in ('measure', 'barrier'):
+                statevector_circuit.append(instruction.operation,
+                                           [circuit.find_bit(q).index for q in instruction.qubits])
+        statevector_circuit.save_statevector()
+
+        measurement_map = terminal_measurements(circuit)
+        measurement_circuit = None
+        if measurement_map is None:
+            measurement_circuit = transpile(circuit, self.shot_backend)
+            measurement_map = []
+
+        compiled = CompiledCircuit(
+            circuit=circuit,
+            statevector_circuit=transpile(statevector_circuit, self.statevector_backend),
+            measurement_circuit=measurement_circuit,
+            measurement_map=measurement_map,
+            gates=extract_gate_sequence(circuit),
+            cache_key=cache_key
+        )
+        self.stats.record("transpile", time.perf_counter() - start, circuit.num_qubits)
+
+        if cache_key is not None:
+            self.compiled_cache.put(cache_key, compiled)
+        return compiled
+
+    def run(self, circuit, shots: int = 1024, cache_key: Optional[Hashable] = None,
+            seed: Optional[int] = None) -> ExecutionResult:
+        """Simulate a circuit (or CompiledCircuit) and return statevector, probabilities and counts
+
+        The final state is deterministic, so it is kept in the result cache
+        under cache_key (defaulting to the compiled circuit's key). Counts
+        are sampled from it on every call when every measurement is
+        terminal, so only one simulation runs per distinct circuit.
+        """
+        compiled = circuit if isinstance(circuit, CompiledCircuit) else self.compile(circuit)
+        if cache_key is None:
+            cache_key = compiled.cache_key
+
+        final_state = self.result_cache.get(cache_key) if cache_key is not None else None
+        if final_state is None:
+            # An Aer run cannot be interrupted, so check before starting one
+            check_cancelled()
+            start = time.perf_counter()
+            result = self.statevector_backend.run(compiled.statevector_circuit, shots=1).result()
+            statevector = np.asarray(result.get_statevector())
+            final_state = (statevector, np.abs(statevector) ** 2)
+            self.stats.record("aer_statevector", time.perf_counter() - start, compiled.circuit.num_qubits)
+            if cache_key is not None:
+                self.result_cache.put(cache_key, final_state)
+        statevector, probabilities = final_state
+
+        start = time.perf_counter()
+        if compiled.measurement_circuit is not None:
+            counts = self.run_shots(compiled.measurement_circuit, shots, seed)
+            self.stats.record("aer_shots", time.perf_counter() - start, compiled.circuit.num_qubits)
+        else:
+            counts = self.sample_counts(probabilities, compiled, shots, seed)
+            self.stats.record("sampling", time.perf_counter() - start, compiled.circuit.num_qubits)
+
+        return ExecutionResult(statevector, probabilities.tolist(), counts)
+
+    def run_shots(self, circuit: "QuantumCircuit", shots: int, seed: Optional[int] = None) -> Dict[str, int]:
+        """Aer shot counts, run in chunks of AER_SHOT_CHUNK with a cancellation check before each, none for 0 shots"""
+        counts: Dict[str, int] = {}
+        for index, start in enumerate(range(0, shots, AER_SHOT_CHUNK)):
+            check_cancelled()
+            chunk_seed = None if seed is None else seed + index
+            chunk = self.shot_backend.run(circuit, shots=min(AER_SHOT_CHUNK, shots - start),
+                                          seed_simulator=chunk_seed).result().get_counts()
+            for bits, count in chunk.items():
+                counts[bits] = counts.get(bits, 0) + count
+        return counts
+
+    def sample_counts(self, probabilities: np.ndarray, compiled: CompiledCircuit, shots: int,
+                      seed: Optional[int] = None) -> Dict[str, int]:
+        """Draw measurement counts from the final-state probabilities"""
+        if not compiled.measurement_map or shots <= 0:
+            return {}
+        rng = np.random.default_rng(seed)
+        frequencies = sample_frequencies(rng, shots, probabilities / probabilities.sum())
+        outcomes = np.flatnonzero(frequencies)
+        return format_counts(outcomes, frequencies[outcomes], compiled.circuit, compiled.measurement_map)
+
+    def run_native(self, backend: str, compute: Callable[[], Any], cache_key: Optional[Hashable] = None,
+                   num_qubits: Optional[int] = None) -> Any:
+        """Run a native (non-Aer) kernel with the shared result cache and instrumentation"""
+        if cache_key is not None:
+            cached = self.result_cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        start = time.perf_counter()
+        value = compute()
+        self.stats.record(backend, time.perf_counter() - start, num_qubits)
+
+        if cache_key is not None:
+            self.result_cache.put(cache_key, value)
+        return value
+
+    async def coalesce(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        """Run compute in the threadpool, sharing it with identical requests already in flight"""
+        return await self.flights.run(key, compute)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Instrumentation summary for health and metrics endpoints"""
+        return {
+            "backends": self.stats.snapshot(),
+            "compiled_cache": self.compiled_cache.stats(),
+            "result_cache": self.result_cache.stats(),
+            "in_flight": self.flights.stats()
+        }
+
+execution_service = ExecutionService(
+    max_compiled=int(os.environ.get("CIRCUIT_CACHE_SIZE", "128")),
+    max_results=int(os.environ.get("RESULT_CACHE_SIZE", "256")),
+    max_result_bytes=int(os.environ.get("RESULT_CACHE_BYTES", str(256 * 2 ** 20)))
+)
+track_cache("compiled_circuits", execution_service.compiled_cache)
+track_cache("results", execution_service.result_cache)
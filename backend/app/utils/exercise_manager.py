@@ -1,35 +1,313 @@
 import json
-from typing import Dict, List, Optional
+import os
+import threading
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Tuple
+import numpy as np
+
+from app.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# How far a target may be from normalized (or unitary) before it is rejected
+NORMALIZATION_TOLERANCE = 1e-6
+
+# Largest unitary target compared as a full matrix under method "auto";
+# bigger ones are checked by randomized equivalence testing
+EXACT_UNITARY_MAX_QUBITS = 10
+
+UNITARY_METHODS = ("auto", "exact", "randomized")
+
+@dataclass
+class CompiledTarget:
+    """Exercise target converted once into a NumPy array
+
+    kind is "statevector" (complex amplitudes), "probabilities" (dense vector
+    indexed by basis state) or "unitary" (complex 2^n x 2^n matrix). A
+    unitary target checked by randomized equivalence ("randomized" method)
+    may have no matrix and use the exercise's solution circuit as reference.
+    """
+    kind: str
+    data: Optional[np.ndarray]
+    tolerance: float
+    num_qubits: int
+    method: str = "exact"
+    confidence: float = 0.999
+    reference: Optional[List[Dict]] = None
+
+def _to_complex(value) -> complex:
+    """Targets store amplitudes as plain numbers or [real, imag] pairs"""
+    if isinstance(value, (list, tuple)):
+        return complex(value[0], value[1])
+    return complex(value)
+
+def compile_target(exercise: Dict) -> CompiledTarget:
+    """Convert an exercise's target_data into a validated NumPy array"""
+    target_type = exercise["target_type"]
+    target_data = exercise["target_data"]
+    num_qubits = int(exercise["num_qubits"])
+    tolerance = float(target_data.get("tolerance", 0.001))
+    dimension = 2 ** num_qubits
+
+    if target_type == "state_vector":
+        state = np.array([_to_complex(v) for v in target_data["state_vector"]], dtype=complex)
+        if state.shape != (dimension,):
+            raise ValueError(f"state_vector has {len(state)} amplitudes, expected {dimension}")
+        norm = np.linalg.norm(state)
+        if abs(norm - 1) > NORMALIZATION_TOLERANCE:
+            raise ValueError(f"state_vector is not normalized (norm {norm:.6f})")
+        return CompiledTarget("statevector", state, tolerance, num_qubits)
+
+    if target_type in ("probabilities", "measurement"):
+        probabilities = np.zeros(dimension)
+        for bitstring, probability in target_data["measurement_probabilities"].items():
+            if len(bitstring) != num_qubits or set(bitstring) - {"0", "1"}:
+                raise ValueError(f"Invalid basis state '{bitstring}' for {num_qubits} qubits")
+            probabilities[int(bitstring, 2)] = probability
+        total = probabilities.sum()
+        if probabilities.min() < 0 or abs(total - 1) > NORMALIZATION_TOLERANCE:
+            raise ValueError(f"measurement_probabilities do not sum to 1 (sum {total:.6f})")
+        return CompiledTarget("probabilities", probabilities, tolerance, num_qubits)
+
+    if target_type == "unitary":
+        method = target_data.get("method", "auto")
+        if method not in UNITARY_METHODS:
+            raise ValueError(f"Unknown unitary method '{method}', expected one of {list(UNITARY_METHODS)}")
+        confidence = float(target_data.get("confidence", 0.999))
+        if not 0 < confidence < 1:
+            raise ValueError(f"confidence must be between 0 and 1, got {confidence}")
+        reference = exercise.get("solution")
+
+        matrix = None
+        if "unitary_matrix" in target_data:
+            matrix = np.array([[_to_complex(v) for v in row] for row in target_data["unitary_matrix"]], dtype=complex)
+            if matrix.shape != (dimension, dimension):
+                raise ValueError(f"unitary_matrix has shape {matrix.shape}, expected ({dimension}, {dimension})")
+            if not np.allclose(matrix.conj().T @ matrix, np.eye(dimension), atol=NORMALIZATION_TOLERANCE * dimension):
+                raise ValueError("unitary_matrix is not unitary")
+        elif not reference:
+            raise ValueError("unitary target needs a unitary_matrix or a solution circuit")
+        elif method == "exact":
+            raise ValueError("method 'exact' needs a unitary_matrix")
+
+        if method == "auto":
+            method = "exact" if matrix is not None and num_qubits <= EXACT_UNITARY_MAX_QUBITS else "randomized"
+        return CompiledTarget("unitary", matrix, tolerance, num_qubits, method, confidence, reference)
+
+    raise ValueError(f"Unknown target_type '{target_type}'")
+
+class ExerciseCatalog:
+    """Immutable snapshot of the exercise list with its indexes and compiled targets
+
+    A reload builds a new catalog and swaps it in whole, so code holding a
+    catalog always sees exercises and targets from the same file version.
+    """
+
+    def __init__(self, data: Dict, version: int = 1):
+        self.version = version
+        self._by_id: Dict[str, Dict] = {}
+        self._targets: Dict[str, CompiledTarget] = {}
+        self._by_tag: Dict[str, List[str]] = {}
+        self._by_difficulty: Dict[str, List[str]] = {}
+        self._solutions: Dict[str, List[Dict]] = {}
+        self.errors: Dict[str, str] = {}
+
+        public = []
+        for raw in data.get("exercises", []):
+            # Reference solutions stay server-side, exercises are served without them
+            ex = {key: value for key, value in raw.items() if key != "solution"}
+            public.append(ex)
+            exercise_id = ex.get("id")
+            if exercise_id is None:
+                continue
+            try:
+                self._targets[exercise_id] = compile_target(raw)
+            except (KeyError, TypeError, ValueError) as e:
+                self.errors[exercise_id] = str(e)
+                logger.warning("skipping exercise %s: invalid target - %s", exercise_id, e)
+                continue
+
+            if "solution" in raw:
+                self._solutions[exercise_id] = raw["solution"]
+            self._by_id[exercise_id] = ex
+            for tag in ex.get("tags", []):
+                self._by_tag.setdefault(tag, []).append(exercise_id)
+            self._by_difficulty.setdefault(ex.get("difficulty", ""), []).append(exercise_id)
+
+        # The file's contents as served, without any reference solution
+        self.data = {**data, "exercises": public}
+
+    def get_exercise(self, exercise_id: str) -> Optional[Dict]:
+        """Get specific exercise by ID"""
+        return self._by_id.get(exercise_id)
+
+    def get_target(self, exercise_id: str) -> Optional[CompiledTarget]:
+        """Get the precompiled target of an exercise"""
+        return self._targets.get(exercise_id)
+
+    def get_solution(self, exercise_id: str) -> Optional[List[Dict]]:
+        """Get the reference solution (frontend gate dictionaries) of an exercise, if it has one"""
+        return self._solutions.get(exercise_id)
+
+    def get_all_exercises(self) -> List[Dict]:
+        """Get all exercises"""
+        return list(self._by_id.values())
+
+    def list_exercises(self, tag: Optional[str] = None, difficulty: Optional[str] = None) -> List[Dict]:
+        """Get exercises filtered by tag and/or difficulty, in catalog order"""
+        if tag is None and difficulty is None:
+            return self.get_all_exercises()
+
+        candidates = None
+        if tag is not None:
+            candidates = self._by_tag.get(tag, [])
+        if difficulty is not None:
+            by_difficulty = self._by_difficulty.get(difficulty, [])
+            if candidates is None:
+                candidates = by_difficulty
+            else:
+                allowed = set(by_difficulty)
+                candidates = [exercise_id for exercise_id in candidates if exercise_id in allowed]
+        return [self._by_id[exercise_id] for exercise_id in candidates]
 
 class ExerciseManager:
+    """Serves the current ExerciseCatalog and hot-reloads it when the file changes
+
+    Readers never take a lock: they read self.catalog, which a reload
+    replaces with a fully built catalog in a single assignment.
+    """
+
     def __init__(self, json_path: str = "exercises_list.json"):
         self.json_path = json_path
-        self.exercises = self._load_exercises()
-    
-    def _load_exercises(self) -> Dict:
+        self._reload_lock = threading.Lock()
+        self._listeners: List[Callable[[ExerciseCatalog, ExerciseCatalog], None]] = []
+        self._watcher: Optional[threading.Thread] = None
+        self._stop_watching = threading.Event()
+        # (mtime, size) of the file as last read, whether or not it parsed
+        self._seen_signature = self._file_signature()
+        self.catalog = ExerciseCatalog(self._load_exercises() or {"exercises": []})
+
+    @property
+    def exercises(self) -> Dict:
+        return self.catalog.data
+
+    @property
+    def errors(self) -> Dict[str, str]:
+        return self.catalog.errors
+
+    @property
+    def version(self) -> int:
+        return self.catalog.version
+
+    def _file_signature(self) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self.json_path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _load_exercises(self) -> Optional[Dict]:
+        """Parse the exercises file, returns None if it cannot be read"""
         try:
             with open(self.json_path, 'r') as f:
                 data = json.load(f)
-                print(f"Successfully loaded {len(data.get('exercises', []))} exercises")
+                logger.info("loaded exercises", extra={"path": self.json_path, "exercises": len(data.get("exercises", []))})
                 return data
-                
+
         except FileNotFoundError:
-            print(f"Exercises file not found: {self.json_path}")
-            return {"exercises": []}
+            logger.error("exercises file not found: %s", self.json_path)
+            return None
         except json.JSONDecodeError as e:
-            print(f"Invalid JSON in exercises file: {self.json_path} - {e}")
-            return {"exercises": []}
-        except Exception as e:
-            print(f"Error loading exercises: {e}")
-            return {"exercises": []}
-    
+            logger.error("invalid JSON in exercises file %s: %s", self.json_path, e)
+            return None
+        except Exception:
+            logger.exception("error loading exercises from %s", self.json_path)
+            return None
+
+    def add_reload_listener(self, listener: Callable[[ExerciseCatalog, ExerciseCatalog], None]) -> None:
+        """Call listener(old_catalog, new_catalog) after every successful reload
+
+        Used to drop caches keyed on the previous catalog's targets.
+        """
+        self._listeners.append(listener)
+
+    def reload(self) -> bool:
+        """Re-read the file and swap in a new catalog, returns True if it was replaced
+
+        A file that cannot be parsed keeps the current catalog in service, and
+        so does one that parses but would leave no exercises or fails to
+        validate an exercise the current catalog serves: swapping it in would
+        take those exercises away (and drop every listener's caches) because
+        of an editing mistake. Exercises deleted from the file are removed.
+        """
+        with self._reload_lock:
+            self._seen_signature = self._file_signature()
+            data = self._load_exercises()
+            if not isinstance(data, dict) or not isinstance(data.get("exercises"), list):
+                logger.warning("keeping exercise catalog version %d: reload of %s failed", self.catalog.version, self.json_path)
+                return False
+
+            old = self.catalog
+            new = ExerciseCatalog(data, version=old.version + 1)
+            broken = sorted(exercise_id for exercise_id in new.errors if old.get_exercise(exercise_id) is not None)
+            if broken or (not new.get_all_exercises() and old.get_all_exercises()):
+                logger.warning("keeping exercise catalog version %d: reload of %s rejected %s", old.version,
+                               self.json_path, broken or "every exercise",
+                               extra={"rejected": sorted(new.errors)})
+                return False
+            self.catalog = new
+            logger.info("exercise catalog reloaded", extra={"version": new.version, "exercises": len(new.get_all_exercises()),
+                                                            "rejected": sorted(new.errors)})
+
+        for listener in self._listeners:
+            try:
+                listener(old, new)
+            except Exception:
+                logger.exception("exercise reload listener failed")
+        return True
+
+    def check_for_changes(self) -> bool:
+        """Reload if the file's mtime or size changed since it was last read"""
+        signature = self._file_signature()
+        if signature is None or signature == self._seen_signature:
+            return False
+        return self.reload()
+
+    def start_watching(self, interval: float = 2.0) -> None:
+        """Poll the file every interval seconds on a background thread"""
+        if self._watcher is not None:
+            return
+        self._stop_watching.clear()
+
+        def watch():
+            while not self._stop_watching.wait(interval):
+                try:
+                    self.check_for_changes()
+                except Exception:
+                    logger.exception("exercise file watcher error")
+
+        self._watcher = threading.Thread(target=watch, name="exercise-watcher", daemon=True)
+        self._watcher.start()
+
+    def stop_watching(self) -> None:
+        if self._watcher is None:
+            return
+        self._stop_watching.set()
+        self._watcher.join()
+        self._watcher = None
+
     def get_exercise(self, exercise_id: str) -> Optional[Dict]:
         """Get specific exercise by ID"""
-        for ex in self.exercises.get("exercises", []):
-            if ex.get("id") == exercise_id:
-                return ex
-        return None
-        
+        return self.catalog.get_exercise(exercise_id)
+
+    def get_target(self, exercise_id: str) -> Optional[CompiledTarget]:
+        """Get the precompiled target of an exercise"""
+        return self.catalog.get_target(exercise_id)
+
     def get_all_exercises(self) -> List[Dict]:
         """Get all exercises"""
-        return self.exercises.get("exercises", [])
+        return self.catalog.get_all_exercises()
+
+    def list_exercises(self, tag: Optional[str] = None, difficulty: Optional[str] = None) -> List[Dict]:
+        """Get exercises filtered by tag and/or difficulty, in catalog order"""
+        return self.catalog.list_exercises(tag=tag, difficulty=difficulty)
@@ -0,0 +1,260 @@
+import os
+import queue
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, List, Optional
+
+from app.utils.cancellation import Cancelled, CancellationToken, DeadlineExceeded, bind_token, reset_token
+from app.utils.log import bind_correlation_id, get_correlation_id, get_logger, reset_correlation_id
+from app.utils.metrics import JOBS, QUEUE_DEPTH
+
+logger = get_logger(__name__)
+
+# Background jobs for simulations that do not fit in an HTTP request.
+#
+# JobQueue holds submitted jobs in memory and runs them on a fixed pool of
+# worker threads, so at most `workers` heavy simulations compete with the
+# interactive routes at any time and at most `max_queued` wait behind them;
+# submit() raises QueueFull beyond that rather than queueing without bound.
+# Worker threads are started with the first submission.
+#
+# Cancellation and deadlines are cooperative: every job has a
+# CancellationToken (app.utils.cancellation), bound to the worker's context
+# while it runs. A job's function receives the Job and calls
+# job.update(progress, message) between units of work, which records
+# progress and raises Cancelled once the job has been cancelled or
+# DeadlineExceeded once it has passed its deadline; the simulation kernels
+# check the same token between gates and sampling chunks. A job still
+# queued when it is cancelled or reaches its deadline never starts.
+#
+# Finished jobs, with their results, are kept for `result_ttl` seconds
+# after they finish and then dropped.
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+TIMED_OUT = "timed_out"
+FINISHED_STATES = {SUCCEEDED, FAILED, CANCELLED, TIMED_OUT}
+
+class QueueFull(Exception):
+    """Raised by submit() when max_queued jobs are already waiting"""
+
+class Job:
+    """One background job: its state, progress and, once finished, result or error"""
+
+    def __init__(self, kind: str, run: Callable[["Job"], Any], timeout: float,
+                 params: Optional[Dict[str, Any]] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.run = run
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message: Optional[str] = None
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.timeout = timeout
+        self.token = CancellationToken(timeout, scope="job")
+        self.correlation_id = get_correlation_id()
+        # Incremented on every change, so watchers can tell when to report
+        self.version = 0
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def expired(self) -> bool:
+        deadline = self.token.deadline
+        return deadline is not None and time.monotonic() > deadline
+
+    def check(self) -> None:
+        """Raise Cancelled if the job should stop"""
+        self.token.check()
+
+    def update(self, progress: float, message: Optional[str] = None) -> None:
+        """Record progress (0 to 1) from inside the job, raising Cancelled if it should stop"""
+        self.check()
+        self.progress = min(max(progress, 0.0), 1.0)
+        if message is not None:
+            self.message = message
+        self.version += 1
+
+    def _finish(self, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        self.status = status
+        self.result = result
+        self.error = error
+        if status == SUCCEEDED:
+            self.progress = 1.0
+        self.finished_at = time.time()
+        self.version += 1
+        JOBS.inc(kind=self.kind, status=status)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Status without the result"""
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "progress": self.progress,
+            "message": self.message,
+            "error": self.error,
+            "params": self.params,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "timeout": self.timeout
+        }
+
+class JobQueue:
+    """Bounded in-memory job queue served by a fixed pool of worker threads"""
+
+    def __init__(self, workers: int = 2, max_queued: int = 64, result_ttl: float = 600.0,
+                 default_timeout: float = 300.0, max_timeout: float = 3600.0):
+        self.workers = workers
+        self.max_queued = max_queued
+        self.result_ttl = result_ttl
+        self.default_timeout = default_timeout
+        self.max_timeout = max_timeout
+        self._queue: "queue.Queue[Optional[Job]]" = queue.Queue(maxsize=max_queued)
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+        self.running = 0
+
+    def submit(self, kind: str, run: Callable[[Job], Any], timeout: Optional[float] = None,
+               params: Optional[Dict[str, Any]] = None) -> Job:
+        """Queue run(job) in the background, raises QueueFull if max_queued jobs are waiting"""
+        self.purge_expired()
+        timeout = min(timeout or self.default_timeout, self.max_timeout)
+        job = Job(kind, run, timeout, params)
+        with self._lock:
+            self._start_workers()
+            try:
+                self._queue.put_nowait(job)
+            except queue.Full:
+                raise QueueFull(f"{self.max_queued} jobs are already waiting")
+            self._jobs[job.id] = job
+        logger.info("job queued", extra={"job_id": job.id, "kind": kind, "timeout": timeout})
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self.purge_expired()
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[Job]:
+        """Known jobs, oldest first"""
+        self.purge_expired()
+        with self._lock:
+            return sorted(self._jobs.values(), key=lambda job: job.created_at)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a job; a queued job is finished at once, a running one stops at its next check"""
+        job = self.get(job_id)
+        if job is None or job.finished:
+            return job
+        job.token.cancel()
+        with self._lock:
+            if job.status == QUEUED:
+                job._finish(CANCELLED, error="cancelled")
+        logger.info("job cancel requested", extra={"job_id": job.id, "status": job.status})
+        return job
+
+    def depth(self) -> int:
+        """Jobs waiting for a worker"""
+        return self._queue.qsize()
+
+    def purge_expired(self) -> None:
+        """Drop finished jobs older than result_ttl"""
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job.finished_at is not None and job.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def _start_workers(self) -> None:
+        if self._threads:
+            return
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def _work(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            with self._lock:
+                if job.finished:
+                    continue
+                if job.expired():
+                    job._finish(TIMED_OUT, error=f"deadline of {job.timeout:g}s exceeded while queued")
+                    continue
+                job.status = RUNNING
+                job.started_at = time.time()
+                job.version += 1
+                self.running += 1
+            correlation_token = bind_correlation_id(job.correlation_id)
+            cancellation_token = bind_token(job.token)
+            try:
+                self._execute(job)
+            finally:
+                reset_token(cancellation_token)
+                reset_correlation_id(correlation_token)
+                with self._lock:
+                    self.running -= 1
+
+    def _execute(self, job: Job) -> None:
+        start = time.perf_counter()
+        try:
+            result = job.run(job)
+        except DeadlineExceeded as e:
+            job._finish(TIMED_OUT, error=str(e))
+        except Cancelled as e:
+            job._finish(CANCELLED, error=str(e))
+        except Exception as e:
+            logger.exception("job failed", extra={"job_id": job.id, "kind": job.kind})
+            job._finish(FAILED, error=str(e))
+        else:
+            job._finish(SUCCEEDED, result=result)
+        logger.info("job finished", extra={"job_id": job.id, "kind": job.kind, "status": job.status,
+                                           "seconds": round(time.perf_counter() - start, 3)})
+
+    def stop(self, timeout: float = 5.0) -> None:
+        """Cancel every unfinished job and stop the workers"""
+        for job in list(self._jobs.values()):
+            if not job.finished:
+                self.cancel(job.id)
+        threads, self._threads = self._threads, []
+        for _ in threads:
+            # Blocks only while the queue is full of jobs the workers will now skip
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            statuses: Dict[str, int] = {}
+            for job in self._jobs.values():
+                statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "workers": self.workers,
+            "running": self.running,
+            "queued": self.depth(),
+            "max_queued": self.max_queued,
+            "jobs": statuses
+        }
+
+job_queue = JobQueue(
+    workers=int(os.getenv("JOB_WORKERS", "2")),
+    max_queued=int(os.getenv("JOB_MAX_QUEUED", "64")),
+    result_ttl=float(os.getenv("JOB_RESULT_TTL", "600")),
+    default_timeout=float(os.getenv("JOB_TIMEOUT", "300"))
+)
+QUEUE_DEPTH.set_function(job_queue.depth, queue="jobs")
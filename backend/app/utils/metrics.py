@@ -0,0 +1,427 @@
+import bisect
+import json
+import os
+import resource
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Prometheus-style metrics, aggregated across worker processes.
+#
+# Counters, gauges and histograms keep their values in per-thread shards:
+# each thread only ever writes its own dict, so recording a sample takes no
+# lock, and readers sum the shards. Shards of threads that have exited are
+# folded into one retired total, so threadpool churn does not grow the list.
+# Values owned elsewhere (cache hit counts, queue sizes) are read through
+# callbacks when a snapshot is taken.
+#
+# With METRICS_DIR set, every process periodically writes its snapshot to
+# METRICS_DIR/metrics-<pid>.json (atomically, via a rename), and /metrics
+# merges all files: counters and histograms are summed, gauges are combined
+# by their aggregate mode. Gauges of processes that shut down are dropped,
+# their counters are kept. A snapshot not rewritten for STALE_INTERVALS
+# flush intervals belongs to a worker that crashed or was killed and counts
+# as shut down; after RETAIN_INTERVALS its file is deleted. Without
+# METRICS_DIR only the serving process is reported.
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# How gauges from several processes are combined
+GAUGE_AGGREGATES = ("sum", "max", "pid")
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Flush intervals after which another process's snapshot is treated as shut down, then deleted
+STALE_INTERVALS = 3
+RETAIN_INTERVALS = 60
+
+class _Shards:
+    """Per-thread value dicts, written without locks and summed on read"""
+
+    def __init__(self):
+        self._local = threading.local()
+        self._shards: List[Tuple[threading.Thread, dict]] = []
+        self._retired: dict = {}
+        self._lock = threading.Lock()
+
+    def local(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._retire()
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def _retire(self) -> None:
+        """Fold the shards of exited threads into the retired total, with the lock held"""
+        live = []
+        for thread, shard in self._shards:
+            if thread.is_alive():
+                live.append((thread, shard))
+                continue
+            for key, value in shard.items():
+                total = self._retired.get(key)
+                if total is None:
+                    self._retired[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    self._retired[key] = [a + b for a, b in zip(total, value)]
+                else:
+                    self._retired[key] = total + value
+        self._shards = live
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def copies(self) -> List[dict]:
+        with self._lock:
+            self._retire()
+            shards = [shard for _, shard in self._shards]
+            retired = dict(self._retired)
+        # dict.copy() runs under the GIL, so it never sees a half-applied update
+        return [retired] + [shard.copy() for shard in shards]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._retired.clear()
+            for _, shard in self._shards:
+                shard.clear()
+
+class Metric:
+    """Common base: name, help text, label names and the label-key encoding"""
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._shards = _Shards()
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {list(self.labelnames)}, got {sorted(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def describe(self) -> Dict[str, Any]:
+        return {"type": self.type, "help": self.help, "labels": list(self.labelnames)}
+
+class Counter(Metric):
+    """Monotonic count, incremented locally or read from a callback"""
+    type = "counter"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+        super().__init__(name, help, labels)
+        self._functions: Dict[Tuple[str, ...], Callable[[], float]] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        shard = self._shards.local()
+        shard[key] = shard.get(key, 0) + amount
+
+    def set_function(self, function: Callable[[], float], **labels) -> None:
+        """Report a value maintained elsewhere (for a counter it must never decrease)"""
+        self._functions[self._key(labels)] = function
+
+    def samples(self) -> Dict[Tuple[str, ...], float]:
+        values: Dict[Tuple[str, ...], float] = {}
+        for shard in self._shards.copies():
+            for key, value in shard.items():
+                values[key] = values.get(key, 0) + value
+        for key, function in list(self._functions.items()):
+            values[key] = values.get(key, 0) + function()
+        return values
+
+class Gauge(Counter):
+    """Value that can go up and down; aggregate says how processes are combined"""
+    type = "gauge"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), aggregate: str = "sum"):
+        super().__init__(name, help, labels)
+        if aggregate not in GAUGE_AGGREGATES:
+            raise ValueError(f"Unknown gauge aggregate '{aggregate}', expected one of {list(GAUGE_AGGREGATES)}")
+        self.aggregate = aggregate
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "aggregate": self.aggregate}
+
+class Histogram(Metric):
+    """Bucketed observations; each sample is [bucket counts..., sum, count]"""
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: Iterable[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        shard = self._shards.local()
+        sample = shard.get(key)
+        if sample is None:
+            sample = shard[key] = [0] * (len(self.buckets) + 2)
+        # Non-cumulative here, the +Inf bucket is the total count
+        index = bisect.bisect_left(self.buckets, value)
+        if index < len(self.buckets):
+            sample[index] += 1
+        sample[-2] += value
+        sample[-1] += 1
+
+    def time(self, **labels) -> "_Timer":
+        """Context manager observing the wall time of its block"""
+        return _Timer(self, labels)
+
+    def samples(self) -> Dict[Tuple[str, ...], List[float]]:
+        values: Dict[Tuple[str, ...], List[float]] = {}
+        for shard in self._shards.copies():
+            for key, sample in shard.items():
+                total = values.setdefault(key, [0] * len(sample))
+                for i, value in enumerate(list(sample)):
+                    total[i] += value
+        return values
+
+    def describe(self) -> Dict[str, Any]:
+        return {**super().describe(), "buckets": list(self.buckets)}
+
+class _Timer:
+    __slots__ = ("histogram", "labels", "start")
+
+    def __init__(self, histogram: Histogram, labels: Dict[str, Any]):
+        self.histogram = histogram
+        self.labels = labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, **self.labels)
+        return False
+
+class MetricsRegistry:
+    """Named metrics of one process, plus snapshot files shared with other workers"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+        self._flusher: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        # Seconds between snapshot writes, also how often other processes are expected to write theirs
+        self.interval = 5.0
+
+    def register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if existing.describe() != metric.describe():
+                    raise ValueError(f"Metric {metric.name} is already registered with a different shape")
+                return existing
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labels))
+
+    def gauge(self, name: str, help: str, labels: Iterable[str] = (), aggregate: str = "sum") -> Gauge:
+        return self.register(Gauge(name, help, labels, aggregate))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def snapshot(self, alive: bool = True) -> Dict[str, Any]:
+        """JSON-serializable values of every metric in this process"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        entries = {}
+        for metric in metrics:
+            samples = [[list(key), value] for key, value in metric.samples().items()]
+            entries[metric.name] = {**metric.describe(), "samples": samples}
+        return {"pid": os.getpid(), "alive": alive, "time": time.time(), "metrics": entries}
+
+    def snapshot_path(self, directory: str, pid: Optional[int] = None) -> str:
+        return os.path.join(directory, f"metrics-{pid or os.getpid()}.json")
+
+    def write(self, directory: str, alive: bool = True) -> None:
+        """Write this process's snapshot to directory, replacing its previous one"""
+        os.makedirs(directory, exist_ok=True)
+        path = self.snapshot_path(directory)
+        temporary = f"{path}.tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.snapshot(alive), f)
+        os.replace(temporary, path)
+
+    def collect(self, directory: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Fresh snapshot of this process plus the latest snapshot of every other process in directory"""
+        snapshots = [self.snapshot()]
+        if directory and os.path.isdir(directory):
+            own = os.path.basename(self.snapshot_path(directory))
+            now = time.time()
+            for name in sorted(os.listdir(directory)):
+                if not name.startswith("metrics-") or not name.endswith(".json") or name == own:
+                    continue
+                path = os.path.join(directory, name)
+                try:
+                    with open(path) as f:
+                        snapshot = json.load(f)
+                except (OSError, ValueError):
+                    # Snapshots are replaced atomically, a failed read means the worker just went away
+                    continue
+                age = now - snapshot.get("time", 0)
+                if age > RETAIN_INTERVALS * self.interval:
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                    continue
+                if age > STALE_INTERVALS * self.interval:
+                    # The worker died without writing its final snapshot
+                    snapshot["alive"] = False
+                snapshots.append(snapshot)
+        return snapshots
+
+    def render(self, directory: Optional[str] = None) -> str:
+        """Prometheus text exposition of every process's metrics"""
+        return render(aggregate(self.collect(directory)))
+
+    def start_flushing(self, directory: str, interval: float = 5.0) -> None:
+        """Write this process's snapshot to directory every interval seconds"""
+        if self._flusher is not None:
+            return
+        self._stop.clear()
+        self.interval = interval
+
+        def flush():
+            while not self._stop.wait(interval):
+                try:
+                    self.write(directory)
+                except OSError:
+                    continue
+
+        self.write(directory)
+        self._flusher = threading.Thread(target=flush, name="metrics-flusher", daemon=True)
+        self._flusher.start()
+
+    def stop_flushing(self, directory: str) -> None:
+        """Stop the flusher and write a final snapshot marking this process as gone"""
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join(timeout=5)
+            self._flusher = None
+        self.write(directory, alive=False)
+
+def aggregate(snapshots: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Merge per-process snapshots into one set of metric families"""
+    families: Dict[str, Dict[str, Any]] = {}
+    for snapshot in snapshots:
+        for name, entry in snapshot["metrics"].items():
+            family = families.setdefault(name, {**{k: v for k, v in entry.items() if k != "samples"}, "samples": {}})
+            samples = family["samples"]
+            if entry["type"] == "gauge":
+                if not snapshot.get("alive", True):
+                    continue
+                if entry.get("aggregate") == "pid":
+                    family["labels"] = entry["labels"] + ["pid"]
+                    for key, value in entry["samples"]:
+                        samples[tuple(key) + (str(snapshot["pid"]),)] = value
+                    continue
+            for key, value in entry["samples"]:
+                key = tuple(key)
+                if key not in samples:
+                    samples[key] = list(value) if isinstance(value, list) else value
+                elif isinstance(value, list):
+                    samples[key] = [a + b for a, b in zip(samples[key], value)]
+                elif entry.get("aggregate") == "max":
+                    samples[key] = max(samples[key], value)
+                else:
+                    samples[key] += value
+
+    workers = sum(1 for snapshot in snapshots if snapshot.get("alive", True))
+    families["workers"] = {"type": "gauge", "help": "Worker processes reporting metrics", "labels": [],
+                           "samples": {(): workers}}
+    _add_hit_ratios(families)
+    return families
+
+def _add_hit_ratios(families: Dict[str, Dict[str, Any]]) -> None:
+    hits = families.get("cache_hits_total", {}).get("samples", {})
+    misses = families.get("cache_misses_total", {}).get("samples", {})
+    if not hits and not misses:
+        return
+    ratios = {}
+    for key in set(hits) | set(misses):
+        lookups = hits.get(key, 0) + misses.get(key, 0)
+        ratios[key] = hits.get(key, 0) / lookups if lookups else 0.0
+    families["cache_hit_ratio"] = {"type": "gauge", "help": "Cache hits over lookups since start, across workers",
+                                   "labels": families.get("cache_hits_total", families.get("cache_misses_total"))["labels"],
+                                   "samples": ratios}
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+def _labels(names: List[str], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+def _le(bound: float) -> str:
+    return 'le="%s"' % _number(float(bound))
+
+def render(families: Dict[str, Dict[str, Any]]) -> str:
+    """Prometheus text format (version 0.0.4)"""
+    lines = []
+    for name in sorted(families):
+        family = families[name]
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['type']}")
+        names = family["labels"]
+        for key in sorted(family["samples"]):
+            value = family["samples"][key]
+            if family["type"] != "histogram":
+                lines.append(f"{name}{_labels(names, key)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(family["buckets"], value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(names, key, _le(bound))} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(names, key, _le(float('inf')))} {value[-1]}")
+            lines.append(f"{name}_sum{_labels(names, key)} {_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(names, key)} {value[-1]}")
+    return "\n".join(lines) + "\n"
+
+def max_rss_bytes() -> int:
+    """Peak resident set size of this process (ru_maxrss is in KiB on Linux, bytes on macOS)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024
+
+registry = MetricsRegistry()
+
+HTTP_REQUESTS = registry.counter("http_requests_total", "HTTP requests by route, method and status",
+                                 ["route", "method", "status"])
+HTTP_LATENCY = registry.histogram("http_request_duration_seconds", "HTTP request latency until the response starts",
+                                  ["route", "method"])
+HTTP_IN_PROGRESS = registry.gauge("http_requests_in_progress", "Requests being handled")
+SIMULATION_SECONDS = registry.histogram("simulation_seconds", "Simulation and transpile time by backend and qubit count",
+                                        ["backend", "qubits"])
+QUEUE_DEPTH = registry.gauge("queue_depth", "Items waiting in background queues", ["queue"])
+COALESCED_REQUESTS = registry.counter("coalesced_requests_total",
+                                      "Requests answered by an identical computation already in flight", ["flight"])
+JOBS = registry.counter("jobs_total", "Finished background jobs by kind and final status", ["kind", "status"])
+ABORTED = registry.counter("aborted_total", "Work stopped early by scope (request, job, flight) and reason",
+                           ["scope", "reason"])
+CACHE_HITS = registry.counter("cache_hits_total", "Cache hits", ["cache"])
+CACHE_MISSES = registry.counter("cache_misses_total", "Cache misses", ["cache"])
+MEMORY_HIGH_WATER = registry.gauge("process_max_rss_bytes", "Peak resident set size per worker", aggregate="pid")
+MEMORY_HIGH_WATER.set_function(max_rss_bytes)
+
+def track_cache(name: str, cache) -> None:
+    """Report an LRUCache's hits and misses under cache=name"""
+    CACHE_HITS.set_function(lambda: cache.hits, cache=name)
+    CACHE_MISSES.set_function(lambda: cache.misses, cache=name)
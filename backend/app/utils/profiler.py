@@ -0,0 +1,126 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set
+
+from app.utils.cache import LRUCache
+
+# Opt-in sampling profiler for single requests.
+#
+# A request sent with the X-Profile header (when PROFILING_ENABLED=1) gets a
+# SamplingProfiler: a background thread that every PROFILE_INTERVAL seconds
+# reads the current stack of each thread working on that request (see
+# RequestTimings.thread_hooks in app.utils.timing) via sys._current_frames().
+# Nothing is installed in the profiled threads, so requests that are not
+# profiled pay nothing.
+#
+# Stacks are kept in folded form ("outer;inner;leaf count", the input format
+# of flamegraph tools). Recent profiles are held in memory under a generated
+# id, returned in the X-Profile-Id header, and with PROFILE_DIR set are also
+# written there as <id>.folded.
+#
+# Async endpoints run on the event loop thread, so samples of a profiled
+# async request can include other requests served concurrently.
+
+PROFILE_HEADER = "X-Profile"
+PROFILE_ID_HEADER = "X-Profile-Id"
+
+def frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+def folded_stack(frame) -> str:
+    """Root-first ';'-joined labels of a frame and its callers"""
+    labels = []
+    while frame is not None:
+        labels.append(frame_label(frame))
+        frame = frame.f_back
+    return ";".join(reversed(labels))
+
+class SamplingProfiler:
+    """Samples the stacks of a set of threads from a background thread"""
+
+    def __init__(self, interval: float = 0.001):
+        self.interval = interval
+        self.thread_ids: Set[int] = set()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.elapsed = 0.0
+        self._started = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add_thread(self, thread_id: int) -> None:
+        self.thread_ids.add(thread_id)
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.sample()
+
+    def sample(self) -> None:
+        frames = sys._current_frames()
+        for thread_id in list(self.thread_ids):
+            frame = frames.get(thread_id)
+            if frame is not None:
+                self.stacks[folded_stack(frame)] += 1
+                self.samples += 1
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.elapsed = time.perf_counter() - self._started
+        return self
+
+    def folded(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, limit: int = 20) -> List[Dict]:
+        """Functions by samples in which they were the innermost frame"""
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            leaves[stack.rsplit(";", 1)[-1]] += count
+        return [{"function": name, "samples": count} for name, count in leaves.most_common(limit)]
+
+    def to_dict(self) -> Dict:
+        return {
+            "samples": self.samples,
+            "interval": self.interval,
+            "elapsed_seconds": self.elapsed,
+            "top": self.top(),
+            "folded": self.folded()
+        }
+
+class ProfileStore:
+    """Recent request profiles by id, optionally also written to a directory"""
+
+    def __init__(self, max_profiles: int = 32, directory: Optional[str] = None):
+        self.profiles = LRUCache(max_profiles)
+        self.directory = directory
+
+    def save(self, profile_id: str, profiler: SamplingProfiler) -> None:
+        self.profiles.put(profile_id, profiler.to_dict())
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, f"{profile_id}.folded"), "w") as f:
+                f.write(profiler.folded())
+
+    def get(self, profile_id: str) -> Optional[Dict]:
+        return self.profiles.get(profile_id)
+
+    def ids(self) -> Iterable[str]:
+        return self.profiles.keys()
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+
+profile_store = ProfileStore(int(os.getenv("PROFILE_HISTORY", "32")), os.getenv("PROFILE_DIR"))
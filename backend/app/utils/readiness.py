@@ -0,0 +1,90 @@
+import importlib
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from app.utils.log import get_logger
+
+logger = get_logger(__name__)
+
+# Readiness of this worker to take traffic.
+#
+# /health and /api/health only say the process is up. /api/ready answers
+# 503 until the warm-up has run: the heavy modules imported, the default
+# algorithm circuits built and simulated into the caches, and every kernel
+# run once (see ExecutionService.register_warmup), so no real request pays
+# for any of it. The warm-up runs in a background thread started at
+# startup, so the server answers /health while it is still cold and load
+# balancers routing on /api/ready wait for it.
+#
+# A warm-up step that fails is logged and skipped, the worker still becomes
+# ready: the first request for that path is slow, not broken. If the heavy
+# imports or the warm-up as a whole fail, the worker cannot serve and stays
+# at FAILED, logged, so /api/ready keeps answering 503.
+
+STARTING = "starting"
+WARMING_UP = "warming_up"
+READY = "ready"
+FAILED = "failed"
+
+# Imported before the warm-up proper, the slowest part of a cold start
+HEAVY_MODULES = ("numpy", "qiskit", "qiskit_aer")
+
+class Readiness:
+    """Warm-up state of this worker, with the seconds spent in each warm-up step"""
+
+    def __init__(self, modules=HEAVY_MODULES):
+        self.modules = modules
+        self.status = STARTING
+        self.steps: Dict[str, float] = {}
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == READY
+
+    def start(self, warm_up: Callable[[], Dict[str, float]]) -> threading.Thread:
+        """Run warm_up in a background thread, becoming ready when it returns"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, args=(warm_up,), name="warm-up", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def run(self, warm_up: Callable[[], Dict[str, float]]) -> None:
+        """Import the heavy modules, run warm_up and mark the worker ready, or failed if either raises"""
+        self.status = WARMING_UP
+        self.started_at = time.time()
+        try:
+            start = time.perf_counter()
+            for module in self.modules:
+                importlib.import_module(module)
+            self.steps["imports"] = time.perf_counter() - start
+            self.steps.update(warm_up())
+        except Exception:
+            self.finished_at = time.time()
+            self.status = FAILED
+            logger.exception("warm-up failed")
+            return
+        self.finished_at = time.time()
+        self.status = READY
+        logger.info("warm-up finished", extra={
+            "seconds": round(self.finished_at - self.started_at, 3),
+            "steps": {name: round(seconds, 3) for name, seconds in self.steps.items()}
+        })
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until the warm-up thread finishes, returns whether the worker is ready"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.ready
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "warm_up_seconds": None if self.finished_at is None else round(self.finished_at - self.started_at, 3),
+            "steps": {name: round(seconds, 3) for name, seconds in self.steps.items()}
+        }
+
+readiness = Readiness()
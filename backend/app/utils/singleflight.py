@@ -0,0 +1,106 @@
+import asyncio
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from app.utils.cancellation import ABANDONED, CancellationToken, bind_token, current_token, reset_token, wait_cancellable
+from app.utils.metrics import COALESCED_REQUESTS
+from app.utils.timing import current_timings, phase
+
+# Single-flight coalescing of identical concurrent computations.
+#
+# The result caches only help once a result exists: when a whole class
+# presses Run at once, every request misses before the first one finishes.
+# SingleFlight.run(key, compute) starts compute in the threadpool for the
+# first caller of a key and lets every caller that arrives while it is
+# running await the same task, so the work is done once and the result (or
+# exception) fans out to all of them. The key is dropped as soon as the
+# task finishes; later callers start a fresh computation (and usually hit
+# the result caches).
+#
+# Keys must identify the computation completely, normally by the canonical
+# circuit hash (app.utils.canonical) plus every request field the result
+# depends on. Results are shared between callers, so compute must return
+# values that callers do not mutate.
+#
+# The computation runs as its own task, shielded from the callers: a client
+# that disconnects or times out stops only its own wait. It runs with the
+# context of the first caller, so phases and logs of the work are attributed
+# to that request; the others record the time they waited as a "coalesced"
+# phase. The computation gets a cancellation token of its own rather than
+# the first caller's (app.utils.cancellation), which is cancelled when the
+# last caller stops waiting: nobody needs the result any more, so the
+# kernels abort and free the state instead of running to the end.
+
+def _in_request_thread(compute: Callable[[], Any], token: CancellationToken) -> Any:
+    # Lets a profiler attached to the first caller sample the worker thread
+    timings = current_timings()
+    if timings is not None:
+        timings.enter_thread()
+    context_token = bind_token(token)
+    try:
+        return compute()
+    finally:
+        reset_token(context_token)
+
+class _Flight:
+    """One running computation and the number of callers waiting for it"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, task: asyncio.Future, token: CancellationToken):
+        self.loop = loop
+        self.task = task
+        self.token = token
+        self.waiters = 0
+
+class SingleFlight:
+    """Shares one in-flight computation between concurrent callers with the same key"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self._flights: Dict[Hashable, _Flight] = {}
+        self.started = 0
+        self.coalesced = 0
+
+    async def run(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        loop = asyncio.get_running_loop()
+        flight = self._flights.get(key)
+        # A flight from another event loop (e.g. a test client's) cannot be awaited here
+        if flight is not None and flight.loop is loop:
+            self.coalesced += 1
+            COALESCED_REQUESTS.inc(flight=self.name)
+            with phase("coalesced"):
+                return await self._wait(key, flight)
+
+        token = CancellationToken(scope="flight")
+        task = loop.create_task(run_in_threadpool(_in_request_thread, compute, token))
+        flight = self._flights[key] = _Flight(loop, task, token)
+        self.started += 1
+        task.add_done_callback(lambda _: self._finish(key, task))
+        return await self._wait(key, flight)
+
+    async def _wait(self, key: Hashable, flight: _Flight) -> Any:
+        flight.waiters += 1
+        try:
+            return await wait_cancellable(flight.task, current_token())
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                flight.token.cancel(ABANDONED)
+                self._drop(key, flight.task)
+
+    def _drop(self, key: Hashable, task: asyncio.Future) -> None:
+        flight: Optional[_Flight] = self._flights.get(key)
+        if flight is not None and flight.task is task:
+            del self._flights[key]
+
+    def _finish(self, key: Hashable, task: asyncio.Future) -> None:
+        self._drop(key, task)
+        # Mark the exception retrieved when every caller has gone away
+        if not task.cancelled():
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._flights)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"in_flight": len(self._flights), "started": self.started, "coalesced": self.coalesced}
@@ -0,0 +1,146 @@
+import numpy as np
+from typing import Callable, Iterable, NamedTuple, Optional, Sequence, Tuple
+from app.utils.cancellation import current_token
+
+# Native NumPy statevector kernels.
+#
+# States are complex128 arrays whose last axis has length 2^n, using the
+# same little-endian convention as Qiskit: qubit i is bit i of the index.
+# Any leading axes are treated as a batch, so the same circuit can be
+# applied to many states in one pass.
+
+H_MATRIX = np.array([[1, 1], [1, -1]], dtype=complex) / np.sqrt(2)
+X_MATRIX = np.array([[0, 1], [1, 0]], dtype=complex)
+Y_MATRIX = np.array([[0, -1j], [1j, 0]], dtype=complex)
+Z_MATRIX = np.array([[1, 0], [0, -1]], dtype=complex)
+S_MATRIX = np.array([[1, 0], [0, 1j]], dtype=complex)
+T_MATRIX = np.array([[1, 0], [0, np.exp(1j * np.pi / 4)]], dtype=complex)
+
+FIXED_GATES = {
+    'H': H_MATRIX,
+    'X': X_MATRIX,
+    'Y': Y_MATRIX,
+    'Z': Z_MATRIX,
+    'S': S_MATRIX,
+    'T': T_MATRIX
+}
+
+def rx_matrix(theta: float) -> np.ndarray:
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -1j * s], [-1j * s, c]], dtype=complex)
+
+def ry_matrix(theta: float) -> np.ndarray:
+    c, s = np.cos(theta / 2), np.sin(theta / 2)
+    return np.array([[c, -s], [s, c]], dtype=complex)
+
+def rz_matrix(theta: float) -> np.ndarray:
+    return np.array([[np.exp(-0.5j * theta), 0], [0, np.exp(0.5j * theta)]], dtype=complex)
+
+ROTATION_GATES = {
+    'RX': rx_matrix,
+    'RY': ry_matrix,
+    'RZ': rz_matrix
+}
+
+class NativeGate(NamedTuple):
+    """A gate for the native kernels
+
+    name is one of FIXED_GATES, ROTATION_GATES or 'CNOT'; qubits is
+    (qubit,) or (control, target).
+    """
+    name: str
+    qubits: Tuple[int, ...]
+    parameter: Optional[float] = None
+
+def gate_matrix(gate: NativeGate) -> np.ndarray:
+    """2x2 matrix of a single-qubit gate (or of the target action of a CNOT)"""
+    if gate.name in FIXED_GATES:
+        return FIXED_GATES[gate.name]
+    if gate.name in ROTATION_GATES:
+        return ROTATION_GATES[gate.name](gate.parameter or 0.0)
+    if gate.name == 'CNOT':
+        return X_MATRIX
+    raise ValueError(f"Unsupported gate '{gate.name}'")
+
+def zero_state(num_qubits: int) -> np.ndarray:
+    """Return |00...0⟩ on num_qubits qubits"""
+    state = np.zeros(2 ** num_qubits, dtype=complex)
+    state[0] = 1.0
+    return state
+
+def apply_single_qubit_gate(state: np.ndarray, matrix: np.ndarray, qubit: int, num_qubits: int) -> np.ndarray:
+    """Apply a 2x2 matrix to one qubit of the state"""
+    batch = state.shape[:-1]
+    view = state.reshape(batch + (2 ** (num_qubits - qubit - 1), 2, 2 ** qubit))
+    return np.einsum('ij,...ajb->...aib', matrix, view).reshape(state.shape)
+
+def apply_controlled_gate(state: np.ndarray, matrix: np.ndarray, control: int, target: int, num_qubits: int) -> np.ndarray:
+    """Apply a 2x2 matrix to target on the control = 1 subspace"""
+    batch = state.shape[:-1]
+    tensor = state.reshape(batch + (2,) * num_qubits).copy()
+    # Axis 0 of the qubit tensor is the most significant qubit
+    control_axis = len(batch) + num_qubits - 1 - control
+    target_axis = len(batch) + num_qubits - 1 - target
+
+    selector = [slice(None)] * tensor.ndim
+    selector[control_axis] = 1
+    selector = tuple(selector)
+    subspace = tensor[selector]
+    sub_target_axis = target_axis if target_axis < control_axis else target_axis - 1
+    updated = np.tensordot(matrix, subspace, axes=([1], [sub_target_axis]))
+    tensor[selector] = np.moveaxis(updated, 0, sub_target_axis)
+    return tensor.reshape(state.shape)
+
+def apply_gate(state: np.ndarray, gate: NativeGate, num_qubits: int) -> np.ndarray:
+    """Apply one NativeGate to the state"""
+    matrix = gate_matrix(gate)
+    if len(gate.qubits) == 1:
+        return apply_single_qubit_gate(state, matrix, gate.qubits[0], num_qubits)
+    control, target = gate.qubits
+    return apply_controlled_gate(state, matrix, control, target, num_qubits)
+
+def simulate(gates: Sequence[NativeGate], num_qubits: int, initial_state: Optional[np.ndarray] = None,
+             progress: Optional[Callable[[int, int], None]] = None) -> np.ndarray:
+    """Evolve initial_state (|0...0⟩ by default) through the gates in order
+
+    progress(done, total) is called after every gate and may raise to stop the run.
+    The context's cancellation token is checked before every gate.
+    """
+    token = current_token()
+    state = zero_state(num_qubits) if initial_state is None else np.asarray(initial_state, dtype=complex)
+    for done, gate in enumerate(gates, 1):
+        if token is not None and token.is_cancelled():
+            # Free the partial state now rather than with the traceback
+            state = initial_state = None
+            token.check()
+        state = apply_gate(state, gate, num_qubits)
+        if progress is not None:
+            progress(done, len(gates))
+    return state
+
+def apply_hadamard(state: np.ndarray, qubits: Iterable[int], num_qubits: int) -> np.ndarray:
+    """Apply H to each of the given qubits"""
+    for qubit in qubits:
+        state = apply_single_qubit_gate(state, H_MATRIX, qubit, num_qubits)
+    return state
+
+# Shots drawn per multinomial call, the cancellation token is checked between chunks
+SAMPLING_CHUNK = 1_000_000
+
+def sample_frequencies(rng: np.random.Generator, shots: int, probabilities: np.ndarray) -> np.ndarray:
+    """Shot count of every basis state, drawn in chunks of at most SAMPLING_CHUNK shots"""
+    token = current_token()
+    first = min(shots, SAMPLING_CHUNK)
+    frequencies = rng.multinomial(first, probabilities)
+    remaining = shots - first
+    while remaining > 0:
+        if token is not None:
+            token.check()
+        chunk = min(remaining, SAMPLING_CHUNK)
+        frequencies += rng.multinomial(chunk, probabilities)
+        remaining -= chunk
+    return frequencies
+
+def probabilities(state: np.ndarray) -> np.ndarray:
+    """Born-rule probabilities of every basis state"""
+    return np.abs(state) ** 2
@@ -0,0 +1,199 @@
+import os
+import queue
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.utils.log import get_logger
+from app.utils.metrics import QUEUE_DEPTH
+
+# Persistent history of exercise submissions.
+#
+# Submissions are appended to an in-memory queue and written to SQLite by a
+# single background thread in batched transactions, so recording one costs
+# the request a queue put regardless of write volume. The database runs in
+# WAL mode, letting reads proceed while the writer commits. Reads see a
+# submission once its batch has been flushed (at most flush_interval later).
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS submissions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    exercise_id TEXT NOT NULL,
+    passed INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    circuit_hash TEXT,
+    submitted_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_submissions_user ON submissions (user_id, exercise_id, score);
+CREATE INDEX IF NOT EXISTS idx_submissions_exercise ON submissions (exercise_id, user_id, passed, score);
+"""
+
+INSERT = """
+INSERT INTO submissions (user_id, exercise_id, passed, score, circuit_hash, submitted_at)
+VALUES (?, ?, ?, ?, ?, ?)
+"""
+
+# Best result per (user, exercise), the basis of progress and leaderboards
+BEST_PER_EXERCISE = """
+SELECT user_id, exercise_id, MAX(passed) AS solved, MAX(score) AS best_score,
+       COUNT(*) AS attempts, MAX(submitted_at) AS last_submitted_at
+FROM submissions {where}
+GROUP BY user_id, exercise_id
+"""
+
+logger = get_logger(__name__)
+
+class SubmissionStore:
+    """SQLite submission store with an asynchronous batched writer"""
+
+    def __init__(self, path: str, batch_size: int = 200, flush_interval: float = 0.5,
+                 max_queue: int = 100_000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue: "queue.Queue[Optional[Tuple]]" = queue.Queue(maxsize=max_queue)
+        self._writer: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.write_errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, timeout=10)
+        connection.row_factory = sqlite3.Row
+        return connection
+
+    def _ensure_started(self) -> None:
+        """Create the schema and start the writer thread on first use"""
+        if self._writer is not None:
+            return
+        with self._start_lock:
+            if self._writer is not None:
+                return
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with closing(self._connect()) as connection:
+                connection.execute("PRAGMA journal_mode=WAL")
+                connection.executescript(SCHEMA)
+                connection.commit()
+            writer = threading.Thread(target=self._write_loop, name="submission-writer", daemon=True)
+            writer.start()
+            self._writer = writer
+
+    def _write_loop(self) -> None:
+        connection = self._connect()
+        connection.execute("PRAGMA synchronous=NORMAL")
+        running = True
+        while running:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            batch = [first]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            rows = [item for item in batch if item is not None]
+            running = len(rows) == len(batch)
+            if rows:
+                try:
+                    with connection:
+                        connection.executemany(INSERT, rows)
+                    self.written += len(rows)
+                    self.batches += 1
+                except sqlite3.Error as e:
+                    self.write_errors += len(rows)
+                    logger.error("failed to write %d submissions: %s", len(rows), e)
+            for _ in batch:
+                self._queue.task_done()
+        connection.close()
+
+    def record(self, user_id: str, exercise_id: str, passed: bool, score: int,
+               circuit_hash: Optional[str] = None) -> bool:
+        """Queue a submission for writing, returns False if the queue is full"""
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((user_id, exercise_id, int(passed), int(score), circuit_hash, time.time()))
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self) -> None:
+        """Block until every queued submission has been written"""
+        if self._writer is not None:
+            self._queue.join()
+
+    def close(self) -> None:
+        """Flush pending writes and stop the writer thread"""
+        if self._writer is None:
+            return
+        self._queue.put(None)
+        self._writer.join()
+        self._writer = None
+
+    def _query(self, sql: str, params: Tuple = ()) -> List[Dict[str, Any]]:
+        self._ensure_started()
+        with closing(self._connect()) as connection:
+            return [dict(row) for row in connection.execute(sql, params)]
+
+    def user_progress(self, user_id: str) -> List[Dict[str, Any]]:
+        """Best score, attempts and solved flag for each exercise a user attempted"""
+        sql = BEST_PER_EXERCISE.format(where="WHERE user_id = ?") + " ORDER BY exercise_id"
+        rows = self._query(sql, (user_id,))
+        for row in rows:
+            row["solved"] = bool(row["solved"])
+        return rows
+
+    def exercise_stats(self, exercise_id: str) -> Dict[str, Any]:
+        """Attempt counts and pass rates for one exercise"""
+        sql = f"""
+        SELECT COUNT(*) AS users, COALESCE(SUM(solved), 0) AS solved_users,
+               COALESCE(SUM(attempts), 0) AS attempts, AVG(best_score) AS average_best_score
+        FROM ({BEST_PER_EXERCISE.format(where="WHERE exercise_id = ?")})
+        """
+        stats = self._query(sql, (exercise_id,))[0]
+        passed_attempts = self._query(
+            "SELECT COUNT(*) AS passed FROM submissions WHERE exercise_id = ? AND passed = 1", (exercise_id,)
+        )[0]["passed"]
+        stats["exercise_id"] = exercise_id
+        stats["pass_rate"] = stats["solved_users"] / stats["users"] if stats["users"] else 0.0
+        stats["attempt_pass_rate"] = passed_attempts / stats["attempts"] if stats["attempts"] else 0.0
+        return stats
+
+    def leaderboard(self, limit: int = 10, exercise_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Users ranked by exercises solved, then by the sum of their best scores"""
+        where, params = ("WHERE exercise_id = ?", (exercise_id,)) if exercise_id else ("", ())
+        sql = f"""
+        SELECT user_id, SUM(solved) AS solved, SUM(best_score) AS total_score,
+               SUM(attempts) AS attempts, MAX(last_submitted_at) AS last_submitted_at
+        FROM ({BEST_PER_EXERCISE.format(where=where)})
+        GROUP BY user_id
+        ORDER BY solved DESC, total_score DESC, attempts ASC, user_id ASC
+        LIMIT ?
+        """
+        return self._query(sql, params + (limit,))
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "path": self.path,
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "write_errors": self.write_errors
+        }
+
+submission_store = SubmissionStore(
+    os.getenv("SUBMISSION_DB_PATH", "data/submissions.db"),
+    batch_size=int(os.getenv("SUBMISSION_BATCH_SIZE", "200")),
+    flush_interval=float(os.getenv("SUBMISSION_FLUSH_INTERVAL", "0.5"))
+)
+QUEUE_DEPTH.set_function(lambda: submission_store._queue.qsize(), queue="submissions")
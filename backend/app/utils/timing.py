@@ -0,0 +1,141 @@
+import asyncio
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+from fastapi.routing import APIRoute
+
+# Per-request phase timings, reported in the Server-Timing header.
+#
+# The request middleware in app.main binds a RequestTimings to the request's
+# context. Code on the request path then wraps its stages in phase(name) (or
+# reports an already measured duration with add_phase), which costs a
+# context-variable lookup when no request is being timed.
+#
+# Routers built with route_class=TimedRoute also record the two stages that
+# happen outside the endpoint function: "validation" (from the route handler
+# starting to the endpoint being called, i.e. pydantic parsing of the body
+# and parameters) and "serialization" (from the endpoint returning to the
+# response being ready). TimedRoute also tells an active profiler which
+# threads run the request (see app.utils.profiler).
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+class RequestTimings:
+    """Accumulated seconds per phase for one request"""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.handler_start = self.start
+        self.endpoint_end: Optional[float] = None
+        # Callbacks run on every thread that executes part of the request
+        self.thread_hooks: List[Callable[[int], None]] = []
+
+    def add(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def enter_thread(self) -> None:
+        for hook in self.thread_hooks:
+            hook(threading.get_ident())
+
+    def server_timing(self) -> str:
+        """Server-Timing header value, phases in milliseconds plus the total so far"""
+        entries = [f"{name};dur={seconds * 1000:.3f}" for name, seconds in self.phases.items()]
+        entries.append(f"total;dur={(time.perf_counter() - self.start) * 1000:.3f}")
+        return ", ".join(entries)
+
+_timings: contextvars.ContextVar[Optional[RequestTimings]] = contextvars.ContextVar("request_timings", default=None)
+
+def current_timings() -> Optional[RequestTimings]:
+    return _timings.get()
+
+def bind_timings(timings: RequestTimings) -> contextvars.Token:
+    return _timings.set(timings)
+
+def reset_timings(token: contextvars.Token) -> None:
+    _timings.reset(token)
+
+def add_phase(name: str, seconds: float) -> None:
+    """Add an already measured duration to the current request's phase"""
+    timings = _timings.get()
+    if timings is not None:
+        timings.add(name, seconds)
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block as part of the current request's phase"""
+    timings = _timings.get()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings.add(name, time.perf_counter() - start)
+
+def timed_endpoint(endpoint: Callable) -> Callable:
+    """Wrap an endpoint to record "validation" and "endpoint" phases, keeping its signature"""
+    # include_router re-creates routes from already wrapped endpoints
+    if getattr(endpoint, "__timed__", False):
+        return endpoint
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            timings = _timings.get()
+            if timings is None:
+                return await endpoint(*args, **kwargs)
+            timings.enter_thread()
+            start = time.perf_counter()
+            timings.add("validation", start - timings.handler_start)
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                timings.endpoint_end = time.perf_counter()
+                timings.add("endpoint", timings.endpoint_end - start)
+        wrapper.__timed__ = True
+        return wrapper
+
+    @functools.wraps(endpoint)
+    def sync_wrapper(*args, **kwargs):
+        # Sync endpoints run in the threadpool with a copy of the request context
+        timings = _timings.get()
+        if timings is None:
+            return endpoint(*args, **kwargs)
+        timings.enter_thread()
+        start = time.perf_counter()
+        timings.add("validation", start - timings.handler_start)
+        try:
+            return endpoint(*args, **kwargs)
+        finally:
+            timings.endpoint_end = time.perf_counter()
+            timings.add("endpoint", timings.endpoint_end - start)
+    sync_wrapper.__timed__ = True
+    return sync_wrapper
+
+class TimedRoute(APIRoute):
+    """APIRoute that records validation, endpoint and serialization phases"""
+
+    def __init__(self, path: str, endpoint: Callable, **kwargs):
+        super().__init__(path, timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self) -> Callable:
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            timings = _timings.get()
+            if timings is None:
+                return await handler(request)
+            timings.enter_thread()
+            timings.handler_start = time.perf_counter()
+            timings.endpoint_end = None
+            response = await handler(request)
+            if timings.endpoint_end is not None:
+                timings.add("serialization", time.perf_counter() - timings.endpoint_end)
+            return response
+
+        return timed_handler
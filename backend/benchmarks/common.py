@@ -0,0 +1,122 @@
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+# Make `app` importable when a benchmark is run from the backend directory
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+def git_commit() -> str:
+    """Short hash of the checked out commit, 'unknown' outside a git checkout"""
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except Exception:
+        return "unknown"
+
+def run_metadata() -> Dict[str, Any]:
+    """Environment details stored next to every benchmark result"""
+    return {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count()
+    }
+
+def write_json(path: str, data: Dict[str, Any]) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+
+def read_json(path: str) -> Dict[str, Any]:
+    with open(path, "r") as f:
+        return json.load(f)
+
+def compare_to_baseline(current: Iterable[Dict[str, Any]], baseline: Iterable[Dict[str, Any]],
+                        key: Callable[[Dict[str, Any]], Tuple], metrics: List[str],
+                        threshold: float) -> List[str]:
+    """Return a description of every metric that regressed by more than threshold
+
+    Rows are matched on key(row). A metric regresses when it grows beyond
+    baseline * (1 + threshold); rows missing from either side are skipped.
+    """
+    baseline_rows = {key(row): row for row in baseline}
+    regressions = []
+    for row in current:
+        reference = baseline_rows.get(key(row))
+        if reference is None:
+            continue
+        for metric in metrics:
+            old, new = reference.get(metric), row.get(metric)
+            if old is None or new is None or old <= 0:
+                continue
+            if new > old * (1 + threshold):
+                regressions.append(
+                    f"{'/'.join(str(part) for part in key(row))} {metric}: "
+                    f"{old:.6g} -> {new:.6g} (+{(new / old - 1) * 100:.1f}%)"
+                )
+    return regressions
+
+def measure(function: Callable[[], Any], min_time: float = 0.2, repeats: int = 5, max_calls: int = 10_000) -> Dict[str, Any]:
+    """Median and best seconds per call of function
+
+    Calls are batched so every timed sample lasts at least min_time / repeats
+    (a single call when one is already slower than that), which keeps
+    microsecond kernels above timer resolution.
+    """
+    function()
+    start = time.perf_counter()
+    function()
+    single = time.perf_counter() - start
+    batch = max(1, min(max_calls, int(min_time / repeats / single) if single > 0 else max_calls))
+
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(batch):
+            function()
+        samples.append((time.perf_counter() - start) / batch)
+    return {"seconds": statistics.median(samples), "min_seconds": min(samples), "calls": batch * repeats}
+
+def available_memory_bytes() -> Optional[int]:
+    """MemAvailable from /proc/meminfo, None where it cannot be read"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return None
+
+def save_report(name: str, results: List[Dict[str, Any]], output: Optional[str] = None,
+                **extra: Any) -> Tuple[str, Dict[str, Any]]:
+    """Write results under RESULTS_DIR/<name>-<commit>.json (or output), returns (path, report)"""
+    metadata = run_metadata()
+    report = {"meta": metadata, **extra, "results": results}
+    path = output or os.path.join(RESULTS_DIR, f"{name}-{metadata['commit']}.json")
+    write_json(path, report)
+    print(f"Results written to {path}", file=sys.stderr)
+    return path, report
+
+def check_baseline(results: List[Dict[str, Any]], baseline_path: Optional[str],
+                   key: Callable[[Dict[str, Any]], Tuple], metrics: List[str], threshold: float) -> List[str]:
+    """Compare against a stored report when baseline_path is given, printing each regression"""
+    if not baseline_path:
+        return []
+    regressions = compare_to_baseline(results, read_json(baseline_path)["results"], key, metrics, threshold)
+    for regression in regressions:
+        print(f"REGRESSION: {regression}", file=sys.stderr)
+    return regressions
@@ -0,0 +1,114 @@
+"""Micro-benchmarks of the native simulation kernels
+
+Times single-qubit and controlled gate application, a full GHZ circuit,
+Born-rule probabilities, shot sampling and batched scoring for every qubit
+count in --qubits. Points whose working set would not fit in half of the
+available memory are skipped. Results are written as JSON keyed by commit
+and can be checked against a stored baseline.
+
+    python -m benchmarks.kernels
+    python -m benchmarks.kernels --qubits 1 2 4 8 16 20 24 26
+    python -m benchmarks.kernels --baseline benchmarks/results/kernels-abc1234.json
+"""
+import argparse
+import sys
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from benchmarks.common import available_memory_bytes, check_baseline, measure, save_report
+from app.exercise_checker.quantum_simulator import SimulationResult
+from app.exercise_checker.scoring import score_batch
+from app.utils.statevector import (
+    H_MATRIX,
+    X_MATRIX,
+    NativeGate,
+    apply_controlled_gate,
+    apply_single_qubit_gate,
+    probabilities,
+    simulate,
+)
+
+DEFAULT_QUBITS = [1, 2, 4, 6, 8, 10, 12, 14, 16, 18, 20, 22, 24, 26]
+
+# Candidates scored per call in the scoring benchmark, fewer at large n so
+# the batch stays within 2^26 amplitudes
+SCORING_BATCH = 32
+
+def scoring_batch(num_qubits: int) -> int:
+    return min(SCORING_BATCH, max(1, 2 ** (26 - num_qubits)))
+
+def random_state(num_qubits: int, rng: np.random.Generator) -> np.ndarray:
+    state = rng.standard_normal(2 ** num_qubits) + 1j * rng.standard_normal(2 ** num_qubits)
+    return state / np.linalg.norm(state)
+
+def ghz_gates(num_qubits: int) -> List[NativeGate]:
+    return [NativeGate('H', (0,))] + [NativeGate('CNOT', (q, q + 1)) for q in range(num_qubits - 1)]
+
+def kernels(num_qubits: int, rng: np.random.Generator) -> List[Tuple[str, Callable[[], Any]]]:
+    """(name, call) for every kernel at num_qubits"""
+    state = random_state(num_qubits, rng)
+    middle = num_qubits // 2
+    last = num_qubits - 1
+
+    result = SimulationResult([], num_qubits, seed=1)
+    result.__dict__["probabilities"] = probabilities(state)
+
+    batch = scoring_batch(num_qubits)
+    candidates = np.stack([random_state(num_qubits, rng) for _ in range(batch)])
+
+    entries = [
+        ("single_qubit_gate", lambda: apply_single_qubit_gate(state, H_MATRIX, middle, num_qubits)),
+        ("ghz_circuit", lambda: simulate(ghz_gates(num_qubits), num_qubits)),
+        ("probabilities", lambda: probabilities(state)),
+        ("sampling_1024_shots", lambda: result.counts(1024)),
+        ("score_statevectors", lambda: score_batch("statevector", state, candidates, 1e-3))
+    ]
+    if num_qubits > 1:
+        entries.insert(1, ("controlled_gate", lambda: apply_controlled_gate(state, X_MATRIX, 0, last, num_qubits)))
+    return entries
+
+def run_suite(qubit_counts: List[int], min_time: float, repeats: int, seed: int,
+              memory_fraction: float = 0.5) -> List[Dict[str, Any]]:
+    available = available_memory_bytes()
+    budget = available * memory_fraction if available else None
+    rng = np.random.default_rng(seed)
+    results = []
+    for n in qubit_counts:
+        # Inputs (state, probabilities, candidates) plus a few kernel temporaries
+        needed = 16 * 2 ** n * (scoring_batch(n) + 6)
+        if budget is not None and needed > budget:
+            print(f"skipping n={n}: needs {needed / 2**30:.1f} GiB, budget {budget / 2**30:.1f} GiB", file=sys.stderr)
+            continue
+        for name, call in kernels(n, rng):
+            timing = measure(call, min_time=min_time, repeats=repeats)
+            results.append({
+                "kernel": name,
+                "qubits": n,
+                "batch": scoring_batch(n) if name == "score_statevectors" else 1,
+                **timing,
+                "ns_per_amplitude": timing["seconds"] / 2 ** n * 1e9
+            })
+            print(f"{name:<24} n={n:<3} {timing['seconds'] * 1e3:10.4f} ms", file=sys.stderr)
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--qubits", nargs="+", type=int, default=DEFAULT_QUBITS)
+    parser.add_argument("--min-time", type=float, default=0.2, help="seconds spent timing each point")
+    parser.add_argument("--repeats", type=int, default=5, help="timed samples per point, the median is reported")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--output", help="JSON results path (default: results/kernels-<commit>.json)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="allowed relative growth before a timing counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.qubits, args.min_time, args.repeats, args.seed)
+    save_report("kernels", results, args.output, threshold=args.threshold)
+    regressions = check_baseline(results, args.baseline, key=lambda r: (r["kernel"], r["qubits"]),
+                                 metrics=["seconds"], threshold=args.threshold)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,354 @@
+"""Load generator replaying classroom traffic against a running server
+
+Requests follow the calls the frontend makes (frontend/src/services/api.js):
+students browse and open exercises, simulate and submit their circuits
+(mostly right, some wrong), run Grover and the other algorithm demos and
+build circuits in the simulator. --mix changes the weight of any scenario.
+
+Load is driven either open-loop at --rps (arrivals on a fixed schedule, each
+latency measured from its scheduled start so a slow server is not hidden by
+the generator waiting on it) or closed-loop with --concurrency users each
+sending the next request as soon as the previous one returns.
+
+Without --url a local uvicorn is started on a free port (--workers processes,
+submissions in a temporary database) and stopped afterwards.
+
+    python -m benchmarks.loadgen --rps 50 --duration 30
+    python -m benchmarks.loadgen --concurrency 30 --workers 4
+    python -m benchmarks.loadgen --url http://localhost:8000 --rps 20 --mix exercise_submit=50 grover_simulate=0
+    python -m benchmarks.loadgen --rps 50 --baseline benchmarks/results/loadgen-abc1234.json
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, NamedTuple, Optional
+
+import httpx
+import numpy as np
+
+from benchmarks.common import BACKEND_DIR, check_baseline, save_report
+
+class Call(NamedTuple):
+    method: str
+    path: str
+    json: Optional[Dict[str, Any]] = None
+
+# Exercises with the solutions students converge on; wrong answers drop a gate
+EXERCISE_SOLUTIONS = {
+    "ex001": [{"gate": "H", "qubit": 0, "timeStep": 0}],
+    "ex002": [{"gate": "H", "qubit": 0, "timeStep": 0},
+              {"gate": "CNOT", "qubit": 0, "target_qubit": 1, "timeStep": 1}],
+    "ex004": [{"gate": "H", "qubit": 0, "timeStep": 0},
+              {"gate": "CNOT", "qubit": 0, "target_qubit": 1, "timeStep": 1},
+              {"gate": "CNOT", "qubit": 1, "target_qubit": 2, "timeStep": 2}],
+    "ex012": [{"gate": "H", "qubit": 0, "timeStep": 0}, {"gate": "H", "qubit": 0, "timeStep": 1}],
+    "ex013": [{"gate": "H", "qubit": q, "timeStep": 0} for q in range(3)],
+}
+
+def student_circuit(rng: random.Random, exercise_id: str) -> List[Dict[str, Any]]:
+    solution = EXERCISE_SOLUTIONS[exercise_id]
+    if len(solution) > 1 and rng.random() < 0.3:
+        return solution[:-1]
+    return solution
+
+def exercise_simulate(rng: random.Random, user: str) -> Call:
+    exercise_id = rng.choice(list(EXERCISE_SOLUTIONS))
+    return Call("POST", f"/api/exercises/{exercise_id}/simulate", {"circuit": student_circuit(rng, exercise_id)})
+
+def exercise_submit(rng: random.Random, user: str) -> Call:
+    exercise_id = rng.choice(list(EXERCISE_SOLUTIONS))
+    return Call("POST", f"/api/exercises/{exercise_id}/submit",
+                {"circuit": student_circuit(rng, exercise_id), "user_id": user})
+
+def exercise_list(rng: random.Random, user: str) -> Call:
+    return Call("GET", "/api/exercises")
+
+def exercise_get(rng: random.Random, user: str) -> Call:
+    return Call("GET", f"/api/exercises/{rng.choice(list(EXERCISE_SOLUTIONS))}")
+
+def grover_simulate(rng: random.Random, user: str) -> Call:
+    num_qubits = rng.choice([2, 3, 4])
+    return Call("POST", "/api/algorithms/grover/simulate", {
+        "target_item": rng.randrange(2 ** num_qubits),
+        "iterations": rng.choice([1, 2, 3]),
+        "num_qubits": num_qubits
+    })
+
+def algorithm_run(rng: random.Random, user: str) -> Call:
+    choice = rng.choice(["deutsch-jozsa", "bernstein-vazirani", "simon"])
+    if choice == "deutsch-jozsa":
+        return Call("POST", "/api/algorithms/deutsch-jozsa/run",
+                    {"function_type": rng.choice(["constant-0", "constant-1", "balanced"]), "num_qubits": 3})
+    if choice == "bernstein-vazirani":
+        hidden = "".join(rng.choice("01") for _ in range(rng.choice([3, 4, 5])))
+        return Call("POST", "/api/algorithms/bernstein-vazirani/run",
+                    {"hidden_string": hidden, "num_qubits": len(hidden)})
+    return Call("POST", "/api/algorithms/simon/run", {"hidden_period": rng.choice(["11", "10", "01"]), "num_qubits": 4})
+
+def simulator_run(rng: random.Random, user: str) -> Call:
+    qubits = rng.choice([2, 3, 4, 5])
+    if rng.random() < 0.3:
+        return Call("POST", "/api/algorithms/simulator/run",
+                    {"qubits": qubits, "gates": [], "algorithm": rng.choice(["grover", "deutsch-jozsa"]), "shots": 1024})
+    gates = []
+    for step in range(rng.randint(1, 8)):
+        if qubits > 1 and rng.random() < 0.3:
+            control, target = rng.sample(range(qubits), 2)
+            gates.append({"name": "CNOT", "qubit": control, "target_qubit": target, "timeStep": step})
+        else:
+            gates.append({"name": rng.choice("HXYZST"), "qubit": rng.randrange(qubits), "timeStep": step})
+    return Call("POST", "/api/algorithms/simulator/run", {"qubits": qubits, "gates": gates, "shots": 1024})
+
+SCENARIOS: Dict[str, Callable[[random.Random, str], Call]] = {
+    "exercise_simulate": exercise_simulate,
+    "exercise_submit": exercise_submit,
+    "simulator_run": simulator_run,
+    "grover_simulate": grover_simulate,
+    "algorithm_run": algorithm_run,
+    "exercise_list": exercise_list,
+    "exercise_get": exercise_get,
+}
+
+# Relative request weights during a class session
+DEFAULT_MIX = {
+    "exercise_simulate": 25,
+    "exercise_submit": 20,
+    "simulator_run": 20,
+    "grover_simulate": 10,
+    "algorithm_run": 10,
+    "exercise_list": 8,
+    "exercise_get": 7,
+}
+
+def parse_mix(overrides: Optional[List[str]]) -> Dict[str, float]:
+    mix = dict(DEFAULT_MIX)
+    for item in overrides or []:
+        name, _, weight = item.partition("=")
+        if name not in SCENARIOS or not weight:
+            raise SystemExit(f"--mix expects name=weight with name one of {', '.join(SCENARIOS)}, got {item!r}")
+        mix[name] = float(weight)
+    return {name: weight for name, weight in mix.items() if weight > 0}
+
+class Recorder:
+    """Latencies and errors per scenario"""
+
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = {}
+        self.errors: Dict[str, int] = {}
+        self.error_samples: List[str] = []
+
+    def record(self, scenario: str, seconds: float, error: Optional[str]) -> None:
+        self.latencies.setdefault(scenario, []).append(seconds)
+        if error is not None:
+            self.errors[scenario] = self.errors.get(scenario, 0) + 1
+            if len(self.error_samples) < 10:
+                self.error_samples.append(f"{scenario}: {error}")
+
+    def summary(self, scenario: str, latencies: List[float], errors: int, duration: float) -> Dict[str, Any]:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99]) if latencies else (0.0, 0.0, 0.0)
+        return {
+            "scenario": scenario,
+            "requests": len(latencies),
+            "errors": errors,
+            "error_rate": errors / len(latencies) if latencies else 0.0,
+            "throughput_rps": len(latencies) / duration if duration > 0 else 0.0,
+            "p50_seconds": float(p50),
+            "p95_seconds": float(p95),
+            "p99_seconds": float(p99),
+            "mean_seconds": float(np.mean(latencies)) if latencies else 0.0
+        }
+
+    def results(self, duration: float) -> List[Dict[str, Any]]:
+        rows = [self.summary(name, latencies, self.errors.get(name, 0), duration)
+                for name, latencies in sorted(self.latencies.items())]
+        everything = [seconds for latencies in self.latencies.values() for seconds in latencies]
+        rows.append(self.summary("all", everything, sum(self.errors.values()), duration))
+        return rows
+
+async def send(client: httpx.AsyncClient, call: Call) -> Optional[str]:
+    """Send one request, returning a description of the error if it failed"""
+    try:
+        response = await client.request(call.method, call.path, json=call.json)
+    except httpx.HTTPError as e:
+        return f"{type(e).__name__} {call.path}"
+    if response.status_code >= 400:
+        return f"HTTP {response.status_code} {call.path}"
+    # The simulator reports failures as {"success": false} with a 200
+    if call.method == "POST":
+        body = response.json()
+        if isinstance(body, dict) and body.get("success") is False:
+            return f"unsuccessful {call.path}: {body.get('error_message')}"
+    return None
+
+class LoadGenerator:
+    def __init__(self, client: httpx.AsyncClient, mix: Dict[str, float], seed: int, users: int = 30):
+        self.client = client
+        self.names = list(mix)
+        self.weights = [mix[name] for name in self.names]
+        self.rng = random.Random(seed)
+        self.users = [f"student-{i:03d}" for i in range(users)]
+        self.recorder = Recorder()
+
+    def next_call(self) -> tuple:
+        name = self.rng.choices(self.names, self.weights)[0]
+        return name, SCENARIOS[name](self.rng, self.rng.choice(self.users))
+
+    async def issue(self, name: str, call: Call, started: float) -> None:
+        error = await send(self.client, call)
+        self.recorder.record(name, time.perf_counter() - started, error)
+
+    async def open_loop(self, rps: float, duration: float, max_in_flight: int) -> int:
+        """Start requests at a fixed rate; returns how many were skipped at max_in_flight"""
+        interval = 1.0 / rps
+        start = time.perf_counter()
+        in_flight = set()
+        skipped = 0
+        index = 0
+        while True:
+            scheduled = start + index * interval
+            if scheduled - start >= duration:
+                break
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            name, call = self.next_call()
+            if len(in_flight) >= max_in_flight:
+                skipped += 1
+                self.recorder.record(name, time.perf_counter() - scheduled, "skipped: too many requests in flight")
+            else:
+                task = asyncio.create_task(self.issue(name, call, scheduled))
+                in_flight.add(task)
+                task.add_done_callback(in_flight.discard)
+            index += 1
+        if in_flight:
+            await asyncio.wait(in_flight)
+        return skipped
+
+    async def closed_loop(self, concurrency: int, duration: float) -> None:
+        deadline = time.perf_counter() + duration
+
+        async def user() -> None:
+            while time.perf_counter() < deadline:
+                name, call = self.next_call()
+                await self.issue(name, call, time.perf_counter())
+
+        await asyncio.gather(*(user() for _ in range(concurrency)))
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+@contextmanager
+def local_server(workers: int, startup_timeout: float = 60.0) -> Iterator[str]:
+    """Run uvicorn on a free port for the duration of the block, yielding its URL"""
+    port = free_port()
+    env = dict(os.environ)
+    env.setdefault("SUBMISSION_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="loadgen-"), "submissions.db"))
+    env.setdefault("LOG_LEVEL", "warning")
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--workers", str(workers), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env
+    )
+    url = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.monotonic() + startup_timeout
+        while True:
+            if process.poll() is not None:
+                raise SystemExit(f"uvicorn exited with status {process.returncode}")
+            try:
+                if httpx.get(f"{url}/api/health", timeout=1.0).status_code == 200:
+                    break
+            except httpx.HTTPError:
+                pass
+            if time.monotonic() > deadline:
+                raise SystemExit(f"uvicorn did not become healthy within {startup_timeout:.0f}s")
+            time.sleep(0.2)
+        yield url
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+async def run_load(url: str, args: argparse.Namespace, mix: Dict[str, float]) -> Dict[str, Any]:
+    limits = httpx.Limits(max_connections=args.max_in_flight, max_keepalive_connections=args.max_in_flight)
+    async with httpx.AsyncClient(base_url=url, timeout=args.timeout, limits=limits) as client:
+        generator = LoadGenerator(client, mix, args.seed)
+        if args.warmup > 0:
+            await generator.closed_loop(min(4, args.concurrency or 4), args.warmup)
+            generator.recorder = Recorder()
+
+        start = time.perf_counter()
+        skipped = 0
+        if args.rps:
+            skipped = await generator.open_loop(args.rps, args.duration, args.max_in_flight)
+        else:
+            await generator.closed_loop(args.concurrency, args.duration)
+        elapsed = time.perf_counter() - start
+    return {
+        "results": generator.recorder.results(elapsed),
+        "elapsed_seconds": elapsed,
+        "skipped": skipped,
+        "error_samples": generator.recorder.error_samples
+    }
+
+def print_table(results: List[Dict[str, Any]]) -> None:
+    print(f"{'scenario':<20} {'requests':>8} {'err %':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+          file=sys.stderr)
+    for row in results:
+        print(f"{row['scenario']:<20} {row['requests']:>8} {row['error_rate'] * 100:>6.1f} "
+              f"{row['throughput_rps']:>8.1f} {row['p50_seconds'] * 1e3:>9.1f} "
+              f"{row['p95_seconds'] * 1e3:>9.1f} {row['p99_seconds'] * 1e3:>9.1f}", file=sys.stderr)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="server to load (default: start a local uvicorn)")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes for the local server")
+    load = parser.add_mutually_exclusive_group()
+    load.add_argument("--rps", type=float, help="open-loop target requests per second")
+    load.add_argument("--concurrency", type=int, help="closed-loop number of simultaneous users (default 10)")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds of measured load")
+    parser.add_argument("--warmup", type=float, default=3.0, help="seconds of unmeasured load first")
+    parser.add_argument("--mix", nargs="+", metavar="NAME=WEIGHT",
+                        help=f"scenario weights, defaults: {' '.join(f'{k}={v}' for k, v in DEFAULT_MIX.items())}")
+    parser.add_argument("--max-in-flight", type=int, default=256,
+                        help="open-loop arrivals beyond this many outstanding requests count as errors")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout, as in the frontend")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--output", help="JSON results path (default: results/loadgen-<commit>.json)")
+    parser.add_argument("--baseline", help="baseline JSON to compare p95 and p99 latency against")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="allowed relative growth before a latency counts as a regression")
+    args = parser.parse_args(argv)
+    if not args.rps and not args.concurrency:
+        args.concurrency = 10
+    mix = parse_mix(args.mix)
+
+    if args.url:
+        run = asyncio.run(run_load(args.url.rstrip("/"), args, mix))
+    else:
+        with local_server(args.workers) as url:
+            run = asyncio.run(run_load(url, args, mix))
+
+    print_table(run["results"])
+    for sample in run["error_samples"]:
+        print(f"error: {sample}", file=sys.stderr)
+    save_report("loadgen", run["results"], args.output, mix=mix, rps=args.rps, concurrency=args.concurrency,
+                workers=None if args.url else args.workers, duration=args.duration,
+                elapsed_seconds=run["elapsed_seconds"], skipped=run["skipped"])
+    regressions = check_baseline(run["results"], args.baseline, key=lambda r: (r["scenario"],),
+                                 metrics=["p95_seconds", "p99_seconds", "error_rate"], threshold=args.threshold)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,249 @@
+"""Empirical quantum vs classical query scaling
+
+Runs every algorithm router (Grover, Deutsch-Jozsa, Bernstein-Vazirani,
+Simon) and a classical baseline across a range of n, recording oracle
+queries, wall time and peak memory. Results are written as JSON (and
+optionally CSV for lesson plots) and can be checked against a stored
+baseline to catch regressions in the routers between releases.
+
+    python -m benchmarks.query_scaling --max-n 8
+    python -m benchmarks.query_scaling --baseline benchmarks/results/baseline.json
+"""
+import argparse
+import asyncio
+import csv
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from benchmarks.common import check_baseline, save_report
+from app.algorithms.grover import GroverRequest, calculate_optimal_iterations, run_grover_algorithm
+from app.algorithms.deutsch_jozsa import DeutschJozsaRequest, run_deutsch_jozsa_algorithm
+from app.algorithms.bernstein_vazirani import BernsteinVaziraniRequest, run_bernstein_vazirani_algorithm
+from app.algorithms.simon import (
+    MAX_SIMON_QUBITS,
+    SimonRequest,
+    bits_to_int,
+    random_two_to_one_table,
+    run_simon_algorithm,
+)
+from app.utils.circuit_utils import estimate_algorithm_runtime
+from app.utils.execution import execution_service
+
+class CountingOracle:
+    """Classical oracle wrapper that counts how often f is evaluated"""
+
+    def __init__(self, f: Callable[[int], int]):
+        self.f = f
+        self.queries = 0
+
+    def __call__(self, x: int) -> int:
+        self.queries += 1
+        return self.f(x)
+
+def classical_search(n: int, target: int, rng: np.random.Generator) -> int:
+    """Scan an unsorted database in random order until the target is found"""
+    oracle = CountingOracle(lambda x: int(x == target))
+    for x in rng.permutation(2 ** n):
+        if oracle(int(x)):
+            break
+    return oracle.queries
+
+def classical_deutsch_jozsa(n: int, f: Callable[[int], int]) -> int:
+    """Deterministic check: stop at the first disagreement or after 2^(n-1)+1 queries"""
+    oracle = CountingOracle(f)
+    first = oracle(0)
+    for x in range(1, 2 ** (n - 1) + 1):
+        if oracle(x) != first:
+            break
+    return oracle.queries
+
+def classical_bernstein_vazirani(n: int, f: Callable[[int], int]) -> tuple:
+    """Recover s bit by bit by querying every unit vector, returns (queries, s)"""
+    oracle = CountingOracle(f)
+    recovered = sum(oracle(1 << i) << i for i in range(n))
+    return oracle.queries, recovered
+
+def classical_simon(n: int, table: np.ndarray, rng: np.random.Generator) -> int:
+    """Query random distinct inputs until two collide (birthday search)"""
+    oracle = CountingOracle(lambda x: int(table[x]))
+    seen = {}
+    for x in rng.permutation(2 ** n):
+        value = oracle(int(x))
+        if value in seen:
+            break
+        seen[value] = x
+    return oracle.queries
+
+def run_route(handler, request):
+    """Call a router handler directly, outside the ASGI app"""
+    return asyncio.run(handler(request))
+
+def time_route(handler, request, repeats: int) -> Dict[str, Any]:
+    """Cold (caches cleared) and warm wall time plus peak traced memory"""
+    cold, warm = [], []
+    response = None
+    for _ in range(repeats):
+        execution_service.compiled_cache.clear()
+        execution_service.result_cache.clear()
+        start = time.perf_counter()
+        response = run_route(handler, request)
+        cold.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        run_route(handler, request)
+        warm.append(time.perf_counter() - start)
+
+    execution_service.compiled_cache.clear()
+    execution_service.result_cache.clear()
+    tracemalloc.start()
+    run_route(handler, request)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "response": response,
+        "wall_time_s": statistics.median(cold),
+        "warm_wall_time_s": statistics.median(warm),
+        "peak_memory_bytes": peak
+    }
+
+def row(algorithm: str, n: int, quantum_queries: int, classical_queries: float, timing: Dict[str, Any],
+        success: bool, estimate: Dict[str, Any], classical_wall_time: float, variant: str = "") -> Dict[str, Any]:
+    return {
+        "algorithm": algorithm,
+        "variant": variant,
+        "n": n,
+        "quantum_queries": quantum_queries,
+        "classical_queries": classical_queries,
+        "estimated_quantum_queries": estimate.get("quantum"),
+        "estimated_classical_queries": estimate.get("classical"),
+        "wall_time_s": timing["wall_time_s"],
+        "warm_wall_time_s": timing["warm_wall_time_s"],
+        "classical_wall_time_s": classical_wall_time,
+        "peak_memory_bytes": timing["peak_memory_bytes"],
+        "success": success
+    }
+
+def bench_grover(n: int, repeats: int, trials: int, rng: np.random.Generator) -> List[Dict[str, Any]]:
+    size = 2 ** n
+    target = int(rng.integers(size))
+    iterations = max(1, calculate_optimal_iterations(size))
+    timing = time_route(run_grover_algorithm, GroverRequest(target_item=target, iterations=iterations, num_qubits=n), repeats)
+
+    # The oracle marks target_item written with qubit 0 as the leftmost bit
+    marked = int(format(target, f'0{n}b')[::-1], 2)
+    success = timing["response"].probabilities[marked] > 0.5
+
+    start = time.perf_counter()
+    classical = statistics.mean(classical_search(n, target, rng) for _ in range(trials))
+    classical_time = (time.perf_counter() - start) / trials
+    return [row("grover", n, iterations, classical, timing, success,
+                estimate_algorithm_runtime(n, "grover"), classical_time)]
+
+def bench_deutsch_jozsa(n: int, repeats: int, trials: int, rng: np.random.Generator) -> List[Dict[str, Any]]:
+    functions = {
+        "constant-0": lambda x: 0,
+        "balanced": lambda x: bin(x).count("1") & 1
+    }
+    rows = []
+    for function_type, f in functions.items():
+        timing = time_route(run_deutsch_jozsa_algorithm, DeutschJozsaRequest(function_type=function_type, num_qubits=n), repeats)
+        expected = "CONSTANT" if function_type.startswith("constant") else "BALANCED"
+        start = time.perf_counter()
+        classical = classical_deutsch_jozsa(n, f)
+        classical_time = time.perf_counter() - start
+        rows.append(row("deutsch-jozsa", n, 1, classical, timing, timing["response"].result == expected,
+                        estimate_algorithm_runtime(n, "deutsch-jozsa"), classical_time, function_type))
+    return rows
+
+def bench_bernstein_vazirani(n: int, repeats: int, trials: int, rng: np.random.Generator) -> List[Dict[str, Any]]:
+    hidden = ''.join(rng.choice(['0', '1'], size=n))
+    timing = time_route(run_bernstein_vazirani_algorithm, BernsteinVaziraniRequest(hidden_string=hidden, num_qubits=n), repeats)
+
+    secret = bits_to_int(hidden)
+    start = time.perf_counter()
+    classical, recovered = classical_bernstein_vazirani(n, lambda x: bin(x & secret).count("1") & 1)
+    classical_time = time.perf_counter() - start
+    success = timing["response"].recovered_string == hidden and recovered == secret
+    return [row("bernstein-vazirani", n, 1, classical, timing, success,
+                estimate_algorithm_runtime(n, "bernstein-vazirani"), classical_time)]
+
+def bench_simon(n: int, repeats: int, trials: int, rng: np.random.Generator) -> List[Dict[str, Any]]:
+    period = int(rng.integers(1, 2 ** n))
+    hidden = ''.join('1' if (period >> i) & 1 else '0' for i in range(n))
+    request = SimonRequest(hidden_period=hidden, num_qubits=2 * n, seed=int(rng.integers(2 ** 31)))
+    timing = time_route(run_simon_algorithm, request, repeats)
+
+    table = random_two_to_one_table(period, n, request.oracle_seed)
+    start = time.perf_counter()
+    classical = statistics.mean(classical_simon(n, table, rng) for _ in range(trials))
+    classical_time = (time.perf_counter() - start) / trials
+    response = timing["response"]
+    return [row("simon", n, response.oracle_queries, classical, timing, response.recovered_period == hidden,
+                estimate_algorithm_runtime(2 * n, "simon"), classical_time)]
+
+BENCHMARKS = {
+    "grover": (bench_grover, 2),
+    "deutsch-jozsa": (bench_deutsch_jozsa, 1),
+    "bernstein-vazirani": (bench_bernstein_vazirani, 1),
+    "simon": (bench_simon, 1)
+}
+
+def run_suite(algorithms: List[str], min_n: int, max_n: int, repeats: int, trials: int, seed: int) -> List[Dict[str, Any]]:
+    rng = np.random.default_rng(seed)
+    results = []
+    for algorithm in algorithms:
+        bench, smallest = BENCHMARKS[algorithm]
+        for n in range(max(min_n, smallest), max_n + 1):
+            if algorithm == "simon" and 2 * n > MAX_SIMON_QUBITS:
+                break
+            rows = bench(n, repeats, trials, rng)
+            for r in rows:
+                print(f"{r['algorithm']:<20}{r['variant']:<12}n={n:<3}"
+                      f"quantum={r['quantum_queries']:<6}classical={r['classical_queries']:<10.1f}"
+                      f"time={r['wall_time_s'] * 1000:8.2f}ms  ok={r['success']}", file=sys.stderr)
+            results.extend(rows)
+    return results
+
+def write_csv(path: str, results: List[Dict[str, Any]]) -> None:
+    with open(path, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=list(results[0].keys()))
+        writer.writeheader()
+        writer.writerows(results)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--algorithms", nargs="+", default=list(BENCHMARKS), choices=list(BENCHMARKS))
+    parser.add_argument("--min-n", type=int, default=1)
+    parser.add_argument("--max-n", type=int, default=8)
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per point, the median is reported")
+    parser.add_argument("--trials", type=int, default=20, help="classical runs averaged per point")
+    parser.add_argument("--seed", type=int, default=2024)
+    parser.add_argument("--output", help="JSON results path (default: results/query_scaling-<commit>.json)")
+    parser.add_argument("--csv", help="also write a flat CSV for plotting")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="allowed relative growth before a metric counts as a regression")
+    args = parser.parse_args(argv)
+
+    results = run_suite(args.algorithms, args.min_n, args.max_n, args.repeats, args.trials, args.seed)
+    save_report("query_scaling", results, args.output, threshold=args.threshold)
+    if args.csv:
+        write_csv(args.csv, results)
+
+    failures = [f"{r['algorithm']} n={r['n']} {r['variant']}".strip() for r in results if not r["success"]]
+    for failure in failures:
+        print(f"INCORRECT RESULT: {failure}", file=sys.stderr)
+
+    regressions = check_baseline(results, args.baseline, key=lambda r: (r["algorithm"], r["variant"], r["n"]),
+                                 metrics=["wall_time_s", "quantum_queries", "peak_memory_bytes"],
+                                 threshold=args.threshold)
+
+    return 1 if failures or regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,194 @@
+"""Macro-benchmarks of every API route, in-process through the ASGI app
+
+Each route is called through httpx's ASGI transport, so the numbers cover
+routing, validation, the endpoint, serialization and middleware without any
+network or server process. The first call of each route ("first_seconds")
+runs against cold caches; "seconds" is the median of the warm calls after
+it. Routes registered on the app without a spec below are reported as
+uncovered, so new endpoints do not silently drop out of the suite.
+
+Submissions go to a temporary SQLite database unless SUBMISSION_DB_PATH is
+set, and background workers (catalog watcher, metrics flushing) are not
+started.
+
+    python -m benchmarks.routes
+    python -m benchmarks.routes --match exercises --repeats 20
+    python -m benchmarks.routes --baseline benchmarks/results/routes-abc1234.json
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import httpx
+
+import benchmarks.common  # noqa: F401  (puts the backend directory on sys.path)
+
+os.environ.setdefault("SUBMISSION_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="bench-routes-"), "submissions.db"))
+os.environ.setdefault("LOG_LEVEL", "warning")
+
+from benchmarks.common import check_baseline, save_report
+from app.main import app
+from app.utils.job_queue import job_queue
+from app.utils.submission_store import submission_store
+
+class RouteCase(NamedTuple):
+    method: str
+    path: str        # route template, as in app.routes
+    url: str         # concrete URL to request
+    variant: str = "default"
+    json: Optional[Dict[str, Any]] = None
+    params: Optional[Dict[str, Any]] = None
+
+BELL = [{"gate": "H", "qubit": 0, "timeStep": 0}, {"gate": "CNOT", "qubit": 0, "target_qubit": 1, "timeStep": 1}]
+SIMULATOR_BELL = [{"name": "H", "qubit": 0, "timeStep": 0}, {"name": "CNOT", "qubit": 0, "target_qubit": 1, "timeStep": 1}]
+
+def simulator_ladder(qubits: int) -> List[Dict[str, Any]]:
+    gates = [{"name": "H", "qubit": q, "timeStep": 0} for q in range(qubits)]
+    gates += [{"name": "CNOT", "qubit": q, "target_qubit": q + 1, "timeStep": q + 1} for q in range(qubits - 1)]
+    return gates
+
+CASES: List[RouteCase] = [
+    RouteCase("GET", "/", "/"),
+    RouteCase("GET", "/health", "/health"),
+    RouteCase("GET", "/api/health", "/api/health"),
+    RouteCase("GET", "/api/ready", "/api/ready"),
+    RouteCase("GET", "/api/algorithms", "/api/algorithms"),
+    RouteCase("GET", "/metrics", "/metrics"),
+    RouteCase("GET", "/api/profiles", "/api/profiles"),
+    RouteCase("GET", "/api/profiles/{profile_id}", "/api/profiles/missing", variant="not_found"),
+
+    RouteCase("GET", "/api/algorithms/grover/info", "/api/algorithms/grover/info"),
+    RouteCase("POST", "/api/algorithms/grover/simulate", "/api/algorithms/grover/simulate", json={}),
+    RouteCase("POST", "/api/algorithms/grover/run", "/api/algorithms/grover/run", json={}),
+    RouteCase("POST", "/api/algorithms/grover/run", "/api/algorithms/grover/run", variant="6_qubits",
+              json={"num_qubits": 6, "target_item": 11, "iterations": 6}),
+    RouteCase("GET", "/api/algorithms/deutsch-jozsa/info", "/api/algorithms/deutsch-jozsa/info"),
+    RouteCase("POST", "/api/algorithms/deutsch-jozsa/simulate", "/api/algorithms/deutsch-jozsa/simulate", json={}),
+    RouteCase("POST", "/api/algorithms/deutsch-jozsa/run", "/api/algorithms/deutsch-jozsa/run", json={}),
+    RouteCase("GET", "/api/algorithms/bernstein-vazirani/info", "/api/algorithms/bernstein-vazirani/info"),
+    RouteCase("POST", "/api/algorithms/bernstein-vazirani/simulate", "/api/algorithms/bernstein-vazirani/simulate", json={}),
+    RouteCase("POST", "/api/algorithms/bernstein-vazirani/run", "/api/algorithms/bernstein-vazirani/run", json={}),
+    RouteCase("GET", "/api/algorithms/simon/info", "/api/algorithms/simon/info"),
+    RouteCase("POST", "/api/algorithms/simon/simulate", "/api/algorithms/simon/simulate", json={"seed": 7}),
+    RouteCase("POST", "/api/algorithms/simon/run", "/api/algorithms/simon/run", json={"seed": 7}),
+
+    RouteCase("GET", "/api/algorithms/simulator/info", "/api/algorithms/simulator/info"),
+    RouteCase("GET", "/api/algorithms/simulator/gates", "/api/algorithms/simulator/gates"),
+    RouteCase("POST", "/api/algorithms/simulator/run", "/api/algorithms/simulator/run",
+              json={"qubits": 2, "gates": SIMULATOR_BELL}),
+    RouteCase("POST", "/api/algorithms/simulator/run", "/api/algorithms/simulator/run", variant="10_qubits",
+              json={"qubits": 10, "gates": simulator_ladder(10)}),
+    RouteCase("POST", "/api/algorithms/simulator/custom", "/api/algorithms/simulator/custom",
+              json={"qubits": 2, "gates": SIMULATOR_BELL}),
+
+    RouteCase("GET", "/api/exercises", "/api/exercises"),
+    RouteCase("GET", "/api/exercises", "/api/exercises", variant="filtered", params={"difficulty": "beginner"}),
+    RouteCase("GET", "/api/exercises/{exercise_id}", "/api/exercises/ex005"),
+    RouteCase("GET", "/api/exercises/{exercise_id}/stats", "/api/exercises/ex005/stats"),
+    RouteCase("POST", "/api/exercises/{exercise_id}/submit", "/api/exercises/ex005/submit",
+              json={"circuit": BELL, "user_id": "bench"}),
+    RouteCase("POST", "/api/exercises/{exercise_id}/analyze", "/api/exercises/ex005/analyze", json={"circuit": BELL}),
+    RouteCase("POST", "/api/exercises/{exercise_id}/simulate", "/api/exercises/ex005/simulate", json={"circuit": BELL}),
+    RouteCase("POST", "/api/exercises/grade/bulk", "/api/exercises/grade/bulk",
+              json={"submissions": [{"user_id": f"bench-{i}", "exercise_id": "ex005", "circuit": BELL} for i in range(16)]}),
+    RouteCase("GET", "/api/leaderboard", "/api/leaderboard"),
+    RouteCase("GET", "/api/users/{user_id}/progress", "/api/users/bench/progress"),
+
+    # Submission only, the jobs themselves run in the background
+    RouteCase("POST", "/api/jobs/simulate", "/api/jobs/simulate", json={"qubits": 2, "circuit": BELL}),
+    RouteCase("POST", "/api/jobs/grover-sweep", "/api/jobs/grover-sweep", json={"num_qubits": 2, "target_item": 1}),
+    RouteCase("GET", "/api/jobs", "/api/jobs"),
+    RouteCase("GET", "/api/jobs/{job_id}", "/api/jobs/missing", variant="not_found"),
+    RouteCase("GET", "/api/jobs/{job_id}/result", "/api/jobs/missing/result", variant="not_found"),
+    RouteCase("GET", "/api/jobs/{job_id}/events", "/api/jobs/missing/events", variant="not_found"),
+    RouteCase("DELETE", "/api/jobs/{job_id}", "/api/jobs/missing", variant="not_found"),
+]
+
+# Interactive documentation is static and not worth tracking
+SKIPPED_PATHS = {"/openapi.json", "/api/docs", "/api/redoc", "/docs/oauth2-redirect"}
+
+def uncovered_routes() -> List[str]:
+    covered = {(case.method, case.path) for case in CASES}
+    missing = []
+    for route in app.routes:
+        if route.path in SKIPPED_PATHS:
+            continue
+        for method in sorted(getattr(route, "methods", None) or []):
+            if method != "HEAD" and (method, route.path) not in covered:
+                missing.append(f"{method} {route.path}")
+    return missing
+
+async def time_case(client: httpx.AsyncClient, case: RouteCase, repeats: int) -> Dict[str, Any]:
+    async def call() -> float:
+        start = time.perf_counter()
+        response = await client.request(case.method, case.url, json=case.json, params=case.params)
+        elapsed = time.perf_counter() - start
+        statuses.add(response.status_code)
+        # Some routes report failures as {"success": false} with a 200
+        if response.headers.get("content-type", "").startswith("application/json"):
+            body = response.json()
+            if isinstance(body, dict) and body.get("success") is False:
+                failures.append(body.get("error_message"))
+        return elapsed
+
+    statuses: set = set()
+    failures: List[Optional[str]] = []
+    first = await call()
+    samples = [await call() for _ in range(repeats)]
+    return {
+        "method": case.method,
+        "path": case.path,
+        "variant": case.variant,
+        "first_seconds": first,
+        "seconds": statistics.median(samples),
+        "min_seconds": min(samples),
+        "calls": repeats + 1,
+        "status": sorted(statuses),
+        "failures": len(failures)
+    }
+
+async def run_suite(cases: List[RouteCase], repeats: int) -> List[Dict[str, Any]]:
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for case in cases:
+            row = await time_case(client, case, repeats)
+            results.append(row)
+            print(f"{case.method:<5} {case.path:<48} {case.variant:<10} "
+                  f"first {row['first_seconds'] * 1e3:9.2f} ms  warm {row['seconds'] * 1e3:9.2f} ms  "
+                  f"{'/'.join(str(s) for s in row['status'])}"
+                  f"{'  FAILED' if row['failures'] else ''}", file=sys.stderr)
+    return results
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=10, help="warm calls per route, the median is reported")
+    parser.add_argument("--match", help="only routes whose path contains this string")
+    parser.add_argument("--output", help="JSON results path (default: results/routes-<commit>.json)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="allowed relative growth before a timing counts as a regression")
+    args = parser.parse_args(argv)
+
+    cases = [case for case in CASES if not args.match or args.match in case.path]
+    uncovered = uncovered_routes()
+    for route in uncovered:
+        print(f"uncovered route: {route}", file=sys.stderr)
+
+    try:
+        results = asyncio.run(run_suite(cases, args.repeats))
+    finally:
+        job_queue.stop()
+        submission_store.close()
+    save_report("routes", results, args.output, threshold=args.threshold, uncovered=uncovered)
+    regressions = check_baseline(results, args.baseline, key=lambda r: (r["method"], r["path"], r["variant"]),
+                                 metrics=["seconds"], threshold=args.threshold)
+    return 1 if regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,149 @@
+"""Cold-start benchmark: import time and time to first response
+
+Starts the app in fresh processes --runs times and records, from process
+start, how long `import app.main` takes, when the server first answers
+/health, when the first exercise simulation (the frontend's common path)
+returns and when /api/ready turns 200 after the background warm-up. Also
+lists which of HEAVY_MODULES `import app.main` loads; they are meant to be
+imported on first use.
+
+Exits 1 if the median time to first response exceeds --budget seconds, if
+a heavy module is imported at startup, or if a timing regressed against
+--baseline by more than --threshold.
+
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10 --budget 2.5
+    python -m benchmarks.startup --baseline benchmarks/results/startup-abc1234.json
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from benchmarks.common import BACKEND_DIR, check_baseline, save_report
+from benchmarks.loadgen import free_port
+
+# Dependencies that must stay off the startup path
+HEAVY_MODULES = ("qiskit", "qiskit_aer", "matplotlib", "scipy")
+
+# Railway's autoscaler and the frontend both give up well before this
+DEFAULT_BUDGET = 3.0
+
+# Seconds between connection attempts while waiting for the server
+POLL_INTERVAL = 0.01
+
+IMPORT_PROBE = f"""
+import json, sys, time
+start = time.perf_counter()
+import app.main
+seconds = time.perf_counter() - start
+print(json.dumps({{"seconds": seconds, "heavy": [m for m in {HEAVY_MODULES!r} if m in sys.modules]}}))
+"""
+
+def server_env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env.setdefault("SUBMISSION_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="startup-"), "submissions.db"))
+    env.setdefault("LOG_LEVEL", "warning")
+    return env
+
+def measure_import() -> Dict[str, Any]:
+    """Seconds to import app.main in a fresh interpreter, and the heavy modules it loaded"""
+    output = subprocess.check_output([sys.executable, "-c", IMPORT_PROBE], cwd=BACKEND_DIR,
+                                     env=server_env(), text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def wait_for(client: httpx.Client, process: subprocess.Popen, request, timeout: float) -> None:
+    deadline = time.monotonic() + timeout
+    while True:
+        if process.poll() is not None:
+            raise SystemExit(f"uvicorn exited with status {process.returncode}")
+        try:
+            if request(client).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        if time.monotonic() > deadline:
+            raise SystemExit(f"no successful response within {timeout:.0f}s")
+        time.sleep(POLL_INTERVAL)
+
+def measure_server(exercise_id: str, timeout: float) -> Dict[str, float]:
+    """Seconds from spawning uvicorn to the first /health, first simulation and readiness"""
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+         "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=server_env()
+    )
+    try:
+        with httpx.Client(base_url=f"http://127.0.0.1:{port}", timeout=timeout) as client:
+            wait_for(client, process, lambda c: c.get("/health"), timeout)
+            first_response = time.perf_counter() - start
+            simulate = client.post(f"/api/exercises/{exercise_id}/simulate", json={"circuit": []})
+            simulate.raise_for_status()
+            first_simulation = time.perf_counter() - start
+            wait_for(client, process, lambda c: c.get("/api/ready"), timeout)
+            ready = time.perf_counter() - start
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {"first_response_seconds": first_response, "first_simulation_seconds": first_simulation,
+            "ready_seconds": ready}
+
+def first_exercise_id() -> str:
+    with open(os.path.join(BACKEND_DIR, "app", "utils", "exercises_list.json")) as f:
+        return json.load(f)["exercises"][0]["id"]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes started, medians are reported")
+    parser.add_argument("--budget", type=float, default=DEFAULT_BUDGET,
+                        help="longest allowed median seconds from process start to the first response")
+    parser.add_argument("--timeout", type=float, default=120.0, help="seconds to wait for each milestone")
+    parser.add_argument("--output", help="JSON results path (default: results/startup-<commit>.json)")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="allowed relative growth before a timing counts as a regression")
+    args = parser.parse_args(argv)
+
+    exercise_id = first_exercise_id()
+    imports, servers = [], []
+    for run in range(args.runs):
+        imports.append(measure_import())
+        servers.append(measure_server(exercise_id, args.timeout))
+        print(f"run {run + 1}: import {imports[-1]['seconds']:.2f}s, "
+              f"first response {servers[-1]['first_response_seconds']:.2f}s, "
+              f"ready {servers[-1]['ready_seconds']:.2f}s", file=sys.stderr)
+
+    results = [{"metric": "import_seconds", "seconds": statistics.median(i["seconds"] for i in imports)}]
+    for metric in servers[0]:
+        results.append({"metric": metric, "seconds": statistics.median(s[metric] for s in servers)})
+    heavy = sorted({module for i in imports for module in i["heavy"]})
+    for row in results:
+        print(f"{row['metric']:<26}{row['seconds']:8.3f}s", file=sys.stderr)
+
+    save_report("startup", results, args.output, budget=args.budget, runs=args.runs, heavy_modules=heavy)
+    failed = False
+    first_response = next(row["seconds"] for row in results if row["metric"] == "first_response_seconds")
+    if first_response > args.budget:
+        print(f"OVER BUDGET: first response after {first_response:.2f}s, budget {args.budget:.2f}s", file=sys.stderr)
+        failed = True
+    if heavy:
+        print(f"EAGER IMPORT: import app.main loads {', '.join(heavy)}", file=sys.stderr)
+        failed = True
+    regressions = check_baseline(results, args.baseline, key=lambda r: (r["metric"],),
+                                 metrics=["seconds"], threshold=args.threshold)
+    return 1 if failed or regressions else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
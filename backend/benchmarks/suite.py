@@ -0,0 +1,49 @@
+"""Run the kernel, route and startup benchmarks in one go
+
+Writes results/kernels-<commit>.json, results/routes-<commit>.json and
+results/startup-<commit>.json and, with --baseline-commit, compares each
+against the reports stored for that commit. Exits 1 if anything regressed
+by more than --threshold or startup went over its budget.
+
+    python -m benchmarks.suite
+    python -m benchmarks.suite --quick
+    python -m benchmarks.suite --baseline-commit abc1234 --threshold 0.25
+"""
+import argparse
+import os
+import sys
+from typing import List, Optional
+
+from benchmarks.common import RESULTS_DIR
+from benchmarks import kernels, routes, startup
+
+# Small enough to finish in well under a minute
+QUICK_QUBITS = [1, 4, 8, 12, 16, 20]
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="fewer qubit counts and shorter timings")
+    parser.add_argument("--baseline-commit", help="compare against results/<suite>-<commit>.json")
+    parser.add_argument("--threshold", type=float, default=0.5,
+                        help="allowed relative growth before a timing counts as a regression")
+    args = parser.parse_args(argv)
+
+    kernel_args = ["--threshold", str(args.threshold)]
+    route_args = ["--threshold", str(args.threshold)]
+    startup_args = ["--threshold", str(args.threshold)]
+    if args.quick:
+        kernel_args += ["--qubits", *map(str, QUICK_QUBITS), "--min-time", "0.05", "--repeats", "3"]
+        route_args += ["--repeats", "5"]
+        startup_args += ["--runs", "3"]
+    if args.baseline_commit:
+        kernel_args += ["--baseline", os.path.join(RESULTS_DIR, f"kernels-{args.baseline_commit}.json")]
+        route_args += ["--baseline", os.path.join(RESULTS_DIR, f"routes-{args.baseline_commit}.json")]
+        startup_args += ["--baseline", os.path.join(RESULTS_DIR, f"startup-{args.baseline_commit}.json")]
+
+    failed = kernels.main(kernel_args)
+    failed |= routes.main(route_args)
+    failed |= startup.main(startup_args)
+    return failed
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,14 @@
+import os
+import shutil
+import tempfile
+
+# Submissions made through the API during tests go to a throwaway database,
+# never to data/submissions.db. Set before any test module imports app.main,
+# which opens the store at import time.
+TEST_DATA_DIR = tempfile.mkdtemp(prefix="quantum-core-tests-")
+os.environ["SUBMISSION_DB_PATH"] = os.path.join(TEST_DATA_DIR, "submissions.db")
+
+def pytest_sessionfinish(session, exitstatus):
+    from app.utils.submission_store import submission_store
+    submission_store.close()
+    shutil.rmtree(TEST_DATA_DIR, ignore_errors=True)
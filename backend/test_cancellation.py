@@ -0,0 +1,205 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+import app.algorithms.simulator as simulator_module
+from app.algorithms.simulator import router as simulator_router
+from app.main import CLIENT_CLOSED_REQUEST, cancelled_request
+from app.utils.cancellation import (
+    ABANDONED,
+    CLIENT_DISCONNECTED,
+    Cancelled,
+    CancellationToken,
+    DeadlineExceeded,
+    RequestCancellation,
+    bind_token,
+    check_cancelled,
+    reset_token,
+    wait_cancellable,
+)
+from app.utils.metrics import ABORTED
+from app.utils.singleflight import SingleFlight
+from app.utils.statevector import NativeGate, simulate
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+def aborted(scope, reason):
+    return ABORTED.samples().get((scope, reason), 0)
+
+class TestCancellationToken:
+
+    def test_cancel_raises_with_the_reason(self):
+        token = CancellationToken(scope="test")
+        token.check()
+        token.cancel(CLIENT_DISCONNECTED)
+        token.cancel()
+        with pytest.raises(Cancelled) as error:
+            token.check()
+        assert error.value.reason == CLIENT_DISCONNECTED
+
+    def test_deadline_raises_deadline_exceeded(self):
+        token = CancellationToken(0.01, scope="test")
+        time.sleep(0.02)
+        assert token.is_cancelled()
+        with pytest.raises(DeadlineExceeded, match="deadline of 0.01s exceeded"):
+            token.check()
+
+    def test_cleared_deadline_no_longer_expires(self):
+        token = CancellationToken(0.01, scope="test")
+        token.clear_deadline()
+        time.sleep(0.02)
+        token.check()
+
+    def test_each_token_is_counted_once(self):
+        before = aborted("test-once", "timed_out")
+        token = CancellationToken(0.001, scope="test-once")
+        time.sleep(0.01)
+        for _ in range(3):
+            with pytest.raises(DeadlineExceeded):
+                token.check()
+        assert aborted("test-once", "timed_out") - before == 1
+
+    def test_wait_returns_as_soon_as_the_token_is_cancelled(self):
+        token = CancellationToken(scope="test")
+
+        async def scenario():
+            never = asyncio.get_running_loop().create_future()
+            threading.Timer(0.05, token.cancel).start()
+            start = time.perf_counter()
+            with pytest.raises(Cancelled):
+                await wait_cancellable(never, token)
+            return time.perf_counter() - start
+
+        assert run(scenario()) < 1
+
+    def test_wait_stops_at_the_deadline(self):
+        async def scenario():
+            never = asyncio.get_running_loop().create_future()
+            with pytest.raises(DeadlineExceeded):
+                await wait_cancellable(never, CancellationToken(0.05, scope="test"))
+
+        run(scenario())
+
+class TestKernels:
+
+    def test_simulation_stops_between_gates(self):
+        token = CancellationToken(scope="test")
+        applied = []
+
+        def progress(done, total):
+            applied.append(done)
+            if done == 3:
+                token.cancel()
+
+        context = bind_token(token)
+        try:
+            with pytest.raises(Cancelled):
+                simulate([NativeGate("H", (q % 4,)) for q in range(100)], 4, progress=progress)
+        finally:
+            reset_token(context)
+        assert applied == [1, 2, 3]
+
+    def test_abandoned_flight_is_cancelled(self):
+        flights = SingleFlight("test")
+        stopped = threading.Event()
+
+        def compute():
+            try:
+                for _ in range(500):
+                    time.sleep(0.01)
+                    check_cancelled()
+            except Cancelled as e:
+                assert e.reason == ABANDONED
+                stopped.set()
+                raise
+
+        async def scenario():
+            tokens = [CancellationToken(0.05, scope="test") for _ in range(3)]
+            waiters = []
+            for token in tokens:
+                context = bind_token(token)
+                waiters.append(asyncio.ensure_future(flights.run("key", compute)))
+                reset_token(context)
+            return await asyncio.gather(*waiters, return_exceptions=True)
+
+        before = aborted("flight", ABANDONED)
+        results = run(scenario())
+        assert all(isinstance(result, DeadlineExceeded) for result in results)
+        assert stopped.wait(5)
+        assert flights.in_flight() == 0
+        assert aborted("flight", ABANDONED) - before == 1
+
+class TestRequestCancellation:
+
+    @pytest.fixture
+    def slow_simulation(self, monkeypatch):
+        """A simulator kernel that runs for seconds unless cancelled"""
+        stopped = threading.Event()
+
+        def slow(circuit, shots=1024):
+            try:
+                for _ in range(500):
+                    time.sleep(0.01)
+                    check_cancelled()
+            except Cancelled:
+                stopped.set()
+                raise
+            pytest.fail("simulation was not cancelled")
+
+        monkeypatch.setattr(simulator_module, "simulate_quantum_circuit", slow)
+        return stopped
+
+    def make_app(self, timeout):
+        api = FastAPI()
+        api.add_middleware(RequestCancellation, timeout=timeout)
+        api.add_exception_handler(Cancelled, cancelled_request)
+        api.include_router(simulator_router, prefix="/api/algorithms")
+        return api
+
+    def body(self, qubits):
+        return {"qubits": qubits, "gates": [{"name": "H", "qubit": 0, "timeStep": 0}]}
+
+    def test_deadline_returns_504_and_stops_the_kernel(self, slow_simulation):
+        async def scenario():
+            transport = httpx.ASGITransport(app=self.make_app(timeout=0.1))
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/api/algorithms/simulator/run", json=self.body(2))
+
+        start = time.perf_counter()
+        response = run(scenario())
+        assert response.status_code == 504
+        assert "timed out" in response.json()["detail"]
+        assert time.perf_counter() - start < 2
+        assert slow_simulation.wait(5)
+
+    def test_client_disconnect_stops_the_kernel(self, slow_simulation):
+        api = self.make_app(timeout=None)
+        body = httpx.Request("POST", "http://test", json=self.body(3)).read()
+        sent = []
+
+        async def scenario():
+            messages = [{"type": "http.request", "body": body, "more_body": False}]
+
+            async def receive():
+                if messages:
+                    return messages.pop()
+                await asyncio.sleep(0.1)
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {"type": "http", "method": "POST", "path": "/api/algorithms/simulator/run",
+                     "headers": [(b"content-type", b"application/json")], "query_string": b""}
+            await api(scope, receive, send)
+
+        before = aborted("request", CLIENT_DISCONNECTED)
+        run(scenario())
+        assert sent[0]["status"] == CLIENT_CLOSED_REQUEST
+        assert slow_simulation.wait(5)
+        assert aborted("request", CLIENT_DISCONNECTED) - before == 1
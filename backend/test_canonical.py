@@ -0,0 +1,37 @@
+from app.exercise_checker.quantum_simulator import GateOperation
+from app.utils.canonical import CanonicalGate, canonicalize, circuit_hash, circuit_layers
+
+def gate(name, qubit, step, target=None, parameter=None):
+    return GateOperation(name=name, qubit=qubit, timeStep=step, target_qubit=target, parameter=parameter)
+
+class TestCanonicalForm:
+
+    def test_independent_wires_can_interleave(self):
+        a = [gate("H", 0, 0), gate("X", 1, 1), gate("Z", 0, 2)]
+        b = [gate("X", 1, 0), gate("H", 0, 5), gate("Z", 0, 9)]
+        assert canonicalize(a) == canonicalize(b)
+        assert circuit_hash(a, 2) == circuit_hash(b, 2)
+
+    def test_order_on_a_wire_matters(self):
+        a = [gate("H", 0, 0), gate("Z", 0, 1)]
+        b = [gate("Z", 0, 0), gate("H", 0, 1)]
+        assert circuit_hash(a, 1) != circuit_hash(b, 1)
+
+    def test_two_qubit_gates_order_their_wires(self):
+        a = [gate("X", 1, 0), gate("CNOT", 0, 1, target=1), gate("H", 2, 2)]
+        b = [gate("CNOT", 0, 0, target=1), gate("X", 1, 1), gate("H", 2, 2)]
+        assert circuit_hash(a, 3) != circuit_hash(b, 3)
+        layers = circuit_layers(a)
+        assert layers[0] == [CanonicalGate("X", (1,)), CanonicalGate("H", (2,))]
+        assert layers[1] == [CanonicalGate("CNOT", (0, 1))]
+
+    def test_aliases_and_parameters_are_normalized(self):
+        a = [gate("cx", 0, 0, target=1), gate("RZ", 1, 1, parameter=0.5 + 1e-13), gate("RX", 0, 1)]
+        b = [gate("CNOT", 0, 0, target=1), gate("rz", 1, 1, parameter=0.5), gate("RX", 0, 1, parameter=-0.0)]
+        assert canonicalize(a) == canonicalize(b)
+        assert canonicalize(b)[0].parameter is None
+
+    def test_qubit_count_is_part_of_the_hash(self):
+        circuit = [gate("H", 0, 0)]
+        assert circuit_hash(circuit, 1) != circuit_hash(circuit, 2)
+        assert len(circuit_hash(circuit, 1)) == 64
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.exercise_checker.quantum_simulator import native_from_canonical
+from app.main import app
+from app.utils.canonical import CanonicalGate as G
+from app.utils.circuit_optimizer import optimize_circuit
+from app.utils.statevector import probabilities, simulate
+
+client = TestClient(app)
+
+def unitary(gates, n):
+    return simulate(native_from_canonical(gates), n, np.eye(2 ** n, dtype=complex)).T
+
+def random_circuit(rng, n, length):
+    names = ["H", "X", "Y", "Z", "S", "T", "RX", "RY", "RZ", "CNOT"]
+    gates = []
+    for _ in range(length):
+        name = names[rng.integers(len(names))]
+        if name == "CNOT":
+            gates.append(G(name, tuple(int(q) for q in rng.choice(n, size=2, replace=False))))
+        elif name.startswith("R"):
+            gates.append(G(name, (int(rng.integers(n)),), float(rng.choice([0, np.pi / 2, np.pi, -np.pi / 2]))))
+        else:
+            gates.append(G(name, (int(rng.integers(n)),)))
+    return gates
+
+class TestPeepholeRules:
+
+    def test_involutions_cancel_in_cascade(self):
+        gates = [G("H", (0,)), G("X", (0,)), G("X", (0,)), G("H", (0,)), G("CNOT", (0, 1)), G("CNOT", (0, 1))]
+        optimized, report = optimize_circuit(gates)
+        assert optimized == []
+        assert report.removed == {"cancelled_involutions": 6}
+
+    def test_phase_gates_merge(self):
+        optimized, _ = optimize_circuit([G("S", (0,))] * 4)
+        assert optimized == []
+        optimized, _ = optimize_circuit([G("T", (0,)), G("T", (0,)), G("S", (0,))])
+        assert optimized == [G("Z", (0,))]
+
+    def test_rotations_merge_and_identities_drop(self):
+        optimized, report = optimize_circuit([G("RZ", (0,), 0.25), G("RZ", (0,), 0.5), G("RX", (1,), 0.0)])
+        assert optimized == [G("RZ", (0,), 0.75)]
+        assert report.removed == {"merged_rotations": 1, "identity_rotations": 1}
+
+    def test_gates_on_other_wires_do_not_block(self):
+        optimized, _ = optimize_circuit([G("H", (0,)), G("X", (1,)), G("H", (0,))])
+        assert optimized == [G("X", (1,))]
+
+    def test_cnot_between_blocks_cancellation(self):
+        gates = [G("X", (1,)), G("CNOT", (0, 1)), G("X", (1,))]
+        optimized, _ = optimize_circuit(gates)
+        assert optimized == gates
+
+    def test_state_level_drops_no_ops_on_initial_state(self):
+        gates = [G("Z", (0,)), G("CNOT", (0, 1)), G("H", (0,)), G("CNOT", (0, 1))]
+        assert optimize_circuit(gates, "state")[0] == [G("H", (0,)), G("CNOT", (0, 1))]
+        assert optimize_circuit(gates, "unitary")[0] == gates
+
+    def test_probability_level_drops_trailing_diagonals(self):
+        gates = [G("H", (0,)), G("T", (0,)), G("MEASURE", (0,)), G("RZ", (0,), 1.0)]
+        assert optimize_circuit(gates, "probabilities")[0] == [G("H", (0,)), G("MEASURE", (0,))]
+
+    def test_unknown_level(self):
+        with pytest.raises(ValueError):
+            optimize_circuit([], "fast")
+
+class TestOptimizerPreservesOutputs:
+
+    @pytest.mark.parametrize("seed", range(20))
+    def test_random_circuits(self, seed):
+        rng = np.random.default_rng(seed)
+        n = 3
+        gates = random_circuit(rng, n, 30)
+        reference = unitary(gates, n)
+
+        optimized, report = optimize_circuit(gates, "unitary")
+        assert np.allclose(unitary(optimized, n), reference)
+        assert report.optimized_gates == len(optimized) <= len(gates)
+
+        state = reference[:, 0]
+        optimized, _ = optimize_circuit(gates, "state")
+        assert np.allclose(simulate(native_from_canonical(optimized), n), state)
+
+        optimized, _ = optimize_circuit(gates, "probabilities")
+        assert np.allclose(probabilities(simulate(native_from_canonical(optimized), n)), probabilities(state))
+
+class TestOptimizerToggle:
+
+    def test_submit_reports_and_can_disable_optimization(self):
+        circuit = [
+            {"gate": "H", "qubit": 0, "timeStep": 0},
+            {"gate": "H", "qubit": 0, "timeStep": 1},
+            {"gate": "X", "qubit": 0, "timeStep": 2}
+        ]
+        data = client.post("/api/exercises/ex011/submit", json={"circuit": circuit}).json()
+        assert data["passed"] is True
+        assert data["optimization"]["optimized_gates"] == 1
+
+        data = client.post("/api/exercises/ex011/submit", json={"circuit": circuit, "optimize": False}).json()
+        assert data["passed"] is True and "optimization" not in data
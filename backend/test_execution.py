@@ -0,0 +1,70 @@
+import numpy as np
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+
+from app.utils.execution import ExecutionService, terminal_measurements
+
+service = ExecutionService()
+
+class TestExecutionService:
+
+    def test_sampled_counts_use_qiskit_key_format(self):
+        circuit = QuantumCircuit(QuantumRegister(2, 'q'), ClassicalRegister(2, 'c'))
+        circuit.x(0)
+        circuit.measure_all()
+        result = service.run(circuit, shots=100)
+        assert result.counts == {"01 00": 100}
+        assert result.probabilities[1] == 1.0
+
+    def test_mid_circuit_measurement_falls_back_to_shots(self):
+        circuit = QuantumCircuit(1, 1)
+        circuit.h(0)
+        circuit.measure(0, 0)
+        circuit.h(0)
+        assert terminal_measurements(circuit) is None
+        result = service.run(circuit, shots=64, seed=1)
+        assert sum(result.counts.values()) == 64
+
+    def test_zero_shots_do_not_run_the_backend(self):
+        fresh = ExecutionService()
+        fresh.__dict__["shot_backend"] = None  # any call to the backend would fail
+        assert fresh.run_shots(QuantumCircuit(1, 1), shots=0) == {}
+
+    def test_result_cache_reuses_final_state(self):
+        circuit = QuantumCircuit(1, 1)
+        circuit.h(0)
+        circuit.measure(0, 0)
+        first = service.run(circuit, cache_key="h-test")
+        second = service.run(circuit, cache_key="h-test")
+        assert first.statevector is second.statevector
+        assert service.result_cache.hits >= 1
+
+    def test_result_cache_is_bounded_by_bytes(self):
+        bounded = ExecutionService(max_results=256, max_result_bytes=3 * 2 ** 20)
+        for seed in range(8):
+            bounded.run_native("native", lambda: np.zeros(2 ** 16, dtype=complex), cache_key=("big", seed))
+        assert len(bounded.result_cache) == 3
+        assert bounded.result_cache.bytes <= 3 * 2 ** 20
+        assert ("big", 7) in bounded.result_cache and ("big", 0) not in bounded.result_cache
+
+    def test_compile_cached_builds_once(self):
+        builds = []
+
+        def build():
+            builds.append(1)
+            circuit = QuantumCircuit(1, 1)
+            circuit.x(0)
+            circuit.measure(0, 0)
+            return circuit
+
+        first = service.compile_cached(("x-test",), build)
+        second = service.compile_cached(("x-test",), build)
+        assert first is second
+        assert len(builds) == 1
+        assert service.run(second, shots=10).counts == {"1": 10}
+
+    def test_compiled_cache_evicts_least_recently_used(self):
+        small = ExecutionService(max_compiled=2)
+        for key in ("a", "b", "c"):
+            small.compile_cached(key, lambda: QuantumCircuit(1))
+        assert "a" not in small.compiled_cache
+        assert small.compiled_cache.evictions == 1
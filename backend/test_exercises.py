@@ -0,0 +1,426 @@
+import json
+import time
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+from qiskit.quantum_info import Statevector
+
+from app.main import app
+from app.exercise_checker.analysis import PrefixStateCache, check_analysis_size, step_bytes
+from app.exercise_checker.equivalence import EquivalenceCheck, is_clifford, sample_count
+from app.exercise_checker.quantum_simulator import QuantumSimulator, parse_gate_operations, to_native_gates
+from app.exercise_checker.scoring import score_batch
+from app.utils.exercise_manager import ExerciseManager, compile_target
+from app.utils.statevector import simulate
+
+client = TestClient(app)
+
+EXERCISES_PATH = "app/utils/exercises_list.json"
+
+def write_catalog(tmp_path, exercises):
+    path = tmp_path / "exercises.json"
+    path.write_text(json.dumps({"exercises": exercises}))
+    return str(path)
+
+def make_exercise(exercise_id, **overrides):
+    exercise = {
+        "id": exercise_id,
+        "title": exercise_id,
+        "difficulty": "beginner",
+        "num_qubits": 1,
+        "target_type": "state_vector",
+        "target_data": {"state_vector": [0, 1], "tolerance": 0.001},
+        "tags": ["single-qubit"]
+    }
+    exercise.update(overrides)
+    return exercise
+
+class TestExerciseCatalog:
+
+    def test_targets_are_precompiled(self):
+        manager = ExerciseManager(EXERCISES_PATH)
+        target = manager.get_target("ex002")
+        assert target.kind == "statevector"
+        assert target.data.dtype == complex
+        assert np.isclose(np.linalg.norm(target.data), 1)
+        assert manager.get_target("ex003").kind == "probabilities"
+        assert manager.get_target("ex010").data.shape == (4, 4)
+
+    def test_complex_pairs_are_supported(self):
+        target = compile_target(make_exercise("c", target_data={"state_vector": [[0, 0], [0, 1]]}))
+        assert target.data[1] == 1j
+
+    def test_invalid_targets_are_rejected(self, tmp_path):
+        path = write_catalog(tmp_path, [
+            make_exercise("good"),
+            make_exercise("unnormalized", target_data={"state_vector": [1, 1]}),
+            make_exercise("wrong-size", target_data={"state_vector": [1, 0, 0, 0]})
+        ])
+        manager = ExerciseManager(path)
+        assert manager.get_exercise("good") is not None
+        assert manager.get_exercise("unnormalized") is None
+        assert set(manager.errors) == {"unnormalized", "wrong-size"}
+
+    def test_filtered_listing(self, tmp_path):
+        path = write_catalog(tmp_path, [
+            make_exercise("a", tags=["x", "y"]),
+            make_exercise("b", tags=["y"], difficulty="advanced"),
+            make_exercise("c", tags=["x"], difficulty="advanced")
+        ])
+        manager = ExerciseManager(path)
+        assert [e["id"] for e in manager.list_exercises(tag="y")] == ["a", "b"]
+        assert [e["id"] for e in manager.list_exercises(difficulty="advanced")] == ["b", "c"]
+        assert [e["id"] for e in manager.list_exercises(tag="x", difficulty="advanced")] == ["c"]
+        assert manager.list_exercises(tag="missing") == []
+
+class TestHotReload:
+
+    def test_reload_swaps_catalog(self, tmp_path):
+        path = write_catalog(tmp_path, [make_exercise("a")])
+        manager = ExerciseManager(path)
+        old = manager.catalog
+        swaps = []
+        manager.add_reload_listener(lambda before, after: swaps.append((before.version, after.version)))
+
+        write_catalog(tmp_path, [make_exercise("a"), make_exercise("b", tags=["new"])])
+        assert manager.check_for_changes() is True
+        assert manager.version == 2 and swaps == [(1, 2)]
+        assert [e["id"] for e in manager.list_exercises(tag="new")] == ["b"]
+        # Readers holding the old snapshot keep a consistent view
+        assert old.get_exercise("b") is None and old.get_target("a") is not None
+        assert manager.check_for_changes() is False
+
+    def test_broken_file_keeps_current_catalog(self, tmp_path):
+        path = write_catalog(tmp_path, [make_exercise("a")])
+        manager = ExerciseManager(path)
+        (tmp_path / "exercises.json").write_text('{"exercises": [')
+        assert manager.check_for_changes() is False
+        assert manager.version == 1 and manager.get_exercise("a") is not None
+
+    def test_invalid_exercises_keep_current_catalog(self, tmp_path):
+        path = write_catalog(tmp_path, [make_exercise("a"), make_exercise("b")])
+        manager = ExerciseManager(path)
+        broken = make_exercise("a", target_data={"state_vector": [1, 1]})
+        write_catalog(tmp_path, [broken, make_exercise("b")])
+        assert manager.check_for_changes() is False
+        write_catalog(tmp_path, [])
+        assert manager.check_for_changes() is False
+        assert manager.version == 1 and manager.get_exercise("a") is not None
+
+        # Deleting an exercise from the file still removes it
+        write_catalog(tmp_path, [make_exercise("b"), make_exercise("new", target_data={"state_vector": [1, 1]})])
+        assert manager.check_for_changes() is True
+        assert manager.get_exercise("a") is None and set(manager.errors) == {"new"}
+
+    def test_watcher_picks_up_changes(self, tmp_path):
+        path = write_catalog(tmp_path, [make_exercise("a")])
+        manager = ExerciseManager(path)
+        manager.start_watching(interval=0.01)
+        try:
+            write_catalog(tmp_path, [make_exercise("a"), make_exercise("b")])
+            deadline = time.time() + 5
+            while manager.get_exercise("b") is None and time.time() < deadline:
+                time.sleep(0.01)
+            assert manager.get_exercise("b") is not None
+        finally:
+            manager.stop_watching()
+
+class TestExerciseEndpoints:
+
+    def test_list_filtered_by_difficulty(self):
+        response = client.get("/api/exercises", params={"difficulty": "beginner"})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["count"] > 0
+        assert all(e["difficulty"] == "beginner" for e in data["exercises"])
+
+    def test_correct_submission_passes(self):
+        circuit = [{"gate": "H", "qubit": 0, "timeStep": 0}]
+        response = client.post("/api/exercises/ex001/submit", json={"circuit": circuit})
+        assert response.status_code == 200
+        assert response.json()["passed"] is True
+
+    def test_wrong_submission_fails(self):
+        circuit = [{"gate": "X", "qubit": 0, "timeStep": 0}]
+        response = client.post("/api/exercises/ex001/submit", json={"circuit": circuit})
+        assert response.status_code == 200
+        assert response.json()["passed"] is False
+
+    def test_submit_returns_only_graded_field(self):
+        circuit = [{"gate": "H", "qubit": 0, "timeStep": 0}]
+        result = client.post("/api/exercises/ex001/submit", json={"circuit": circuit}).json()["simulation_result"]
+        assert set(result) == {"num_qubits", "state_vector"}
+        assert np.allclose(result["state_vector"], [[2 ** -0.5, 0], [2 ** -0.5, 0]])
+
+    def test_extra_fields_are_opt_in(self):
+        circuit = [{"gate": "X", "qubit": 0, "timeStep": 0}]
+        body = {"circuit": circuit, "include": ["probabilities", "measurement_counts", "unitary"]}
+        result = client.post("/api/exercises/ex001/submit", json=body).json()["simulation_result"]
+        assert result["probabilities"] == {"0": 0.0, "1": 1.0}
+        assert result["measurement_counts"] == {"1": 1024} and result["total_shots"] == 1024
+        assert result["unitary"] == [[[0, 0], [1, 0]], [[1, 0], [0, 0]]]
+
+        response = client.post("/api/exercises/ex001/submit", json={"circuit": circuit, "include": ["bloch"]})
+        assert response.status_code == 400
+
+    def test_counts_only_measure_measured_qubits(self):
+        circuit = [
+            {"gate": "X", "qubit": 0, "timeStep": 0},
+            {"gate": "X", "qubit": 1, "timeStep": 0},
+            {"gate": "MEASURE", "qubit": 1, "timeStep": 1}
+        ]
+        counts = QuantumSimulator().simulate_circuit(circuit, 2, shots=50, outputs=["measurement_counts"])
+        assert counts["measurement_counts"] == {"10": 50}
+
+class TestScoring:
+
+    def test_global_phase_is_ignored(self):
+        target = np.array([1, 1j]) / np.sqrt(2)
+        passed, scores, errors = score_batch("statevector", target, np.exp(1j * 0.7) * target, 0.001)
+        assert passed[0] and scores[0] == 100
+        assert errors[0] < 1e-12
+
+    def test_batch_scoring(self):
+        target = np.array([1, 0, 0, 1]) / np.sqrt(2)
+        candidates = np.array([
+            target,
+            -target,
+            [1, 0, 0, 0],
+            [0, 1, 0, 0]
+        ], dtype=complex)
+        passed, scores, errors = score_batch("statevector", target, candidates, 0.001)
+        assert passed.tolist() == [True, True, False, False]
+        assert np.allclose(errors, [0, 0, 0.5, 1])
+        assert scores[2] > scores[3]
+
+    def test_total_variation_distance(self):
+        target = np.array([0.75, 0.25])
+        passed, _, errors = score_batch("probabilities", target, np.array([[0.5, 0.5], [0.75, 0.25]]), 0.01)
+        assert np.allclose(errors, [0.25, 0])
+        assert passed.tolist() == [False, True]
+
+    def test_unitary_fidelity_up_to_phase(self):
+        swap = np.array([[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]], dtype=complex)
+        passed, _, _ = score_batch("unitary", swap, np.stack([1j * swap, np.eye(4)]), 0.001)
+        assert passed.tolist() == [True, False]
+
+    def test_phase_only_submission_passes(self):
+        # Z·X·Z = -X, so the result equals the target |1⟩ up to a global phase
+        circuit = [
+            {"gate": "Z", "qubit": 0, "timeStep": 0},
+            {"gate": "X", "qubit": 0, "timeStep": 1},
+            {"gate": "Z", "qubit": 0, "timeStep": 2}
+        ]
+        response = client.post("/api/exercises/ex011/submit", json={"circuit": circuit})
+        assert response.json()["passed"] is True
+
+class TestBulkGrading:
+
+    def grade(self, submissions):
+        response = client.post("/api/exercises/grade/bulk", json={"submissions": submissions})
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        return lines[:-1], lines[-1]["summary"]
+
+    def test_identical_circuits_are_simulated_once(self):
+        right = [{"gate": "H", "qubit": 0, "timeStep": 0}]
+        wrong = [{"gate": "X", "qubit": 0, "timeStep": 0}]
+        submissions = [
+            {"user_id": f"student-{i}", "exercise_id": "ex001", "circuit": right if i % 3 else wrong}
+            for i in range(30)
+        ]
+        results, summary = self.grade(submissions)
+        assert summary["submissions"] == 30 and summary["graded"] == 30
+        assert summary["unique_circuits"] == 2
+        by_index = {r["index"]: r for r in results}
+        assert all(by_index[i]["passed"] == bool(i % 3) for i in range(30))
+        assert by_index[1]["user_id"] == "student-1"
+
+    def test_matches_single_submission_endpoint(self):
+        circuit = [
+            {"gate": "H", "qubit": 0, "timeStep": 0},
+            {"gate": "CNOT", "qubit": 0, "target_qubit": 1, "timeStep": 1}
+        ]
+        single = client.post("/api/exercises/ex005/submit", json={"circuit": circuit}).json()
+        results, _ = self.grade([{"exercise_id": "ex005", "circuit": circuit}])
+        assert results[0]["passed"] == single["passed"]
+        assert results[0]["score"] == single["score"]
+
+    def test_invalid_submissions_are_reported_per_line(self):
+        results, summary = self.grade([
+            {"user_id": "a", "exercise_id": "missing", "circuit": []},
+            {"user_id": "b", "exercise_id": "ex001", "circuit": [{"gate": "H", "qubit": 7, "timeStep": 0}]},
+            {"user_id": "c", "exercise_id": "ex001", "circuit": [{"gate": "H", "qubit": 0, "timeStep": 0}]}
+        ])
+        by_user = {r["user_id"]: r for r in results}
+        assert "not found" in by_user["a"]["detail"]
+        assert "Invalid circuit" in by_user["b"]["detail"]
+        assert by_user["c"]["passed"] is True
+        assert summary["rejected"] == 2
+
+    def test_unitary_targets_are_graded(self):
+        swap = [
+            {"gate": "CNOT", "qubit": 0, "target_qubit": 1, "timeStep": 0},
+            {"gate": "CNOT", "qubit": 1, "target_qubit": 0, "timeStep": 1},
+            {"gate": "CNOT", "qubit": 0, "target_qubit": 1, "timeStep": 2}
+        ]
+        results, _ = self.grade([
+            {"exercise_id": "ex010", "circuit": swap},
+            {"exercise_id": "ex010", "circuit": swap[:1]}
+        ])
+        assert [r["passed"] for r in sorted(results, key=lambda r: r["index"])] == [True, False]
+
+    def test_native_kernels_match_qiskit(self):
+        rng = np.random.default_rng(7)
+        names = ["H", "X", "Y", "Z", "S", "T", "RX", "RY", "RZ", "CNOT"]
+        for _ in range(10):
+            circuit = []
+            for step in range(12):
+                name = names[rng.integers(len(names))]
+                qubit, target = (int(q) for q in rng.choice(3, size=2, replace=False))
+                circuit.append({"gate": name, "qubit": qubit, "target_qubit": target,
+                                "parameter": float(rng.uniform(0, 2 * np.pi)), "timeStep": step})
+            gate_operations = parse_gate_operations(circuit)
+            expected = Statevector(QuantumSimulator().create_quantum_circuit(3, gate_operations)).data
+            actual = simulate(to_native_gates(gate_operations, 3), 3)
+            assert np.allclose(actual, expected)
+
+class TestCircuitAnalysis:
+
+    def analyze(self, exercise_id, circuit):
+        response = client.post(f"/api/exercises/{exercise_id}/analyze", json={"circuit": circuit})
+        assert response.status_code == 200
+        return response.json()
+
+    def test_reference_solutions_pass_and_stay_private(self):
+        manager = ExerciseManager(EXERCISES_PATH)
+        assert all("solution" not in exercise for exercise in manager.exercises["exercises"])
+        for exercise in manager.get_all_exercises():
+            assert "solution" not in exercise
+            solution = manager.catalog.get_solution(exercise["id"])
+            assert solution, exercise["id"]
+            result = client.post(f"/api/exercises/{exercise['id']}/submit",
+                                 json={"circuit": solution, "optimize": False}).json()
+            assert result["passed"], exercise["id"]
+
+    def test_divergence_step_and_expected_gate(self):
+        circuit = [
+            {"gate": "H", "qubit": 0, "timeStep": 0},
+            {"gate": "X", "qubit": 1, "timeStep": 1},
+            {"gate": "CNOT", "qubit": 0, "target_qubit": 1, "timeStep": 2}
+        ]
+        result = self.analyze("ex002", circuit)
+        assert result["passed"] is False and result["has_reference"] is True
+        assert [s["on_reference_path"] for s in result["steps"]] == [True, False, False]
+        assert result["divergence"]["step"] == 2
+        assert result["divergence"]["gate"]["name"] == "X"
+        assert result["divergence"]["expected_gate"] == {"name": "CNOT", "qubits": [0, 1], "parameter": None}
+
+    def test_incomplete_circuit_on_path(self):
+        swap_start = [{"gate": "CNOT", "qubit": 0, "target_qubit": 1, "timeStep": 0}]
+        result = self.analyze("ex010", swap_start)
+        assert result["divergence"]["step"] == 2 and result["divergence"]["gate"] is None
+        assert result["divergence"]["expected_gate"]["qubits"] == [1, 0]
+
+    def test_solved_circuit_has_no_divergence(self):
+        circuit = [{"gate": "H", "qubit": 0, "timeStep": 0}, {"gate": "Z", "qubit": 0, "timeStep": 1}]
+        result = self.analyze("ex014", circuit)
+        assert result["passed"] is True and result["divergence"] is None
+        assert result["steps"][-1]["target_error"] < 1e-9
+
+    def test_edits_reuse_cached_prefixes(self):
+        base = [{"gate": "RY", "qubit": 0, "parameter": 0.1 * i, "timeStep": i} for i in range(1, 9)]
+        self.analyze("ex003", base)
+        edited = base[:-1] + [{"gate": "RX", "qubit": 0, "parameter": 0.3, "timeStep": 8}]
+        assert self.analyze("ex003", edited)["reused_prefix_states"] == 8
+
+    def test_prefix_cache_is_bounded_by_bytes(self):
+        cache = PrefixStateCache(max_size=4096, max_bytes=4 * step_bytes(2, "unitary"))
+        gates = to_native_gates(parse_gate_operations(
+            [{"gate": "RY", "qubit": 0, "parameter": 0.1 * i, "timeStep": i} for i in range(10)]), 2)
+        cache.evolve(gates, 2, "unitary")
+        assert len(cache.cache) == 4 and cache.cache.bytes <= cache.cache.max_bytes
+
+    def test_oversized_analyses_are_rejected(self):
+        with pytest.raises(ValueError):
+            check_analysis_size(10, 10, "unitary")
+        check_analysis_size(10, 10, "state")
+        circuit = [{"gate": "X", "qubit": 0, "timeStep": i} for i in range(501)]
+        response = client.post("/api/exercises/ex003/analyze", json={"circuit": circuit})
+        assert response.status_code == 400 and "500 gates" in response.json()["detail"]
+
+class TestEquivalenceChecking:
+
+    def reversal(self, num_qubits):
+        circuit = []
+        for i in range(num_qubits // 2):
+            j = num_qubits - 1 - i
+            for control, target in ((i, j), (j, i), (i, j)):
+                circuit.append({"gate": "CNOT", "qubit": control, "target_qubit": target, "timeStep": len(circuit)})
+        return circuit
+
+    def test_large_unitary_target_is_checked_without_matrix(self):
+        target = ExerciseManager(EXERCISES_PATH).get_target("ex016")
+        assert target.method == "randomized" and target.data is None
+        response = client.post("/api/exercises/ex016/submit", json={"circuit": self.reversal(13)}).json()
+        assert response["passed"] is True and response["score"] == 100
+        assert "unitary" not in response["simulation_result"]
+
+    def test_non_equivalent_circuits_fail(self):
+        circuit = self.reversal(13)
+        for wrong in (circuit[:-1], circuit + [{"gate": "Z", "qubit": 4, "timeStep": 99}]):
+            response = client.post("/api/exercises/ex016/submit", json={"circuit": wrong}).json()
+            assert response["passed"] is False
+
+    def test_global_phase_is_ignored(self):
+        target = compile_target(make_exercise(
+            "phase", num_qubits=2, target_type="unitary", target_data={"method": "randomized", "tolerance": 0.001},
+            solution=[{"gate": "X", "qubit": 0, "timeStep": 0}]
+        ))
+        check = EquivalenceCheck(target, seed=1)
+        # Y = iXZ, so Z then Y equals X up to the phase i
+        zy = to_native_gates(parse_gate_operations([
+            {"gate": "Z", "qubit": 0, "timeStep": 0}, {"gate": "Y", "qubit": 0, "timeStep": 1}
+        ]), 2)
+        assert check.error(zy) < 1e-12
+        assert check.error(to_native_gates(parse_gate_operations([{"gate": "Z", "qubit": 0, "timeStep": 0}]), 2)) > 0.1
+
+    def test_clifford_circuits_use_stabilizer_states(self):
+        target = ExerciseManager(EXERCISES_PATH).get_target("ex016")
+        check = EquivalenceCheck(target, seed=3)
+        reversal = to_native_gates(parse_gate_operations(self.reversal(13)), 13)
+        assert is_clifford(reversal) and check.method_for(reversal) == "stabilizer"
+        with_t = reversal + to_native_gates(parse_gate_operations([{"gate": "T", "qubit": 0, "timeStep": 0}]), 13)
+        assert not is_clifford(with_t) and check.method_for(with_t) == "haar"
+        assert check.error(with_t) > target.tolerance
+
+    def test_matrix_targets_can_opt_in(self):
+        swap = [[1, 0, 0, 0], [0, 0, 1, 0], [0, 1, 0, 0], [0, 0, 0, 1]]
+        target = compile_target(make_exercise(
+            "swap", num_qubits=2, target_type="unitary",
+            target_data={"unitary_matrix": swap, "method": "randomized", "tolerance": 0.001}
+        ))
+        check = EquivalenceCheck(target, seed=5)
+        assert check.error(to_native_gates(parse_gate_operations(self.reversal(2)), 2)) < 1e-12
+        assert compile_target(make_exercise(
+            "small", num_qubits=2, target_type="unitary", target_data={"unitary_matrix": swap}
+        )).method == "exact"
+
+    def test_sample_count_follows_confidence(self):
+        assert sample_count(0.5) == 1
+        assert sample_count(0.999) == 10
+        assert sample_count(0.999999) == 20
+        with pytest.raises(ValueError):
+            sample_count(1.0)
+
+    def test_bulk_grading_and_analysis(self):
+        circuit = self.reversal(13)
+        response = client.post("/api/exercises/grade/bulk", json={"submissions": [
+            {"exercise_id": "ex016", "circuit": circuit},
+            {"exercise_id": "ex016", "circuit": circuit[:-1]}
+        ]})
+        results = [json.loads(line) for line in response.text.splitlines()][:-1]
+        assert [r["passed"] for r in sorted(results, key=lambda r: r["index"])] == [True, False]
+        assert client.post("/api/exercises/ex016/analyze", json={"circuit": circuit}).status_code == 400
@@ -0,0 +1,151 @@
+import json
+import threading
+import time
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.job_queue import (
+    CANCELLED,
+    FAILED,
+    QUEUED,
+    RUNNING,
+    SUCCEEDED,
+    TIMED_OUT,
+    JobQueue,
+    QueueFull,
+)
+
+client = TestClient(app)
+
+def wait_for(job, states, timeout=10):
+    deadline = time.monotonic() + timeout
+    while job.status not in states:
+        assert time.monotonic() < deadline, f"job still {job.status}"
+        time.sleep(0.01)
+
+def poll(job_id, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        status = client.get(f"/api/jobs/{job_id}").json()
+        if status["status"] not in (QUEUED, RUNNING):
+            return status
+        assert time.monotonic() < deadline, f"job still {status['status']}"
+        time.sleep(0.02)
+
+def looping(steps=1000, delay=0.01):
+    def run(job):
+        for step in range(steps):
+            job.update(step / steps, f"step {step}")
+            time.sleep(delay)
+        return "done"
+    return run
+
+@pytest.fixture
+def queue():
+    jobs = JobQueue(workers=1, max_queued=2, result_ttl=60)
+    yield jobs
+    jobs.stop()
+
+class TestJobQueue:
+
+    def test_job_runs_and_reports_progress(self, queue):
+        job = queue.submit("test", looping(steps=5, delay=0))
+        wait_for(job, {SUCCEEDED})
+        assert job.result == "done" and job.progress == 1.0 and job.message == "step 4"
+
+    def test_running_job_is_cancelled_at_its_next_update(self, queue):
+        job = queue.submit("test", looping())
+        wait_for(job, {RUNNING})
+        queue.cancel(job.id)
+        wait_for(job, {CANCELLED})
+        assert job.error == "cancelled"
+
+    def test_queued_job_is_cancelled_without_running(self, queue):
+        started = threading.Event()
+        release = threading.Event()
+        blocker = queue.submit("test", lambda job: (started.set(), release.wait(5)))
+        started.wait(5)
+        waiting = queue.submit("test", lambda job: pytest.fail("cancelled job ran"))
+        assert queue.cancel(waiting.id).status == CANCELLED
+        release.set()
+        wait_for(blocker, {SUCCEEDED})
+
+    def test_deadline_stops_a_running_job(self, queue):
+        job = queue.submit("test", looping(), timeout=0.1)
+        wait_for(job, {TIMED_OUT})
+        assert "deadline" in job.error
+
+    def test_failures_are_recorded(self, queue):
+        job = queue.submit("test", lambda job: 1 / 0)
+        wait_for(job, {FAILED})
+        assert "division by zero" in job.error
+
+    def test_queue_is_bounded(self, queue):
+        release = threading.Event()
+        started = threading.Event()
+        queue.submit("test", lambda job: (started.set(), release.wait(5)))
+        started.wait(5)
+        queue.submit("test", lambda job: None)
+        queue.submit("test", lambda job: None)
+        with pytest.raises(QueueFull):
+            queue.submit("test", lambda job: None)
+        assert queue.depth() == 2
+        release.set()
+
+    def test_finished_jobs_expire(self, queue):
+        queue.result_ttl = 0
+        job = queue.submit("test", lambda job: 1)
+        wait_for(job, {SUCCEEDED})
+        time.sleep(0.01)
+        assert queue.get(job.id) is None
+
+class TestJobRoutes:
+
+    def test_simulation_job(self):
+        circuit = [{"gate": "H", "qubit": 0, "timeStep": 0}] + [
+            {"gate": "CNOT", "qubit": q, "target_qubit": q + 1, "timeStep": q + 1} for q in range(15)
+        ]
+        response = client.post("/api/jobs/simulate", json={"qubits": 16, "circuit": circuit, "shots": 4000, "seed": 3})
+        assert response.status_code == 202
+        job_id = response.json()["id"]
+        assert poll(job_id)["status"] == SUCCEEDED
+
+        result = client.get(f"/api/jobs/{job_id}/result").json()["result"]
+        assert set(result["measurement_counts"]) == {"0" * 16, "1" * 16}
+        assert result["total_shots"] == 4000
+        assert job_id in [job["id"] for job in client.get("/api/jobs").json()["jobs"]]
+
+    def test_grover_sweep_job(self):
+        job_id = client.post("/api/jobs/grover-sweep", json={"num_qubits": 3, "target_item": 5}).json()["id"]
+        assert poll(job_id)["status"] == SUCCEEDED
+        result = client.get(f"/api/jobs/{job_id}/result").json()["result"]
+        assert [point["iterations"] for point in result["points"]] == [0, 1, 2, 3, 4]
+        assert result["best_iterations"] == result["optimal_iterations"] == 2
+
+    def test_events_stream_until_finished(self):
+        job_id = client.post("/api/jobs/grover-sweep", json={"num_qubits": 2, "target_item": 1}).json()["id"]
+        with client.stream("GET", f"/api/jobs/{job_id}/events") as response:
+            events = [json.loads(line) for line in response.iter_lines() if line]
+        assert events[-1]["status"] == SUCCEEDED
+        assert all(event["id"] == job_id for event in events)
+
+    def test_invalid_requests_are_rejected_up_front(self):
+        assert client.post("/api/jobs/simulate", json={"qubits": 40}).status_code == 400
+        assert client.post("/api/jobs/simulate", json={"qubits": 2, "include": ["unitary"]}).status_code == 400
+        assert client.post("/api/jobs/simulate", json={"qubits": 20, "include": ["state_vector"]}).status_code == 400
+        assert client.post("/api/jobs/simulate", json={"qubits": 20, "include": ["probabilities"]}).status_code == 400
+        bad_circuit = {"qubits": 2, "circuit": [{"gate": "H", "qubit": 5, "timeStep": 0}]}
+        assert client.post("/api/jobs/simulate", json=bad_circuit).status_code == 400
+        assert client.post("/api/jobs/grover-sweep", json={"num_qubits": 2, "target_item": 9}).status_code == 400
+
+    def test_unknown_and_unfinished_jobs(self):
+        assert client.get("/api/jobs/missing").status_code == 404
+        assert client.delete("/api/jobs/missing").status_code == 404
+
+        circuit = [{"gate": "H", "qubit": q % 20, "timeStep": q} for q in range(2000)]
+        job_id = client.post("/api/jobs/simulate", json={"qubits": 20, "circuit": circuit, "optimize": False}).json()["id"]
+        assert client.get(f"/api/jobs/{job_id}/result").status_code == 409
+        client.delete(f"/api/jobs/{job_id}")
+        assert poll(job_id)["status"] == CANCELLED
@@ -0,0 +1,67 @@
+import io
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.log import (
+    REQUEST_ID_HEADER,
+    bind_correlation_id,
+    configure_logging,
+    get_logger,
+    lazy,
+    reset_correlation_id,
+)
+
+client = TestClient(app)
+
+@pytest.fixture
+def capture():
+    """Route backend logs into a buffer, restoring the default handler afterwards"""
+    def configure(**options):
+        stream = io.StringIO()
+        configure_logging(stream=stream, **options)
+        return stream
+    yield configure
+    configure_logging()
+
+def lines(stream):
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+class TestStructuredLogging:
+
+    def test_disabled_levels_skip_lazy_arguments(self, capture):
+        stream = capture(level="info", fmt="json")
+        calls = []
+        get_logger("test").debug("diagram %s", lazy(lambda: calls.append(1) or "drawn"))
+        assert calls == [] and stream.getvalue() == ""
+
+    def test_json_records_carry_fields_and_correlation_id(self, capture):
+        stream = capture(level="debug", fmt="json")
+        token = bind_correlation_id("req-1")
+        try:
+            get_logger("app.test").info("graded %s", "ex001", extra={"score": 100})
+        finally:
+            reset_correlation_id(token)
+        [record] = lines(stream)
+        assert record["message"] == "graded ex001"
+        assert record["logger"] == "quantum_core.test"
+        assert record["correlation_id"] == "req-1" and record["score"] == 100
+
+    def test_debug_records_are_sampled(self, capture):
+        stream = capture(level="debug", fmt="json", debug_sample_rate=0.0)
+        logger = get_logger("test")
+        for _ in range(50):
+            logger.debug("noisy")
+        logger.warning("kept")
+        assert [r["message"] for r in lines(stream)] == ["kept"]
+
+    def test_request_id_is_echoed_and_tags_request_logs(self, capture):
+        stream = capture(level="warning", fmt="json")
+        circuit = [{"name": "FOO", "qubit": 0, "timeStep": 0}]
+        response = client.post("/api/algorithms/simulator/run", json={"qubits": 1, "gates": circuit},
+                               headers={REQUEST_ID_HEADER: "abc123"})
+        assert response.headers[REQUEST_ID_HEADER] == "abc123"
+        assert any(r["correlation_id"] == "abc123" and "FOO" in r["message"] for r in lines(stream))
+        assert client.get("/health").headers[REQUEST_ID_HEADER]
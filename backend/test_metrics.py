@@ -0,0 +1,114 @@
+import json
+import threading
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.utils.metrics import MetricsRegistry, aggregate, render
+
+client = TestClient(app)
+
+def sample(text, line_prefix):
+    """Value of the first exposition line starting with line_prefix"""
+    for line in text.splitlines():
+        if line.startswith(line_prefix):
+            return float(line.rsplit(" ", 1)[1])
+    return None
+
+class TestMetricsRegistry:
+
+    def test_counts_from_many_threads_are_exact(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("events_total", "Events", ["kind"])
+
+        def work():
+            for _ in range(10_000):
+                counter.inc(kind="a")
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert counter.samples() == {("a",): 80_000}
+
+    def test_shards_of_exited_threads_are_folded(self):
+        registry = MetricsRegistry()
+        counter = registry.counter("events_total", "Events")
+        histogram = registry.histogram("latency_seconds", "Latency", buckets=[1.0])
+        for _ in range(20):
+            thread = threading.Thread(target=lambda: (counter.inc(), histogram.observe(0.5)))
+            thread.start()
+            thread.join()
+        assert counter.samples() == {(): 20}
+        assert histogram.samples() == {(): [20, 10.0, 20]}
+        assert len(counter._shards) == 0 and len(histogram._shards) == 0
+
+    def test_histogram_exposition_is_cumulative(self):
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency_seconds", "Latency", ["route"], buckets=[0.1, 1.0])
+        for value in (0.05, 0.5, 0.7, 3.0):
+            histogram.observe(value, route="/x")
+        text = registry.render()
+        assert sample(text, 'latency_seconds_bucket{route="/x",le="0.1"}') == 1
+        assert sample(text, 'latency_seconds_bucket{route="/x",le="1.0"}') == 3
+        assert sample(text, 'latency_seconds_bucket{route="/x",le="+Inf"}') == 4
+        assert sample(text, 'latency_seconds_count{route="/x"}') == 4
+
+    def test_worker_snapshots_are_aggregated(self):
+        workers = []
+        for pid, hits, depth in ((101, 3, 2), (102, 5, 7)):
+            registry = MetricsRegistry()
+            registry.counter("cache_hits_total", "Hits", ["cache"]).inc(hits, cache="results")
+            registry.counter("cache_misses_total", "Misses", ["cache"]).inc(2, cache="results")
+            registry.gauge("queue_depth", "Depth", ["queue"]).inc(depth, queue="jobs")
+            snapshot = registry.snapshot(alive=pid == 101)
+            snapshot["pid"] = pid
+            workers.append(snapshot)
+        text = render(aggregate(workers))
+        assert sample(text, 'cache_hits_total{cache="results"}') == 8
+        assert sample(text, 'cache_hit_ratio{cache="results"}') == 8 / 12
+        # Gauges of a worker that shut down no longer count, its counters do
+        assert sample(text, 'queue_depth{queue="jobs"}') == 2
+        assert sample(text, "workers") == 1
+
+    def test_snapshot_files_round_trip(self, tmp_path):
+        other = MetricsRegistry()
+        other.counter("jobs_total", "Jobs").inc(4)
+        snapshot = other.snapshot()
+        snapshot["pid"] = 1
+        (tmp_path / "metrics-1.json").write_text(json.dumps(snapshot))
+        mine = MetricsRegistry()
+        mine.counter("jobs_total", "Jobs").inc(1)
+        assert sample(mine.render(str(tmp_path)), "jobs_total") == 5
+
+    def test_stale_snapshot_files_are_dropped(self, tmp_path):
+        other = MetricsRegistry()
+        other.counter("jobs_total", "Jobs").inc(4)
+        other.gauge("queue_depth", "Depth").inc(9)
+        mine = MetricsRegistry()
+        for pid, age in ((1, 4 * mine.interval), (2, 61 * mine.interval)):
+            snapshot = other.snapshot()
+            snapshot.update(pid=pid, time=snapshot["time"] - age)
+            (tmp_path / f"metrics-{pid}.json").write_text(json.dumps(snapshot))
+        text = mine.render(str(tmp_path))
+        # A crashed worker's counters still count, its gauges and the worker itself do not
+        assert sample(text, "jobs_total") == 4
+        assert sample(text, "queue_depth") is None and sample(text, "workers") == 1
+        assert not (tmp_path / "metrics-2.json").exists()
+
+class TestMetricsEndpoint:
+
+    def test_requests_and_simulations_are_reported(self):
+        client.get("/api/health")
+        client.post("/api/exercises/ex001/submit", json={"circuit": [{"gate": "H", "qubit": 0, "timeStep": 0}]})
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+        text = response.text
+        assert sample(text, 'http_requests_total{route="/api/health",method="GET",status="200"}') >= 1
+        assert sample(text, 'http_request_duration_seconds_count{route="/api/exercises/{exercise_id}/submit",method="POST"}') >= 1
+        assert sample(text, 'simulation_seconds_count{backend="native_statevector",qubits="1"}') >= 1
+        assert sample(text, 'queue_depth{queue="submissions"}') is not None
+        assert 'cache_hit_ratio{cache="results"}' in text
+        assert sample(text, "process_max_rss_bytes{pid=") > 0
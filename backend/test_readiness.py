@@ -0,0 +1,91 @@
+import io
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.main import app
+from app.utils.execution import execution_service
+from app.utils.log import configure_logging
+from app.utils.readiness import FAILED, READY, STARTING, WARMING_UP, Readiness
+
+client = TestClient(app)
+
+class TestReadiness:
+
+    def test_ready_only_after_the_warm_up(self):
+        release = threading.Event()
+        state = Readiness(modules=("json",))
+
+        def warm_up():
+            release.wait(5)
+            return {"circuits": 0.5}
+
+        assert state.status == STARTING
+        state.start(warm_up)
+        assert state.status == WARMING_UP and not state.ready
+        release.set()
+        assert state.wait(5)
+        assert set(state.snapshot()["steps"]) == {"imports", "circuits"}
+
+    def test_failed_warm_up_is_reported(self):
+        state = Readiness(modules=())
+        stream = io.StringIO()
+        configure_logging(stream=stream)
+        try:
+            state.run(lambda: (_ for _ in ()).throw(RuntimeError("no backend")))
+        finally:
+            configure_logging()
+        assert state.status == FAILED and not state.ready
+        assert "warm-up failed" in stream.getvalue() and "no backend" in stream.getvalue()
+
+    def test_failed_import_is_reported(self):
+        state = Readiness(modules=("no_such_module",))
+        state.start(lambda: {})
+        assert not state.wait(5)
+        assert state.status == FAILED
+
+    def test_registered_warm_ups_run_without_failures(self, caplog):
+        steps = execution_service.warm_up()
+        assert {"grover", "simon", "simulator", "exercises"} <= set(steps)
+        assert "failed" not in caplog.text
+
+class TestReadyRoute:
+
+    @pytest.fixture
+    def state(self, monkeypatch):
+        state = Readiness(modules=())
+        monkeypatch.setattr(main, "readiness", state)
+        return state
+
+    def test_unavailable_until_warmed_up(self, state):
+        response = client.get("/api/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == STARTING
+
+        state.run(lambda: {"circuits": 0.1})
+        body = client.get("/api/ready").json()
+        assert body["status"] == READY
+        capacity = body["capacity"]
+        assert capacity["requests_in_flight"] == 0
+        assert capacity["threads"]["size"] > 0
+        assert {"workers", "running", "queued", "max_queued"} == set(capacity["jobs"])
+        assert "jobs" in capacity["queue_depth"]
+
+    def test_overloaded_when_in_flight_limit_is_reached(self, state, monkeypatch):
+        state.run(lambda: {})
+        monkeypatch.setattr(main, "READY_MAX_IN_FLIGHT", 1)
+        main.HTTP_IN_PROGRESS.inc()
+        try:
+            response = client.get("/api/ready")
+        finally:
+            main.HTTP_IN_PROGRESS.dec()
+        assert response.status_code == 503
+        assert response.json()["status"] == "overloaded"
+
+    def test_unavailable_after_a_failed_warm_up(self, state):
+        state.run(lambda: (_ for _ in ()).throw(RuntimeError("no backend")))
+        response = client.get("/api/ready")
+        assert response.status_code == 503
+        assert response.json()["status"] == FAILED
@@ -0,0 +1,144 @@
+import random
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.algorithms.simon import (
+    GF2RowReducer,
+    apply_simon_oracle,
+    bits_to_int,
+    input_register_distribution,
+    int_to_bits,
+    random_two_to_one_table,
+    sample_until_rank,
+    simulate_simon,
+    validate_oracle_table,
+)
+
+client = TestClient(app)
+
+def random_orthogonal_sample(s: int, n: int, rnd: random.Random) -> int:
+    """Draw y uniformly from {y : y·s = 0 (mod 2)}"""
+    while True:
+        y = rnd.getrandbits(n)
+        if bin(y & s).count("1") % 2 == 0:
+            return y
+
+class TestGF2RowReducer:
+
+    def test_rejects_dependent_rows(self):
+        reducer = GF2RowReducer(3)
+        assert reducer.add(0b011)
+        assert reducer.add(0b110)
+        assert not reducer.add(0b101)
+        assert not reducer.add(0)
+        assert reducer.rank == 2
+
+    def test_recovers_period_small(self):
+        reducer = GF2RowReducer(3)
+        for y in (0b011, 0b100):
+            reducer.add(y)
+        assert reducer.solve() == 0b011
+
+    def test_underdetermined_returns_none(self):
+        reducer = GF2RowReducer(4)
+        reducer.add(0b0001)
+        assert reducer.solve() is None
+
+    def test_recovers_period_hundreds_of_bits(self):
+        rnd = random.Random(1234)
+        n = 300
+        s = rnd.getrandbits(n) | 1
+        reducer = GF2RowReducer(n)
+        samples = 0
+        while reducer.rank < n - 1:
+            reducer.add(random_orthogonal_sample(s, n, rnd))
+            samples += 1
+        assert reducer.solve() == s
+        # Simon needs n-1 + O(1) samples on average
+        assert samples < n + 30
+
+    def test_bit_string_round_trip(self):
+        assert bits_to_int("101") == 0b101
+        assert bits_to_int("110") == 0b011
+        assert int_to_bits(0b011, 3) == "110"
+
+class TestAdaptiveSampling:
+
+    def test_stops_at_rank_n_minus_one(self):
+        n = 4
+        s = 0b1010
+        distribution = np.array([1.0 if bin(y & s).count("1") % 2 == 0 else 0.0 for y in range(2 ** n)])
+        distribution /= distribution.sum()
+        reducer, queries = sample_until_rank(distribution, n, np.random.default_rng(7))
+        assert reducer.rank == n - 1
+        assert queries >= n - 1
+        assert reducer.solve() == s
+
+class TestSimonEndpoint:
+
+    def test_reports_queries_and_equations(self):
+        response = client.post("/api/algorithms/simon/run", json={"hidden_period": "11", "num_qubits": 4, "seed": 3})
+        assert response.status_code == 200
+        data = response.json()
+        assert data["recovered_period"] == "11"
+        assert data["oracle_queries"] >= 1
+        assert len(data["linear_equations"]) == 1
+
+    def test_counts_use_the_period_bit_order(self):
+        response = client.post("/api/algorithms/simon/run", json={"hidden_period": "100", "num_qubits": 6, "seed": 3})
+        counts = response.json()["measurement_counts"]
+        # y·s = 0 with s = 100 means character 0 of every measured y is 0
+        assert counts and all(y[0] == "0" for y in counts)
+        assert any(y[2] == "1" for y in counts)
+
+class TestPermutationOracle:
+
+    def test_random_table_is_two_to_one(self):
+        n, s = 5, 0b10110
+        table = random_two_to_one_table(s, n, seed=11)
+        inputs = np.arange(2 ** n)
+        assert np.array_equal(table, table[inputs ^ s])
+        assert len(np.unique(table)) == 2 ** (n - 1)
+        validate_oracle_table(table.tolist(), s, n)
+
+    def test_rejects_non_periodic_table(self):
+        with pytest.raises(ValueError):
+            validate_oracle_table([0, 1, 2, 3], 0b01, 2)
+
+    def test_oracle_gather_matches_definition(self):
+        n = 3
+        table = random_two_to_one_table(0b011, n, seed=5)
+        rng = np.random.default_rng(0)
+        state = rng.normal(size=4 ** n) + 1j * rng.normal(size=4 ** n)
+        result = apply_simon_oracle(state, table, n)
+        for x in range(2 ** n):
+            for y in range(2 ** n):
+                assert result[x + (y ^ table[x]) * 2 ** n] == state[x + y * 2 ** n]
+
+    def test_measurements_are_orthogonal_to_period(self):
+        n, s = 4, 0b0101
+        _, probs = simulate_simon(random_two_to_one_table(s, n, seed=2), n)
+        distribution = input_register_distribution(probs, n)
+        for y, p in enumerate(distribution):
+            if bin(y & s).count("1") % 2:
+                assert p < 1e-12
+
+    def test_endpoint_with_lookup_table(self):
+        table = [0, 1, 1, 0]  # n=2, f(x) = f(x ⊕ 11)
+        response = client.post("/api/algorithms/simon/run", json={"hidden_period": "11", "num_qubits": 4, "oracle_table": table})
+        assert response.status_code == 200
+        assert response.json()["recovered_period"] == "11"
+
+    def test_endpoint_rejects_invalid_table(self):
+        response = client.post("/api/algorithms/simon/run", json={"hidden_period": "11", "num_qubits": 4, "oracle_table": [0, 1, 2, 3]})
+        assert response.status_code == 400
+        response = client.post("/api/algorithms/simon/run", json={"hidden_period": "11", "num_qubits": 4, "oracle_table": [2 ** 70, 1, 1, 2 ** 70]})
+        assert response.status_code == 400
+
+    def test_one_to_one_function_recovers_zero(self):
+        response = client.post("/api/algorithms/simon/run", json={"hidden_period": "000", "num_qubits": 6, "seed": 1})
+        assert response.status_code == 200
+        assert response.json()["recovered_period"] == "000"
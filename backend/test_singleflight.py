@@ -0,0 +1,158 @@
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+import app.algorithms.simulator as simulator_module
+from app.main import app
+from app.utils.execution import execution_service
+from app.utils.singleflight import SingleFlight
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+class SlowCompute:
+    """Counts calls and holds each one until released"""
+
+    def __init__(self, value=None, error=None):
+        self.calls = 0
+        self.release = threading.Event()
+        self.value = value
+        self.error = error
+
+    def __call__(self):
+        self.calls += 1
+        self.release.wait(5)
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+async def release_soon(compute, delay=0.05):
+    await asyncio.sleep(delay)
+    compute.release.set()
+
+class TestSingleFlight:
+
+    def test_concurrent_duplicates_share_one_computation(self):
+        flights = SingleFlight("test")
+        compute = SlowCompute(value={"answer": 42})
+
+        async def scenario():
+            waiters = [flights.run("key", compute) for _ in range(20)]
+            return await asyncio.gather(release_soon(compute), *waiters)
+
+        results = run(scenario())[1:]
+        assert compute.calls == 1
+        assert all(result is results[0] for result in results)
+        assert flights.stats() == {"in_flight": 0, "started": 1, "coalesced": 19}
+
+    def test_different_keys_and_later_calls_compute_again(self):
+        flights = SingleFlight("test")
+        compute = SlowCompute(value=1)
+        compute.release.set()
+
+        async def scenario():
+            await asyncio.gather(flights.run("a", compute), flights.run("b", compute))
+            await flights.run("a", compute)
+
+        run(scenario())
+        assert compute.calls == 3
+
+    def test_errors_fan_out(self):
+        flights = SingleFlight("test")
+        compute = SlowCompute(error=ValueError("bad circuit"))
+
+        async def scenario():
+            waiters = [flights.run("key", compute) for _ in range(3)]
+            return await asyncio.gather(release_soon(compute), *waiters, return_exceptions=True)
+
+        errors = run(scenario())[1:]
+        assert compute.calls == 1
+        assert all(isinstance(error, ValueError) for error in errors)
+        assert flights.in_flight() == 0
+
+    def test_cancelled_caller_does_not_cancel_the_others(self):
+        flights = SingleFlight("test")
+        compute = SlowCompute(value="done")
+
+        async def scenario():
+            first = asyncio.create_task(flights.run("key", compute))
+            second = asyncio.create_task(flights.run("key", compute))
+            await asyncio.sleep(0.01)
+            first.cancel()
+            compute.release.set()
+            return await second, first.cancelled()
+
+        assert run(scenario()) == ("done", True)
+        assert compute.calls == 1
+
+class TestCoalescedRoutes:
+
+    @pytest.fixture
+    def slow_simulation(self, monkeypatch):
+        """Count simulator runs and make each take long enough for requests to overlap"""
+        calls = []
+        simulate = simulator_module.simulate_quantum_circuit
+
+        def slow(circuit, shots=1024):
+            calls.append(circuit)
+            time.sleep(0.2)
+            return simulate(circuit, shots)
+
+        monkeypatch.setattr(simulator_module, "simulate_quantum_circuit", slow)
+        return calls
+
+    def test_identical_simulator_runs_are_computed_once(self, slow_simulation):
+        # Same circuit up to timeSteps, which canonical hashing ignores
+        bodies = [{"qubits": 3, "gates": [{"name": "H", "qubit": 0, "timeStep": step},
+                                          {"name": "X", "qubit": 2, "timeStep": 0}]}
+                  for step in range(10)]
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(client.post("/api/algorithms/simulator/run", json=body)
+                                              for body in bodies))
+
+        coalesced_before = execution_service.flights.coalesced
+        responses = run(scenario())
+        assert len(slow_simulation) == 1
+        assert execution_service.flights.coalesced - coalesced_before == 9
+        counts = {str(response.json()["measurement_counts"]) for response in responses}
+        assert len(counts) == 1
+        assert any("coalesced;dur=" in response.headers["Server-Timing"] for response in responses)
+
+    def test_different_circuits_are_not_coalesced(self, slow_simulation):
+        bodies = [{"qubits": 2, "gates": [{"name": gate, "qubit": 0, "timeStep": 0}]} for gate in ("H", "X")]
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(client.post("/api/algorithms/simulator/run", json=body)
+                                              for body in bodies))
+
+        responses = run(scenario())
+        assert len(slow_simulation) == 2
+        assert responses[0].json()["probabilities"] != responses[1].json()["probabilities"]
+
+    @pytest.mark.parametrize("first, second", [
+        ({"name": "CX", "qubit": 0, "target_qubit": 1, "timeStep": 1},
+         {"name": "CNOT", "qubit": 0, "target_qubit": 1, "timeStep": 1}),
+        ({"name": "RZ", "qubit": 0, "timeStep": 1},
+         {"name": "RZ", "qubit": 0, "parameter": 0.0, "timeStep": 1}),
+    ])
+    def test_gates_the_simulator_reads_differently_are_not_coalesced(self, slow_simulation, first, second):
+        # The canonical form treats each pair as one circuit, the simulator does not
+        bodies = [{"qubits": 2, "gates": [{"name": "H", "qubit": 0, "timeStep": 0}, gate]} for gate in (first, second)]
+
+        async def scenario():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(client.post("/api/algorithms/simulator/run", json=body)
+                                              for body in bodies))
+
+        responses = run(scenario())
+        assert len(slow_simulation) == 2
+        assert responses[0].json()["quantum_state"] != responses[1].json()["quantum_state"]
@@ -0,0 +1,23 @@
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ("qiskit", "qiskit_aer", "matplotlib", "scipy")
+
+def heavy_modules_after(code):
+    """Heavy modules loaded after running code in a fresh interpreter, as a worker at cold start"""
+    probe = f"{code}\nimport json, sys\nprint(json.dumps(sorted(m for m in {HEAVY_MODULES!r} if m in sys.modules)))"
+    output = subprocess.check_output([sys.executable, "-c", probe], text=True)
+    return json.loads(output.strip().splitlines()[-1])
+
+def test_heavy_dependencies_are_not_imported_at_startup():
+    assert heavy_modules_after("import app.main") == []
+
+def test_exercise_simulation_runs_without_qiskit():
+    assert heavy_modules_after(
+        "from fastapi.testclient import TestClient\n"
+        "import app.main\n"
+        "circuit = [{'gate': 'H', 'qubit': 0, 'timeStep': 0}]\n"
+        "response = TestClient(app.main.app).post('/api/exercises/ex001/simulate', json={'circuit': circuit})\n"
+        "assert response.status_code == 200, response.text"
+    ) == []
@@ -0,0 +1,79 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import app.exercise_checker.checker as checker
+from app.main import app
+from app.utils.submission_store import SubmissionStore
+
+client = TestClient(app)
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = SubmissionStore(str(tmp_path / "submissions.db"), batch_size=16, flush_interval=0.05)
+    monkeypatch.setattr(checker, "submission_store", store)
+    yield store
+    store.close()
+
+class TestSubmissionStore:
+
+    def test_writes_are_batched(self, store):
+        for i in range(100):
+            assert store.record(f"user-{i % 5}", "ex001", i % 2 == 0, 100 if i % 2 == 0 else 40)
+        store.flush()
+        stats = store.stats()
+        assert stats["written"] == 100 and stats["queued"] == 0
+        assert stats["batches"] < 100
+
+    def test_progress_keeps_best_result(self, store):
+        store.record("alice", "ex001", False, 40)
+        store.record("alice", "ex001", True, 100)
+        store.record("alice", "ex002", False, 10)
+        store.flush()
+        progress = {row["exercise_id"]: row for row in store.user_progress("alice")}
+        assert progress["ex001"]["solved"] is True
+        assert progress["ex001"]["best_score"] == 100 and progress["ex001"]["attempts"] == 2
+        assert progress["ex002"]["solved"] is False
+
+    def test_exercise_stats_and_leaderboard(self, store):
+        store.record("alice", "ex001", True, 100)
+        store.record("alice", "ex002", True, 97)
+        store.record("bob", "ex001", False, 30)
+        store.record("bob", "ex001", True, 96)
+        store.record("carol", "ex001", False, 20)
+        store.flush()
+
+        stats = store.exercise_stats("ex001")
+        assert stats["users"] == 3 and stats["solved_users"] == 2 and stats["attempts"] == 4
+        assert stats["pass_rate"] == pytest.approx(2 / 3)
+        assert stats["attempt_pass_rate"] == pytest.approx(0.5)
+
+        board = store.leaderboard()
+        assert [row["user_id"] for row in board] == ["alice", "bob", "carol"]
+        assert [row["user_id"] for row in store.leaderboard(exercise_id="ex001", limit=2)] == ["alice", "bob"]
+
+    def test_close_flushes_pending_writes(self, tmp_path):
+        store = SubmissionStore(str(tmp_path / "close.db"), flush_interval=10)
+        store.record("dave", "ex001", True, 100)
+        store.close()
+        assert store.user_progress("dave")[0]["best_score"] == 100
+        store.close()
+
+class TestSubmissionEndpoints:
+
+    def test_submit_is_recorded(self, store):
+        circuit = [{"gate": "H", "qubit": 0, "timeStep": 0}]
+        client.post("/api/exercises/ex001/submit", json={"circuit": circuit, "user_id": "erin"})
+        store.flush()
+        data = client.get("/api/users/erin/progress").json()
+        assert data["solved"] == 1 and data["exercises"][0]["exercise_id"] == "ex001"
+
+    def test_bulk_grading_is_recorded(self, store):
+        circuit = [{"gate": "H", "qubit": 0, "timeStep": 0}]
+        submissions = [{"user_id": f"s{i}", "exercise_id": "ex001", "circuit": circuit} for i in range(5)]
+        client.post("/api/exercises/grade/bulk", json={"submissions": submissions})
+        store.flush()
+        assert client.get("/api/exercises/ex001/stats").json()["solved_users"] == 5
+        assert len(client.get("/api/leaderboard", params={"limit": 3}).json()["leaderboard"]) == 3
+
+    def test_unknown_exercise_stats(self, store):
+        assert client.get("/api/exercises/missing/stats").status_code == 404
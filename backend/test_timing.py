@@ -0,0 +1,82 @@
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import app.main as main
+from app.main import app
+from app.utils.profiler import PROFILE_HEADER, PROFILE_ID_HEADER, SamplingProfiler
+from app.utils.timing import RequestTimings, bind_timings, phase, reset_timings
+
+client = TestClient(app)
+
+def server_timing(response):
+    """Server-Timing header as {phase: milliseconds}"""
+    phases = {}
+    for entry in response.headers["Server-Timing"].split(", "):
+        name, duration = entry.split(";dur=")
+        phases[name] = float(duration)
+    return phases
+
+def busy(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        pass
+
+class TestServerTiming:
+
+    def test_phases_outside_a_request_are_free(self):
+        with phase("circuit"):
+            pass
+
+    def test_phases_accumulate(self):
+        timings = RequestTimings()
+        token = bind_timings(timings)
+        try:
+            for _ in range(2):
+                with phase("circuit"):
+                    time.sleep(0.001)
+        finally:
+            reset_timings(token)
+        assert timings.phases["circuit"] >= 0.002
+        assert timings.server_timing().startswith("circuit;dur=")
+
+    def test_simulator_breakdown(self):
+        response = client.post("/api/algorithms/simulator/run",
+                               json={"qubits": 2, "gates": [{"name": "H", "qubit": 0, "timeStep": 0}]})
+        phases = server_timing(response)
+        for name in ("validation", "circuit", "aer_statevector", "sampling", "endpoint", "serialization", "total"):
+            assert name in phases, name
+        assert phases["endpoint"] <= phases["total"]
+
+    def test_exercise_and_algorithm_routes_are_timed(self):
+        response = client.post("/api/exercises/ex001/submit", json={"circuit": [{"gate": "H", "qubit": 0, "timeStep": 0}]})
+        assert {"validation", "circuit", "native_statevector", "endpoint"} <= set(server_timing(response))
+        assert "endpoint" in server_timing(client.post("/api/algorithms/grover/simulate", json={}))
+
+class TestProfiling:
+
+    def test_profiler_samples_registered_threads(self):
+        worker = threading.Thread(target=busy, args=(0.1,))
+        profiler = SamplingProfiler(interval=0.001)
+        worker.start()
+        profiler.add_thread(worker.ident)
+        profiler.start()
+        worker.join()
+        profiler.stop()
+        assert profiler.samples > 0
+        assert any("busy (test_timing.py" in entry["function"] for entry in profiler.top())
+        assert profiler.folded().splitlines()[0].rsplit(" ", 1)[1].isdigit()
+
+    def test_profile_header_is_opt_in(self, monkeypatch):
+        circuit = {"qubits": 3, "gates": [{"name": "H", "qubit": 0, "timeStep": 0}]}
+        assert PROFILE_ID_HEADER not in client.post("/api/algorithms/simulator/run", json=circuit,
+                                                    headers={PROFILE_HEADER: "1"}).headers
+
+        monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+        response = client.post("/api/algorithms/simulator/run", json=circuit, headers={PROFILE_HEADER: "1"})
+        profile_id = response.headers[PROFILE_ID_HEADER]
+        profile = client.get(f"/api/profiles/{profile_id}").json()
+        assert {"samples", "top", "folded", "elapsed_seconds"} <= set(profile)
+        assert profile_id in client.get("/api/profiles").json()["profiles"]
+        assert client.get("/api/profiles/missing").status_code == 404